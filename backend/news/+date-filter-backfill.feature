@@ -0,0 +1 @@
+Search filters on `modified` and `created` compare the `modified_ts` and `created_ts` payload fields. Points indexed by earlier versions lack them and are left out of date-filtered results. After upgrading, run `bin/instance run scripts/vector_cli.py reconcile` once; it re-indexes those points with the timestamps.
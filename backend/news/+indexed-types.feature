@@ -0,0 +1 @@
+The vector index covers KnowledgeItem, BookmarkPlus, ResearchNote, LearningGoal and ProjectLog. Content events, `rebuild_index`, the reconciler and the search endpoints all use this one list. Until now the events skipped LearningGoal and ProjectLog and the rebuild skipped KnowledgeItem. Run `rebuild_index` once after upgrading so KnowledgeItem content gets indexed.
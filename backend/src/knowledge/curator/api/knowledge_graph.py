@@ -7,6 +7,9 @@ from zope.interface import implementer
 from zope.publisher.interfaces import IPublishTraverse
 from zope.component import getUtility
 from knowledge.curator.behaviors.interfaces import IKnowledgeRelationship, ISuggestedRelationship
+from knowledge.curator.vector.config import SUPPORTED_CONTENT_TYPES
+from knowledge.curator.vector.matrix import get_embedding_matrix
+from knowledge.curator.vector.search import SimilaritySearch
 import json
 
 
@@ -253,33 +256,63 @@ class KnowledgeGraphService(Service):
             existing.update(getattr(self.context, "related_notes", []))
         return existing
 
-    def _find_similar_items(self, current_vector, existing_connections):
-        """Find similar items based on embedding vector."""
-        catalog = api.portal.get_tool("portal_catalog")
-        brains = catalog(
-            portal_type=["ResearchNote", "LearningGoal", "ProjectLog", "BookmarkPlus"]
-        )
-        similarities = []
+    def _find_similar_items(self, existing_connections):
+        """Find items similar to the context.
 
-        for brain in brains:
-            if (
-                api.content.get_uuid(self.context) == brain.UID
-                or brain.UID in existing_connections
-            ):
-                continue
+        Uses the vector database, which looks the context up by UID, or the
+        in-process embedding matrix when it cannot be reached. Only the
+        matrix needs the context's ``embedding_vector``; without one it
+        returns None.
+        """
+        portal_types = SUPPORTED_CONTENT_TYPES
+        uid = api.content.get_uuid(self.context)
+        excluded = set(existing_connections) | {uid}
+
+        search = SimilaritySearch()
+        if search.is_available():
+            results = search.find_similar_content(
+                uid,
+                limit=10 + len(excluded),
+                score_threshold=0.7,
+                content_types=portal_types,
+            )
+            return [
+                {
+                    "uid": result["uid"],
+                    "title": result.get("title"),
+                    "type": result.get("content_type"),
+                    "url": result.get("url"),
+                    "similarity": result["score"],
+                    "description": result.get("description"),
+                }
+                for result in results
+                if result["uid"] not in excluded
+            ][:10]
 
-            obj = brain.getObject()
-            if hasattr(obj, "embedding_vector"):
-                other_vector = getattr(obj, "embedding_vector", [])
-                if other_vector:
-                    similarity = self._calculate_similarity(
-                        current_vector, other_vector
-                    )
-                    if similarity > 0.7:
-                        similarities.append({"brain": brain, "similarity": similarity})
-
-        similarities.sort(key=lambda x: x["similarity"], reverse=True)
-        return similarities[:10]
+        current_vector = getattr(self.context, "embedding_vector", [])
+        if not current_vector:
+            return None
+
+        catalog = api.portal.get_tool("portal_catalog")
+        brains = {brain.UID: brain for brain in catalog(portal_type=portal_types)}
+        hits = get_embedding_matrix(portal_types).search(
+            current_vector,
+            limit=10,
+            score_threshold=0.7,
+            allowed_uids=brains,
+            exclude_uids=excluded,
+        )
+        return [
+            {
+                "uid": hit_uid,
+                "title": brains[hit_uid].Title,
+                "type": brains[hit_uid].portal_type,
+                "url": brains[hit_uid].getURL(),
+                "similarity": similarity,
+                "description": brains[hit_uid].Description,
+            }
+            for hit_uid, similarity in hits
+        ]
 
     def suggest_connections(self):
         """Suggest potential connections based on similarity."""
@@ -287,41 +320,18 @@ class KnowledgeGraphService(Service):
             self.request.response.setStatus(403)
             return {"error": "Unauthorized"}
 
-        current_vector = getattr(self.context, "embedding_vector", [])
-        if not current_vector:
-            return {"suggestions": [], "message": "No embedding vector available"}
-
         existing_connections = self._get_existing_connections()
-        similar_items = self._find_similar_items(current_vector, existing_connections)
+        similar_items = self._find_similar_items(existing_connections)
+        if similar_items is None:
+            return {"suggestions": [], "message": "No embedding vector available"}
 
         suggestions = [
-            {
-                "uid": item["brain"].UID,
-                "title": item["brain"].Title,
-                "type": item["brain"].portal_type,
-                "url": item["brain"].getURL(),
-                "similarity": round(item["similarity"], 3),
-                "description": item["brain"].Description,
-            }
+            dict(item, similarity=round(item["similarity"], 3))
             for item in similar_items
         ]
 
         return {"suggestions": suggestions, "count": len(suggestions)}
 
-    def _calculate_similarity(self, vector1, vector2):
-        """Calculate cosine similarity between two vectors."""
-        if len(vector1) != len(vector2):
-            return 0.0
-
-        dot_product = sum(a * b for a, b in zip(vector1, vector2, strict=False))
-        magnitude1 = sum(a * a for a in vector1) ** 0.5
-        magnitude2 = sum(b * b for b in vector2) ** 0.5
-
-        if magnitude1 == 0 or magnitude2 == 0:
-            return 0.0
-
-        return dot_product / (magnitude1 * magnitude2)
-
     def visualize_graph(self):
         """Get graph data optimized for visualization."""
         if not api.user.has_permission("View", obj=self.context):
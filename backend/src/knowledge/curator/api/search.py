@@ -1,6 +1,11 @@
 """Search API endpoints for semantic and similarity search."""
 
+from concurrent.futures import ThreadPoolExecutor
 from knowledge.curator.interfaces import IAIService
+from knowledge.curator.vector.config import SUPPORTED_CONTENT_TYPES
+from knowledge.curator.vector.matrix import get_embedding_matrix
+from knowledge.curator.vector.search import reciprocal_rank_fusion
+from knowledge.curator.vector.search import SimilaritySearch
 from plone import api
 from plone.restapi.services import Service
 from zope.component import queryUtility
@@ -8,6 +13,16 @@ from zope.interface import implementer
 from zope.publisher.interfaces import IPublishTraverse
 
 import json
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Semantic results can only come from content types in the vector index
+DEFAULT_PORTAL_TYPES = SUPPORTED_CONTENT_TYPES
+
+# Runs the vector leg of hybrid searches next to the catalog query
+_vector_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid-search")
 
 
 @implementer(IPublishTraverse)
@@ -45,6 +60,8 @@ class SearchService(Service):
             return self._similarity_search(data)
         elif search_type == "fulltext":
             return self._fulltext_search(data)
+        elif search_type == "hybrid":
+            return self._hybrid_search(data)
         else:
             self.request.response.setStatus(400)
             return {"error": "Invalid search type"}
@@ -86,49 +103,109 @@ class SearchService(Service):
             for result in results
         ]
 
+    def _build_vector_filters(self, filters):
+        """Translate request filters into vector payload predicates."""
+        vector_filters = {}
+        if filters.get("review_state"):
+            vector_filters["workflow_state"] = filters["review_state"]
+        if filters.get("tags"):
+            vector_filters["tags"] = {"$all": filters["tags"]}
+        if filters.get("date_range"):
+            vector_filters["created"] = {
+                "start": filters["date_range"].get("start"),
+                "end": filters["date_range"].get("end"),
+            }
+        return vector_filters
+
+    def _format_vector_results(self, results, include_dates=False):
+        """Format hits returned by the vector database."""
+        items = []
+        for result in results:
+            item = {
+                "uid": result["uid"],
+                "title": result.get("title"),
+                "description": result.get("description"),
+                "url": result.get("url"),
+                "portal_type": result.get("content_type"),
+                "review_state": result.get("review_state"),
+                "similarity_score": round(result["score"], 3),
+                "tags": result.get("tags") or [],
+            }
+            if include_dates:
+                item["created"] = result.get("created")
+                item["modified"] = result.get("modified")
+            items.append(item)
+        return items
+
+    def _rank_brains(self, vector, brains, portal_types, limit, threshold, exclude=()):
+        """Rank brains by similarity using the in-process embedding matrix.
+
+        Used when the vector database is unavailable. ``brains`` limits the
+        candidates to what the catalog returned for the current user.
+        """
+        brains_by_uid = {brain.UID: brain for brain in brains}
+        matrix = get_embedding_matrix(portal_types)
+        hits = matrix.search(
+            vector,
+            limit=limit,
+            score_threshold=threshold,
+            allowed_uids=brains_by_uid,
+            exclude_uids=exclude,
+        )
+        return [
+            {"brain": brains_by_uid[uid], "similarity": similarity}
+            for uid, similarity in hits
+        ]
+
     def _semantic_search(self, data):
-        """Perform semantic search using embeddings."""
+        """Perform semantic search using embeddings.
+
+        Queries go to the vector database; when it cannot be reached the
+        ``embedding_vector`` of content is searched in process instead.
+        """
         query = data.get("query", "")
         limit = data.get("limit", 20)
-        portal_types = data.get(
-            "portal_types",
-            ["ResearchNote", "LearningGoal", "ProjectLog", "BookmarkPlus"],
-        )
+        portal_types = data.get("portal_types", DEFAULT_PORTAL_TYPES)
         filters = data.get("filters", {})
 
         if not query:
             self.request.response.setStatus(400)
             return {"error": "Query is required"}
 
-        ai_service = queryUtility(IAIService)
-        if not ai_service:
-            return self._fulltext_search(data)
-
-        try:
-            query_vector = ai_service.generate_embedding(query)
-        except Exception:
-            return self._fulltext_search(data)
-
-        catalog = api.portal.get_tool("portal_catalog")
-        catalog_query = self._build_semantic_query(portal_types, filters)
-        brains = catalog(**catalog_query)
-
-        results = []
-        for brain in brains:
-            obj = brain.getObject()
-            if hasattr(obj, "embedding_vector"):
-                content_vector = getattr(obj, "embedding_vector", [])
-                if content_vector:
-                    similarity = self._calculate_similarity(
-                        query_vector, content_vector
-                    )
-                    if similarity > 0.5:
-                        results.append({"brain": brain, "similarity": similarity})
-
-        results.sort(key=lambda x: x["similarity"], reverse=True)
-        results = results[:limit]
+        unindexed = [pt for pt in portal_types if pt not in SUPPORTED_CONTENT_TYPES]
+        if unindexed:
+            self.request.response.setStatus(400)
+            return {
+                "error": "Content types not indexed for semantic search: "
+                + ", ".join(unindexed)
+            }
 
-        items = self._format_semantic_results(results)
+        search = SimilaritySearch()
+        if search.is_available():
+            results = search.search_by_text(
+                query,
+                limit=limit,
+                score_threshold=0.5,
+                content_types=portal_types,
+                extra_filters=self._build_vector_filters(filters),
+            )
+            items = self._format_vector_results(results, include_dates=True)
+        else:
+            ai_service = queryUtility(IAIService)
+            if not ai_service:
+                return self._fulltext_search(data)
+
+            try:
+                query_vector = ai_service.generate_embedding(query)
+            except Exception:
+                return self._fulltext_search(data)
+
+            catalog = api.portal.get_tool("portal_catalog")
+            catalog_query = self._build_semantic_query(portal_types, filters)
+            results = self._rank_brains(
+                query_vector, catalog(**catalog_query), portal_types, limit, 0.5
+            )
+            items = self._format_semantic_results(results)
 
         return {
             "items": items,
@@ -137,25 +214,18 @@ class SearchService(Service):
             "search_type": "semantic",
         }
 
-    def _find_and_sort_similar_items(self, source_vector, uid, threshold):
+    def _find_and_sort_similar_items(self, source_vector, uid, threshold, limit):
         """Find and sort similar items based on embedding vector."""
         catalog = api.portal.get_tool("portal_catalog")
-        all_brains = catalog(
-            portal_type=["ResearchNote", "LearningGoal", "ProjectLog", "BookmarkPlus"]
+        all_brains = catalog(portal_type=DEFAULT_PORTAL_TYPES)
+        return self._rank_brains(
+            source_vector,
+            all_brains,
+            DEFAULT_PORTAL_TYPES,
+            limit,
+            threshold,
+            exclude=[uid],
         )
-        results = []
-        for brain in all_brains:
-            if uid == brain.UID:
-                continue
-            obj = brain.getObject()
-            if hasattr(obj, "embedding_vector"):
-                other_vector = getattr(obj, "embedding_vector", [])
-                if other_vector:
-                    similarity = self._calculate_similarity(source_vector, other_vector)
-                    if similarity >= threshold:
-                        results.append({"brain": brain, "similarity": similarity})
-        results.sort(key=lambda x: x["similarity"], reverse=True)
-        return results
 
     def _format_similarity_results(self, results):
         """Format the results of a similarity search."""
@@ -189,16 +259,25 @@ class SearchService(Service):
             self.request.response.setStatus(404)
             return {"error": "Item not found"}
 
-        source_obj = brains[0].getObject()
-        if not hasattr(source_obj, "embedding_vector"):
-            return {"items": [], "message": "No embedding vector available"}
-
-        source_vector = getattr(source_obj, "embedding_vector", [])
-        if not source_vector:
-            return {"items": [], "message": "No embedding vector available"}
+        search = SimilaritySearch()
+        if search.is_available():
+            results = search.find_similar_content(
+                uid,
+                limit=limit,
+                score_threshold=threshold,
+                content_types=DEFAULT_PORTAL_TYPES,
+            )
+            items = self._format_vector_results(results)
+        else:
+            source_obj = brains[0].getObject()
+            source_vector = getattr(source_obj, "embedding_vector", [])
+            if not source_vector:
+                return {"items": [], "message": "No embedding vector available"}
 
-        results = self._find_and_sort_similar_items(source_vector, uid, threshold)
-        items = self._format_similarity_results(results[:limit])
+            results = self._find_and_sort_similar_items(
+                source_vector, uid, threshold, limit
+            )
+            items = self._format_similarity_results(results)
 
         return {
             "items": items,
@@ -207,28 +286,14 @@ class SearchService(Service):
             "search_type": "similarity",
         }
 
-    def _fulltext_search(self, data):
-        """Perform traditional fulltext search."""
-        query = data.get("query", "")
-        limit = data.get("limit", 20)
-        portal_types = data.get(
-            "portal_types",
-            ["ResearchNote", "LearningGoal", "ProjectLog", "BookmarkPlus"],
-        )
-        filters = data.get("filters", {})
-
-        if not query:
-            self.request.response.setStatus(400)
-            return {"error": "Query is required"}
-
-        catalog = api.portal.get_tool("portal_catalog")
+    def _build_fulltext_query(self, query, portal_types, filters, limit):
+        """Build the catalog query for fulltext search.
 
-        # Build query
+        Without a ``sort_on`` the catalog orders by text relevance.
+        """
         catalog_query = {
             "SearchableText": query,
             "portal_type": portal_types,
-            "sort_on": "modified",
-            "sort_order": "descending",
             "b_size": limit,
         }
 
@@ -248,23 +313,42 @@ class SearchService(Service):
                     "query": filters["date_range"]["end"],
                     "range": "max",
                 }
+        return catalog_query
+
+    def _format_brain(self, brain):
+        """Format a catalog brain as a search result item."""
+        return {
+            "uid": brain.UID,
+            "title": brain.Title,
+            "description": brain.Description,
+            "url": brain.getURL(),
+            "portal_type": brain.portal_type,
+            "review_state": brain.review_state,
+            "created": brain.created.ISO8601(),
+            "modified": brain.modified.ISO8601(),
+            "tags": brain.Subject,
+        }
+
+    def _fulltext_search(self, data):
+        """Perform traditional fulltext search."""
+        query = data.get("query", "")
+        limit = data.get("limit", 20)
+        portal_types = data.get("portal_types", DEFAULT_PORTAL_TYPES)
+        filters = data.get("filters", {})
+
+        if not query:
+            self.request.response.setStatus(400)
+            return {"error": "Query is required"}
+
+        catalog = api.portal.get_tool("portal_catalog")
+        catalog_query = self._build_fulltext_query(query, portal_types, filters, limit)
+        catalog_query["sort_on"] = "modified"
+        catalog_query["sort_order"] = "descending"
 
         brains = catalog(**catalog_query)
 
         # Format results
-        items = []
-        for brain in brains[:limit]:
-            items.append({
-                "uid": brain.UID,
-                "title": brain.Title,
-                "description": brain.Description,
-                "url": brain.getURL(),
-                "portal_type": brain.portal_type,
-                "review_state": brain.review_state,
-                "created": brain.created.ISO8601(),
-                "modified": brain.modified.ISO8601(),
-                "tags": brain.Subject,
-            })
+        items = [self._format_brain(brain) for brain in brains[:limit]]
 
         return {
             "items": items,
@@ -273,6 +357,91 @@ class SearchService(Service):
             "search_type": "fulltext",
         }
 
+    def _hybrid_search(self, data):
+        """Combine fulltext and semantic search with reciprocal rank fusion.
+
+        The vector query (embedding and Qdrant search) runs in a worker
+        thread while the catalog is queried on the request thread, so the
+        request takes as long as the slower of both. Vector hits are checked
+        against the catalog afterwards, on the request thread. Each item
+        carries its fused ``score`` and the rank (and similarity) it had in
+        every source that returned it.
+        """
+        query = data.get("query", "")
+        limit = data.get("limit", 20)
+        portal_types = data.get("portal_types", DEFAULT_PORTAL_TYPES)
+        filters = data.get("filters", {})
+        threshold = data.get("threshold", 0.5)
+        # Each source contributes more candidates than are returned
+        candidates = limit * 2
+
+        if not query:
+            self.request.response.setStatus(400)
+            return {"error": "Query is required"}
+
+        # Types outside the vector index are only found by the fulltext leg
+        semantic_types = [pt for pt in portal_types if pt in SUPPORTED_CONTENT_TYPES]
+        search = SimilaritySearch()
+        future = None
+        if semantic_types and search.is_available():
+            future = _vector_executor.submit(
+                search.search_vectors,
+                query,
+                limit=candidates,
+                score_threshold=threshold,
+                content_types=semantic_types,
+                extra_filters=self._build_vector_filters(filters),
+            )
+
+        catalog = api.portal.get_tool("portal_catalog")
+        brains = catalog(
+            **self._build_fulltext_query(query, portal_types, filters, candidates)
+        )[:candidates]
+
+        vector_results = []
+        sources = {"fulltext": "ok", "semantic": "unavailable"}
+        if future is not None:
+            try:
+                vector_results = search._hydrate_results(future.result())
+                sources["semantic"] = "ok"
+            except Exception as e:
+                logger.warning(f"Semantic leg of hybrid search failed: {e}")
+                sources["semantic"] = "failed"
+
+        brains_by_uid = {brain.UID: brain for brain in brains}
+        vectors_by_uid = {result["uid"]: result for result in vector_results}
+        fused = reciprocal_rank_fusion({
+            "fulltext": [brain.UID for brain in brains],
+            "semantic": [result["uid"] for result in vector_results],
+        })
+
+        items = []
+        for uid, score, ranks in fused[:limit]:
+            if uid in brains_by_uid:
+                item = self._format_brain(brains_by_uid[uid])
+            else:
+                item = self._format_vector_results(
+                    [vectors_by_uid[uid]], include_dates=True
+                )[0]
+                item.pop("similarity_score")
+            item["score"] = round(score, 6)
+            item["sources"] = {
+                source: {"rank": rank} for source, rank in ranks.items()
+            }
+            if uid in vectors_by_uid:
+                item["sources"]["semantic"]["similarity"] = round(
+                    vectors_by_uid[uid]["score"], 3
+                )
+            items.append(item)
+
+        return {
+            "items": items,
+            "items_total": len(fused),
+            "query": query,
+            "search_type": "hybrid",
+            "sources": sources,
+        }
+
     def find_similar(self):
         """Find similar items to the current context."""
         if not api.user.has_permission("View", obj=self.context):
@@ -304,17 +473,3 @@ class SearchService(Service):
             data["portal_types"] = [pt.strip() for pt in portal_types if pt.strip()]
 
         return self._semantic_search(data)
-
-    def _calculate_similarity(self, vector1, vector2):
-        """Calculate cosine similarity between two vectors."""
-        if len(vector1) != len(vector2):
-            return 0.0
-
-        dot_product = sum(a * b for a, b in zip(vector1, vector2, strict=False))
-        magnitude1 = sum(a * a for a in vector1) ** 0.5
-        magnitude2 = sum(b * b for b in vector2) ** 0.5
-
-        if magnitude1 == 0 or magnitude2 == 0:
-            return 0.0
-
-        return dot_product / (magnitude1 * magnitude2)
@@ -8,6 +8,7 @@ from zope.interface import implementer
 from zope.publisher.interfaces import IPublishTraverse
 
 from knowledge.curator.vector.management import VectorCollectionManager
+from knowledge.curator.vector.reconcile import run_vector_reconciler
 from knowledge.curator.vector.search import SimilaritySearch
 
 
@@ -30,6 +31,9 @@ class VectorSearchService(Service):
         content_types = data.get("content_types")
         workflow_states = data.get("workflow_states")
         tags = data.get("tags")
+        knowledge_types = data.get("knowledge_types")
+        modified_after = data.get("modified_after")
+        modified_before = data.get("modified_before")
 
         # Perform search
         search = SimilaritySearch()
@@ -40,6 +44,9 @@ class VectorSearchService(Service):
             content_types=content_types,
             workflow_states=workflow_states,
             tags=tags,
+            knowledge_types=knowledge_types,
+            modified_after=modified_after,
+            modified_before=modified_before,
         )
 
         return {
@@ -52,6 +59,9 @@ class VectorSearchService(Service):
                 "content_types": content_types,
                 "workflow_states": workflow_states,
                 "tags": tags,
+                "knowledge_types": knowledge_types,
+                "modified_after": modified_after,
+                "modified_before": modified_before,
             },
         }
 
@@ -163,6 +173,15 @@ class VectorManagementService(Service):
         success = manager.update_content_vector(obj)
         return {"success": success, "uid": uid}
 
+    def _handle_reconcile(self, manager):
+        if self.request.method != "POST":
+            self.request.response.setStatus(405)
+            return {"error": "POST method required"}
+        data = json.loads(self.request.get("BODY") or "{}")
+        return run_vector_reconciler(
+            self.context, dry_run=bool(data.get("dry_run", False))
+        )
+
     def reply(self):
         """Handle management operations."""
         if not api.user.has_permission("Manage portal", obj=self.context):
@@ -177,6 +196,7 @@ class VectorManagementService(Service):
                     "initialize",
                     "rebuild",
                     "update",
+                    "reconcile",
                 ]
             }
 
@@ -189,6 +209,7 @@ class VectorManagementService(Service):
             "initialize": self._handle_initialize,
             "rebuild": self._handle_rebuild,
             "update": self._handle_update,
+            "reconcile": self._handle_reconcile,
         }
 
         handler = handlers.get(operation)
@@ -250,15 +271,17 @@ class VectorClusteringService(Service):
             content_types = self.request.get("content_types", "").split(",")
             content_types = [ct.strip() for ct in content_types if ct.strip()] or None
             n_clusters = int(self.request.get("n_clusters", 5))
+            refresh = self.request.get("refresh", "false").lower() == "true"
         else:
             data = json.loads(self.request.get("BODY", "{}"))
             content_types = data.get("content_types")
             n_clusters = data.get("n_clusters", 5)
+            refresh = bool(data.get("refresh", False))
 
-        # Perform clustering
+        # Perform clustering; fitted models are cached between requests
         search = SimilaritySearch()
         clusters = search.semantic_clustering(
-            content_types=content_types, n_clusters=n_clusters
+            content_types=content_types, n_clusters=n_clusters, refresh=refresh
         )
 
         return {
@@ -24,7 +24,7 @@ class KnowledgeGraphView(BrowserView):
         stats = storage.get_statistics()
 
         # Add additional analysis
-        graph = storage.load_graph()
+        graph = storage.read_graph()
         algorithms = GraphAlgorithms(graph)
 
         # Calculate density
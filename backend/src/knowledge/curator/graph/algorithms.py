@@ -1,9 +1,12 @@
 """Graph algorithms for analysis and traversal."""
 
 import heapq
-from collections import deque
 from typing import Any
 
+import numpy as np
+
+from .centrality import CentralityEngine
+from .centrality import get_centrality
 from .model import Graph
 from .relationships import RelationshipType
 
@@ -11,9 +14,16 @@ from .relationships import RelationshipType
 class GraphAlgorithms:
     """Graph algorithms for knowledge network analysis."""
 
-    def __init__(self, graph: Graph):
-        """Initialize with a graph instance."""
+    def __init__(self, graph: Graph, pivots: int | None = None):
+        """Initialize with a graph instance.
+
+        Args:
+            graph: Graph to analyze
+            pivots: Sampled sources for betweenness and closeness, None for
+                exact results on graphs of moderate size
+        """
         self.graph = graph
+        self.pivots = pivots
 
     def _reconstruct_path(self, start_uid, end_uid, previous):
         """Reconstruct the shortest path from the previous nodes mapping."""
@@ -111,101 +121,48 @@ class GraphAlgorithms:
     def degree_centrality(self) -> dict[str, float]:
         """Calculate degree centrality for all nodes.
 
+        Counts distinct successors plus distinct predecessors, normalized by
+        the maximum possible degree.
+
         Returns:
             Dictionary mapping node UID to degree centrality score
         """
-        centrality = {}
-        n = len(self.graph.nodes)
+        snapshot = self.graph.snapshot()
+        return snapshot.to_dict(snapshot.degree_centrality())
 
-        if n <= 1:
-            return dict.fromkeys(self.graph.nodes, 0.0)
+    def weighted_degree(self) -> dict[str, float]:
+        """Sum the weights of the edges leaving and entering every node.
 
-        for uid in self.graph.nodes:
-            # Count both incoming and outgoing edges
-            degree = len(self.graph.get_neighbors(uid)) + len(
-                self.graph.get_incoming_neighbors(uid)
-            )
-            # Normalize by maximum possible degree
-            centrality[uid] = degree / (2 * (n - 1))
-
-        return centrality
-
-    def _single_source_shortest_path(self, start_uid, nodes):
-        """Calculate single-source shortest paths for betweenness centrality."""
-        S = []
-        P = {uid: [] for uid in nodes}
-        sigma = dict.fromkeys(nodes, 0.0)
-        sigma[start_uid] = 1.0
-        d = dict.fromkeys(nodes, -1)
-        d[start_uid] = 0
-        Q = deque([start_uid])
-
-        while Q:
-            v = Q.popleft()
-            S.append(v)
-            for w in self.graph.get_neighbors(v):
-                if d[w] < 0:
-                    Q.append(w)
-                    d[w] = d[v] + 1
-                if d[w] == d[v] + 1:
-                    sigma[w] += sigma[v]
-                    P[w].append(v)
-        return S, P, sigma
-
-    def _accumulate_centrality(self, centrality, S, P, sigma, start_uid):
-        """Accumulate betweenness centrality from a single source."""
-        delta = dict.fromkeys(S, 0.0)
-        while S:
-            w = S.pop()
-            for v in P[w]:
-                delta[v] += (sigma[v] / sigma[w]) * (1 + delta[w])
-            if w != start_uid:
-                centrality[w] += delta[w]
-        return centrality
-
-    def betweenness_centrality(self, normalized: bool = True) -> dict[str, float]:
-        """Calculate betweenness centrality for all nodes."""
-        centrality = dict.fromkeys(self.graph.nodes, 0.0)
-        nodes = list(self.graph.nodes.keys())
+        Returns:
+            Dictionary mapping node UID to weighted degree
+        """
+        snapshot = self.graph.snapshot()
+        return snapshot.to_dict(snapshot.weighted_degree())
 
-        for start_uid in nodes:
-            S, P, sigma = self._single_source_shortest_path(start_uid, nodes)
-            centrality = self._accumulate_centrality(centrality, S, P, sigma, start_uid)
+    def centrality(self) -> CentralityEngine:
+        """Return the centrality measures of the current graph version.
 
-        if normalized and len(nodes) > 2:
-            scale = 1.0 / ((len(nodes) - 1) * (len(nodes) - 2))
-            for uid in centrality:
-                centrality[uid] *= scale
+        Computed once per graph version and shared by all callers; see
+        ``centrality.get_centrality`` for the pivot sampling.
+        """
+        return get_centrality(self.graph, self.pivots)
 
-        return centrality
+    def betweenness_centrality(self, normalized: bool = True) -> dict[str, float]:
+        """Calculate betweenness centrality for all nodes (Brandes)."""
+        engine = self.centrality()
+        values = engine.normalized_betweenness() if normalized else engine.betweenness
+        return self.graph.snapshot().to_dict(values)
 
     def closeness_centrality(self) -> dict[str, float]:
         """Calculate closeness centrality for all nodes.
 
+        Closeness is the number of nodes reachable from a node divided by the
+        sum of their distances in hops.
+
         Returns:
             Dictionary mapping node UID to closeness centrality score
         """
-        centrality = {}
-
-        for uid in self.graph.nodes:
-            # Calculate sum of shortest path distances
-            total_distance = 0
-            reachable_nodes = 0
-
-            for other_uid in self.graph.nodes:
-                if uid != other_uid:
-                    path = self.shortest_path(uid, other_uid)
-                    if path:
-                        total_distance += len(path) - 1
-                        reachable_nodes += 1
-
-            if reachable_nodes > 0:
-                # Closeness is inverse of average distance
-                centrality[uid] = reachable_nodes / total_distance
-            else:
-                centrality[uid] = 0.0
-
-        return centrality
+        return self.graph.snapshot().to_dict(self.centrality().closeness)
 
     def pagerank(
         self,
@@ -215,6 +172,9 @@ class GraphAlgorithms:
     ) -> dict[str, float]:
         """Calculate PageRank scores for all nodes.
 
+        Runs vectorized on the graph's CSR snapshot; the score of nodes
+        without outgoing edges is spread over all nodes.
+
         Args:
             damping_factor: Probability of following links (vs random jump)
             max_iterations: Maximum iterations
@@ -223,38 +183,10 @@ class GraphAlgorithms:
         Returns:
             Dictionary mapping node UID to PageRank score
         """
-        n = len(self.graph.nodes)
-        if n == 0:
-            return {}
-
-        # Initialize scores
-        scores = dict.fromkeys(self.graph.nodes, 1.0 / n)
-
-        for _iteration in range(max_iterations):
-            new_scores = {}
-            diff = 0.0
-
-            for uid in self.graph.nodes:
-                # Random jump probability
-                score = (1 - damping_factor) / n
-
-                # Incoming link contributions
-                incoming = self.graph.get_incoming_neighbors(uid)
-                for source_uid in incoming:
-                    out_degree = len(self.graph.get_neighbors(source_uid))
-                    if out_degree > 0:
-                        score += damping_factor * scores[source_uid] / out_degree
-
-                new_scores[uid] = score
-                diff += abs(score - scores[uid])
-
-            scores = new_scores
-
-            # Check convergence
-            if diff < tolerance:
-                break
-
-        return scores
+        snapshot = self.graph.snapshot()
+        return snapshot.to_dict(
+            snapshot.pagerank(damping_factor, max_iterations, tolerance)
+        )
 
     def find_communities(self, resolution: float = 1.0) -> dict[str, int]:
         """Find communities using Louvain algorithm.
@@ -267,37 +199,8 @@ class GraphAlgorithms:
         """
         # Simplified community detection using connected components
         # For production, consider using more sophisticated algorithms
-
-        communities = {}
-        community_id = 0
-        visited = set()
-
-        for uid in self.graph.nodes:
-            if uid not in visited:
-                # BFS to find connected component
-                queue = deque([uid])
-                component = []
-
-                while queue:
-                    current = queue.popleft()
-                    if current not in visited:
-                        visited.add(current)
-                        component.append(current)
-
-                        # Add neighbors
-                        for neighbor in self.graph.get_neighbors(current):
-                            if neighbor not in visited:
-                                queue.append(neighbor)
-                        for neighbor in self.graph.get_incoming_neighbors(current):
-                            if neighbor not in visited:
-                                queue.append(neighbor)
-
-                # Assign community ID
-                for node_uid in component:
-                    communities[node_uid] = community_id
-                community_id += 1
-
-        return communities
+        snapshot = self.graph.snapshot()
+        return snapshot.to_dict(snapshot.weak_components())
 
     def _expand_cluster(self, uid):
         """Expand a cluster to include nodes within 2 hops."""
@@ -433,29 +336,21 @@ class GraphAlgorithms:
         Returns:
             List of (node_uid, centrality_score) tuples
         """
-        # Combine multiple centrality measures
-        degree_scores = self.degree_centrality()
-        betweenness_scores = self.betweenness_centrality()
-        pagerank_scores = self.pagerank()
-
-        # Normalize and combine scores
-        combined_scores = {}
-
-        for uid in self.graph.nodes:
-            # Weight different centrality measures
-            score = (
-                0.3 * degree_scores.get(uid, 0)
-                + 0.4 * betweenness_scores.get(uid, 0)
-                + 0.3 * pagerank_scores.get(uid, 0)
-            )
-            combined_scores[uid] = score
+        snapshot = self.graph.snapshot()
+        if not len(snapshot):
+            return []
 
-        # Sort and return top N
-        sorted_concepts = sorted(
-            combined_scores.items(), key=lambda x: x[1], reverse=True
+        # Weight different centrality measures
+        engine = self.centrality()
+        combined = (
+            0.3 * engine.degree
+            + 0.4 * engine.normalized_betweenness()
+            + 0.3 * engine.pagerank
         )
 
-        return sorted_concepts[:top_n]
+        # Sort and return top N
+        top = np.argsort(-combined, kind="stable")[:top_n]
+        return [(snapshot.uids[i], float(combined[i])) for i in top]
 
     def analyze_node_importance(self, uid: str) -> dict[str, Any]:
         """Analyze the importance of a specific node.
@@ -469,32 +364,22 @@ class GraphAlgorithms:
         if uid not in self.graph.nodes:
             return {}
 
-        # Calculate various metrics
-        degree_scores = self.degree_centrality()
-        betweenness_scores = self.betweenness_centrality()
-        closeness_scores = self.closeness_centrality()
-        pagerank_scores = self.pagerank()
+        # Look up the node's metrics, computed once per graph version
+        metrics = self.centrality().node_metrics(uid)
+        community = metrics.pop("community")
 
         # Get node's connections
         outgoing = len(self.graph.get_neighbors(uid))
         incoming = len(self.graph.get_incoming_neighbors(uid))
 
-        # Find communities
-        communities = self.find_communities()
-
         return {
             "uid": uid,
-            "metrics": {
-                "degree_centrality": degree_scores.get(uid, 0),
-                "betweenness_centrality": betweenness_scores.get(uid, 0),
-                "closeness_centrality": closeness_scores.get(uid, 0),
-                "pagerank": pagerank_scores.get(uid, 0),
-            },
+            "metrics": metrics,
             "connections": {
                 "outgoing": outgoing,
                 "incoming": incoming,
                 "total": outgoing + incoming,
             },
-            "community": communities.get(uid, -1),
+            "community": community,
             "node_info": self.graph.get_node(uid).to_dict(),
         }
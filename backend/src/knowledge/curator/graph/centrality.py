@@ -0,0 +1,276 @@
+"""Centrality measures of a whole graph, computed together and cached.
+
+Closeness and betweenness both need the shortest paths from every node.
+``CentralityEngine`` runs one breadth-first search per source over the
+graph's CSR snapshot and derives both from it: the hop distances give the
+source's closeness and the same search, with path counts, feeds the
+Brandes dependency accumulation for betweenness. Degree, PageRank and
+communities come from the snapshot's array operations.
+
+The results are cached per snapshot, i.e. per graph version, so asking
+for the numbers of one node after the first request is a lookup.
+
+On large graphs the searches can be limited to a random sample of pivot
+sources. Betweenness is then the pivots' dependencies scaled by
+``n / pivots``. Closeness is estimated from the hop distances of every
+node to the pivots, found by a second search per pivot along incoming
+edges (Eppstein and Wang).
+"""
+
+from collections import deque
+from typing import Any
+import numpy as np
+import threading
+import weakref
+
+
+# Graphs up to this many nodes get exact betweenness and closeness by default
+EXACT_CENTRALITY_MAX_NODES = 2000
+
+# Pivot sources sampled by default on larger graphs
+DEFAULT_PIVOTS = 256
+
+# Mean edges per search level below which node-by-node searches are faster
+MIN_LEVEL_WIDTH = 128
+
+# Snapshot -> {(pivots, random_state): CentralityEngine}
+_engines = weakref.WeakKeyDictionary()
+_engines_lock = threading.Lock()
+
+
+def frontier_edges(indptr, indices, frontier):
+    """Return (source, target) arrays of all CSR pairs leaving ``frontier``."""
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    if not total:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    # Position of every pair: its row start plus its offset within the row
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    positions = np.repeat(starts, counts) + offsets
+    return np.repeat(frontier, counts), indices[positions]
+
+
+class _Searcher:
+    """Breadth-first searches over one direction of a CSR graph.
+
+    A search expands a whole level at a time with NumPy, which costs one
+    array pass over the edges plus a fixed overhead per level. On deep,
+    thin graphs (long prerequisite chains) that overhead dominates, so
+    when the levels of a search were narrow the next ones walk Python
+    adjacency lists node by node instead.
+    """
+
+    def __init__(self, indptr, indices):
+        self.indptr = indptr
+        self.indices = indices
+        self.n = len(indptr) - 1
+        self.vectorized = True
+        self._lists = None
+
+    @property
+    def lists(self) -> list[list[int]]:
+        if self._lists is None:
+            self._lists = [
+                chunk.tolist() for chunk in np.split(self.indices, self.indptr[1:-1])
+            ]
+        return self._lists
+
+    def _choose(self, edges: int, levels: int):
+        """Pick the strategy for the next search from this one's shape."""
+        self.vectorized = edges >= MIN_LEVEL_WIDTH * levels
+
+    def distances(self, source: int) -> np.ndarray:
+        """Hop distances from ``source``, -1 where unreachable."""
+        if not self.vectorized:
+            return self._distances_lists(source)
+        dist = np.full(self.n, -1, dtype=np.int64)
+        dist[source] = 0
+        frontier = np.array([source], dtype=np.int64)
+        depth = edges = 0
+        while frontier.size:
+            _src, dst = frontier_edges(self.indptr, self.indices, frontier)
+            edges += dst.size
+            frontier = np.unique(dst[dist[dst] < 0])
+            depth += 1
+            dist[frontier] = depth
+        self._choose(edges, depth)
+        return dist
+
+    def _distances_lists(self, source: int) -> np.ndarray:
+        dist = [-1] * self.n
+        dist[source] = 0
+        queue = deque([source])
+        while queue:
+            v = queue.popleft()
+            for w in self.lists[v]:
+                if dist[w] < 0:
+                    dist[w] = dist[v] + 1
+                    queue.append(w)
+        return np.array(dist, dtype=np.int64)
+
+    def brandes(self, source: int, backward) -> tuple[np.ndarray, np.ndarray]:
+        """Hop distances from ``source`` and its dependency on every node.
+
+        ``backward`` searches the reverse direction; its adjacency lists
+        give the predecessors for the accumulation.
+        """
+        if not self.vectorized:
+            return self._brandes_lists(source, backward.lists)
+
+        dist = np.full(self.n, -1, dtype=np.int64)
+        dist[source] = 0
+        sigma = np.zeros(self.n)
+        sigma[source] = 1.0
+        levels = []
+        frontier = np.array([source], dtype=np.int64)
+        depth = edges = 0
+        while frontier.size:
+            src, dst = frontier_edges(self.indptr, self.indices, frontier)
+            edges += dst.size
+            frontier = np.unique(dst[dist[dst] < 0])
+            depth += 1
+            dist[frontier] = depth
+            on_path = dist[dst] == depth
+            src, dst = src[on_path], dst[on_path]
+            np.add.at(sigma, dst, sigma[src])
+            levels.append((src, dst))
+        self._choose(edges, depth)
+
+        delta = np.zeros(self.n)
+        # Deepest level first: a node's dependency is complete before it is
+        # passed on to its predecessors
+        for src, dst in reversed(levels):
+            np.add.at(delta, src, sigma[src] / sigma[dst] * (1.0 + delta[dst]))
+        delta[source] = 0.0
+        return dist, delta
+
+    def _brandes_lists(self, source: int, predecessors) -> tuple:
+        dist = [-1] * self.n
+        dist[source] = 0
+        sigma = [0.0] * self.n
+        sigma[source] = 1.0
+        order = []
+        queue = deque([source])
+        while queue:
+            v = queue.popleft()
+            order.append(v)
+            for w in self.lists[v]:
+                if dist[w] < 0:
+                    dist[w] = dist[v] + 1
+                    queue.append(w)
+                if dist[w] == dist[v] + 1:
+                    sigma[w] += sigma[v]
+
+        delta = [0.0] * self.n
+        for w in reversed(order[1:]):
+            coefficient = (1.0 + delta[w]) / sigma[w]
+            for v in predecessors[w]:
+                if dist[v] == dist[w] - 1:
+                    delta[v] += sigma[v] * coefficient
+        delta[source] = 0.0
+        # Searches from elsewhere in the graph may reach wider levels again
+        edges = sum(len(self.lists[v]) for v in order)
+        levels = dist[order[-1]] + 1
+        self._choose(edges, levels)
+        return np.array(dist, dtype=np.int64), np.array(delta)
+
+
+class CentralityEngine:
+    """Degree, betweenness, closeness and PageRank of one graph snapshot."""
+
+    def __init__(self, snapshot, pivots: int | None = None, random_state: int = 42):
+        """Compute all measures of ``snapshot``.
+
+        Args:
+            snapshot: CSRGraph of the graph
+            pivots: Number of sampled sources, None (or at least the node
+                count) for exact results
+            random_state: Seed of the pivot sample
+        """
+        # Keep no reference to the snapshot, it is the key of the cache
+        self.index = snapshot.index
+        n = len(snapshot)
+        self.exact = pivots is None or pivots >= n
+        self.pivots = n if self.exact else max(1, pivots)
+
+        self.degree = snapshot.degree_centrality()
+        self.pagerank = snapshot.pagerank()
+        self.communities = snapshot.weak_components()
+        self.closeness = np.zeros(n)
+        self.betweenness = np.zeros(n)
+
+        if self.exact:
+            sources = range(n)
+        else:
+            rng = np.random.default_rng(random_state)
+            sources = rng.choice(n, size=self.pivots, replace=False).tolist()
+        # Pivots reached from each node and the summed hop distances to them
+        pivot_hits = np.zeros(n)
+        pivot_distance = np.zeros(n)
+
+        forward = _Searcher(snapshot.indptr, snapshot.indices)
+        backward = _Searcher(snapshot.in_indptr, snapshot.in_indices)
+        for source in sources:
+            dist, delta = forward.brandes(source, backward)
+            self.betweenness += delta
+            if self.exact:
+                reached = dist > 0
+                total = dist[reached].sum()
+                if total:
+                    self.closeness[source] = reached.sum() / total
+            else:
+                # Hop distance of every node to this pivot, along incoming edges
+                dist = backward.distances(source)
+                reached = dist > 0
+                pivot_hits[reached] += 1
+                pivot_distance[reached] += dist[reached]
+
+        if not self.exact:
+            self.betweenness *= n / self.pivots
+            np.divide(
+                pivot_hits, pivot_distance, out=self.closeness, where=pivot_distance > 0
+            )
+
+    def normalized_betweenness(self) -> np.ndarray:
+        """Betweenness divided by the number of ordered node pairs."""
+        n = len(self.index)
+        if n <= 2:
+            return self.betweenness
+        return self.betweenness / ((n - 1) * (n - 2))
+
+    def node_metrics(self, uid: str) -> dict[str, Any] | None:
+        """Return all measures of one node, or None if it is not in the graph."""
+        i = self.index.get(uid)
+        if i is None:
+            return None
+        return {
+            "degree_centrality": float(self.degree[i]),
+            "betweenness_centrality": float(self.normalized_betweenness()[i]),
+            "closeness_centrality": float(self.closeness[i]),
+            "pagerank": float(self.pagerank[i]),
+            "community": int(self.communities[i]),
+        }
+
+
+def get_centrality(
+    graph, pivots: int | None = None, random_state: int = 42
+) -> CentralityEngine:
+    """Return the cached centrality engine of the graph's current version.
+
+    ``pivots`` of None means exact results up to
+    ``EXACT_CENTRALITY_MAX_NODES`` nodes and ``DEFAULT_PIVOTS`` sampled
+    sources above.
+    """
+    snapshot = graph.snapshot()
+    if pivots is None and len(snapshot) > EXACT_CENTRALITY_MAX_NODES:
+        pivots = DEFAULT_PIVOTS
+    key = (pivots, random_state)
+    with _engines_lock:
+        engine = _engines.get(snapshot, {}).get(key)
+    if engine is None:
+        engine = CentralityEngine(snapshot, pivots, random_state)
+        with _engines_lock:
+            _engines.setdefault(snapshot, {})[key] = engine
+    return engine
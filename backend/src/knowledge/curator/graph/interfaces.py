@@ -93,6 +93,21 @@ class IGraphStorage(Interface):
     def load_graph():
         """Load graph from persistent storage."""
 
+    def read_graph():
+        """Return the cached, shared read-only graph."""
+
+    def add_node(node):
+        """Store a new node."""
+
+    def add_edge(edge):
+        """Store a new edge between stored nodes."""
+
+    def remove_node(uid):
+        """Remove a node and its edges."""
+
+    def remove_edge(source_uid, target_uid, relationship_type):
+        """Remove an edge."""
+
     def sync_with_catalog():
         """Synchronize graph with catalog content."""
 
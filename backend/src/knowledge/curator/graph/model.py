@@ -1,5 +1,7 @@
 """Core graph data model for knowledge graph."""
 
+from .snapshot import CSRGraph
+from collections.abc import ValuesView
 from datetime import datetime
 from typing import Any
 from enum import Enum
@@ -140,16 +142,61 @@ class Edge:
         return hash((self.source_uid, self.target_uid, self.relationship_type))
 
 
+def _discard(typed: dict[str, dict[str, Edge]], relationship_type: str, uid: str):
+    """Remove ``uid`` from a typed edge map, dropping empty types."""
+    neighbors = typed[relationship_type]
+    del neighbors[uid]
+    if not neighbors:
+        del typed[relationship_type]
+
+
+def _decrement(counts: dict[str, int], uid: str):
+    """Count one edge less to ``uid``, forgetting it at zero."""
+    if counts[uid] > 1:
+        counts[uid] -= 1
+    else:
+        del counts[uid]
+
+
+def _typed_edges(
+    typed: dict[str, dict[str, Edge]] | None, relationship_type: str | None
+) -> list[Edge]:
+    """Return the edges of a typed edge map, optionally of one type."""
+    if not typed:
+        return []
+    if relationship_type is not None:
+        return list(typed.get(relationship_type, {}).values())
+    return [edge for neighbors in typed.values() for edge in neighbors.values()]
+
+
 class Graph:
-    """Represents the knowledge graph."""
+    """Represents the knowledge graph.
+
+    Edges are indexed by (source, target, type) and, per node, in outgoing
+    and incoming maps of relationship type -> neighbor -> edge. The untyped
+    adjacency maps count the edges between two nodes, so removing one of
+    several edges between them keeps the nodes adjacent. Removal and
+    (typed) neighbor lookups cost O(degree) instead of O(edges).
+    """
 
     def __init__(self):
         """Initialize an empty graph."""
         self.nodes: dict[str, Node] = {}
-        self.edges: list[Edge] = []
-        self.adjacency_list: dict[str, set[str]] = {}
-        self.reverse_adjacency_list: dict[str, set[str]] = {}
         self.edge_index: dict[tuple, Edge] = {}
+        # uid -> neighbor uid -> number of edges between them
+        self.adjacency_list: dict[str, dict[str, int]] = {}
+        self.reverse_adjacency_list: dict[str, dict[str, int]] = {}
+        # uid -> relationship type -> neighbor uid -> edge
+        self.out_edges: dict[str, dict[str, dict[str, Edge]]] = {}
+        self.in_edges: dict[str, dict[str, dict[str, Edge]]] = {}
+        # Bumped by every structural change
+        self.version = 0
+        self._snapshot: tuple[int, CSRGraph] | None = None
+
+    @property
+    def edges(self) -> ValuesView[Edge]:
+        """All edges, in the order they were added."""
+        return self.edge_index.values()
 
     def add_node(self, node: Node) -> bool:
         """Add a node to the graph.
@@ -164,8 +211,11 @@ class Graph:
             return False
 
         self.nodes[node.uid] = node
-        self.adjacency_list[node.uid] = set()
-        self.reverse_adjacency_list[node.uid] = set()
+        self.adjacency_list[node.uid] = {}
+        self.reverse_adjacency_list[node.uid] = {}
+        self.out_edges[node.uid] = {}
+        self.in_edges[node.uid] = {}
+        self.version += 1
         return True
 
     def add_edge(self, edge: Edge) -> bool:
@@ -187,13 +237,18 @@ class Graph:
             return False
 
         # Add edge
-        self.edges.append(edge)
+        source, target = edge.source_uid, edge.target_uid
         self.edge_index[edge_key] = edge
+        self.out_edges[source].setdefault(edge.relationship_type, {})[target] = edge
+        self.in_edges[target].setdefault(edge.relationship_type, {})[source] = edge
 
-        # Update adjacency lists
-        self.adjacency_list[edge.source_uid].add(edge.target_uid)
-        self.reverse_adjacency_list[edge.target_uid].add(edge.source_uid)
+        # Update adjacency counts
+        outgoing = self.adjacency_list[source]
+        outgoing[target] = outgoing.get(target, 0) + 1
+        incoming = self.reverse_adjacency_list[target]
+        incoming[source] = incoming.get(source, 0) + 1
 
+        self.version += 1
         return True
 
     def remove_node(self, uid: str) -> bool:
@@ -209,11 +264,7 @@ class Graph:
             return False
 
         # Remove all edges connected to this node
-        edges_to_remove = []
-        for edge in self.edges:
-            if edge.source_uid == uid or edge.target_uid == uid:
-                edges_to_remove.append(edge)
-
+        edges_to_remove = self.get_edges_from_node(uid) + self.get_edges_to_node(uid)
         for edge in edges_to_remove:
             self.remove_edge(edge.source_uid, edge.target_uid, edge.relationship_type)
 
@@ -221,7 +272,10 @@ class Graph:
         del self.nodes[uid]
         del self.adjacency_list[uid]
         del self.reverse_adjacency_list[uid]
+        del self.out_edges[uid]
+        del self.in_edges[uid]
 
+        self.version += 1
         return True
 
     def remove_edge(
@@ -242,22 +296,28 @@ class Graph:
             return False
 
         # Remove edge
-        edge = self.edge_index[edge_key]
-        self.edges.remove(edge)
         del self.edge_index[edge_key]
+        _discard(self.out_edges[source_uid], relationship_type, target_uid)
+        _discard(self.in_edges[target_uid], relationship_type, source_uid)
 
-        # Update adjacency lists if no other edges exist between nodes
-        has_other_edges = any(
-            e
-            for e in self.edges
-            if e.source_uid == source_uid and e.target_uid == target_uid
-        )
-        if not has_other_edges:
-            self.adjacency_list[source_uid].discard(target_uid)
-            self.reverse_adjacency_list[target_uid].discard(source_uid)
+        # Nodes stay adjacent while other edges remain between them
+        _decrement(self.adjacency_list[source_uid], target_uid)
+        _decrement(self.reverse_adjacency_list[target_uid], source_uid)
 
+        self.version += 1
         return True
 
+    def snapshot(self) -> CSRGraph:
+        """Return a compact read-only snapshot of the current structure.
+
+        The snapshot is built once per ``version`` and shared until the
+        next node or edge is added or removed.
+        """
+        cached = self._snapshot
+        if cached is None or cached[0] != self.version:
+            cached = self._snapshot = (self.version, CSRGraph(self))
+        return cached[1]
+
     def get_node(self, uid: str) -> Node | None:
         """Get a node by its UID."""
         return self.nodes.get(uid)
@@ -284,15 +344,9 @@ class Graph:
             return []
 
         if relationship_type is None:
-            return list(self.adjacency_list.get(uid, set()))
-
-        # Filter by relationship type
-        neighbors = []
-        for edge in self.edges:
-            if edge.source_uid == uid and edge.relationship_type == relationship_type:
-                neighbors.append(edge.target_uid)
+            return list(self.adjacency_list[uid])
 
-        return neighbors
+        return list(self.out_edges[uid].get(relationship_type, ()))
 
     def get_incoming_neighbors(
         self, uid: str, relationship_type: str | None = None
@@ -310,17 +364,9 @@ class Graph:
             return []
 
         if relationship_type is None:
-            return list(self.reverse_adjacency_list.get(uid, set()))
+            return list(self.reverse_adjacency_list[uid])
 
-        # Filter by relationship type
-        neighbors = []
-        for edge in self.edges:
-            if edge.target_uid == uid and (
-                relationship_type is None or edge.relationship_type == relationship_type
-            ):
-                neighbors.append(edge.source_uid)
-
-        return neighbors
+        return list(self.in_edges[uid].get(relationship_type, ()))
 
     def get_edges_from_node(
         self, uid: str, relationship_type: str | None = None
@@ -334,13 +380,7 @@ class Graph:
         Returns:
             List of edges
         """
-        edges = []
-        for edge in self.edges:
-            if edge.source_uid == uid and (
-                relationship_type is None or edge.relationship_type == relationship_type
-            ):
-                edges.append(edge)
-        return edges
+        return _typed_edges(self.out_edges.get(uid), relationship_type)
 
     def get_edges_to_node(
         self, uid: str, relationship_type: str | None = None
@@ -354,13 +394,7 @@ class Graph:
         Returns:
             List of edges
         """
-        edges = []
-        for edge in self.edges:
-            if edge.target_uid == uid and (
-                relationship_type is None or edge.relationship_type == relationship_type
-            ):
-                edges.append(edge)
-        return edges
+        return _typed_edges(self.in_edges.get(uid), relationship_type)
 
     def get_subgraph(self, node_uids: list[str]) -> "Graph":
         """Get a subgraph containing only specified nodes.
@@ -379,9 +413,10 @@ class Graph:
                 subgraph.add_node(self.nodes[uid])
 
         # Add edges between included nodes
-        for edge in self.edges:
-            if edge.source_uid in node_uids and edge.target_uid in node_uids:
-                subgraph.add_edge(edge)
+        for uid in subgraph.nodes:
+            for edge in self.get_edges_from_node(uid):
+                if edge.target_uid in subgraph.nodes:
+                    subgraph.add_edge(edge)
 
         return subgraph
 
@@ -0,0 +1,197 @@
+"""Compact, frozen snapshot of a graph for whole-graph computations.
+
+Nodes are numbered 0..n-1 in ``Graph.nodes`` order and the distinct
+(source, target) pairs are stored in compressed sparse row form: the
+targets of node i are ``indices[indptr[i]:indptr[i + 1]]`` and
+``weights`` holds the summed edge weights of each pair. The same pairs
+are kept once more grouped by target (``in_indptr``/``in_indices``).
+
+Centrality measures then become NumPy operations over a few flat arrays
+instead of dictionary and list walks per node.
+"""
+
+import numpy as np
+
+
+class NodeInfo:
+    """Metadata of a snapshot node."""
+
+    __slots__ = ("node_type", "title", "uid")
+
+    def __init__(self, uid: str, title: str, node_type):
+        self.uid = uid
+        self.title = title
+        self.node_type = node_type
+
+    def __repr__(self):
+        return f"NodeInfo(uid='{self.uid}', title='{self.title}')"
+
+
+class CSRGraph:
+    """Read-only compressed sparse row form of a ``Graph``."""
+
+    __slots__ = (
+        "__weakref__",
+        "in_indices",
+        "in_indptr",
+        "index",
+        "indices",
+        "indptr",
+        "nodes",
+        "uids",
+        "weights",
+    )
+
+    def __init__(self, graph):
+        """Build the snapshot of ``graph``; later changes are not reflected."""
+        self.uids = list(graph.nodes)
+        self.index = {uid: i for i, uid in enumerate(self.uids)}
+        self.nodes = [
+            NodeInfo(node.uid, node.title, node.node_type)
+            for node in graph.nodes.values()
+        ]
+
+        n = len(self.uids)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        indices = []
+        weights = []
+        for i, uid in enumerate(self.uids):
+            # Several typed edges between two nodes form one weighted pair
+            pair_weights: dict[str, float] = {}
+            for edge in graph.get_edges_from_node(uid):
+                pair_weights[edge.target_uid] = (
+                    pair_weights.get(edge.target_uid, 0.0) + edge.weight
+                )
+            for target_uid, weight in pair_weights.items():
+                indices.append(self.index[target_uid])
+                weights.append(weight)
+            indptr[i + 1] = len(indices)
+
+        self.indptr = indptr
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+
+        # Transpose: group the same pairs by target
+        order = np.argsort(self.indices, kind="stable")
+        self.in_indices = self.sources()[order]
+        self.in_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(self.in_degree(), out=self.in_indptr[1:])
+
+    def __len__(self) -> int:
+        return len(self.uids)
+
+    @property
+    def edge_count(self) -> int:
+        """Number of distinct (source, target) pairs."""
+        return len(self.indices)
+
+    def sources(self) -> np.ndarray:
+        """Source node of every pair, aligned with ``indices``."""
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.out_degree())
+
+    def successors(self, i: int) -> np.ndarray:
+        """Targets of the pairs leaving node ``i``."""
+        return self.indices[self.indptr[i] : self.indptr[i + 1]]
+
+    def predecessors(self, i: int) -> np.ndarray:
+        """Sources of the pairs entering node ``i``."""
+        return self.in_indices[self.in_indptr[i] : self.in_indptr[i + 1]]
+
+    def successor_lists(self) -> list[list[int]]:
+        """Successors of every node as Python lists, for traversals."""
+        if not len(self):
+            return []
+        return [
+            chunk.tolist() for chunk in np.split(self.indices, self.indptr[1:-1])
+        ]
+
+    def predecessor_lists(self) -> list[list[int]]:
+        """Predecessors of every node as Python lists, for traversals."""
+        if not len(self):
+            return []
+        return [
+            chunk.tolist()
+            for chunk in np.split(self.in_indices, self.in_indptr[1:-1])
+        ]
+
+    def weak_components(self) -> np.ndarray:
+        """Number the weakly connected components in node order."""
+        n = len(self)
+        labels = np.full(n, -1, dtype=np.int64)
+        successors = self.successor_lists()
+        predecessors = self.predecessor_lists()
+        component = 0
+        for start in range(n):
+            if labels[start] >= 0:
+                continue
+            labels[start] = component
+            stack = [start]
+            while stack:
+                v = stack.pop()
+                for neighbors in (successors[v], predecessors[v]):
+                    for w in neighbors:
+                        if labels[w] < 0:
+                            labels[w] = component
+                            stack.append(w)
+            component += 1
+        return labels
+
+    def out_degree(self) -> np.ndarray:
+        """Number of distinct successors per node."""
+        return np.diff(self.indptr)
+
+    def in_degree(self) -> np.ndarray:
+        """Number of distinct predecessors per node."""
+        return np.bincount(self.indices, minlength=len(self))
+
+    def weighted_degree(self) -> np.ndarray:
+        """Summed weight of the edges leaving and entering each node."""
+        n = len(self)
+        outgoing = np.bincount(self.sources(), self.weights, minlength=n)
+        incoming = np.bincount(self.indices, self.weights, minlength=n)
+        return outgoing + incoming
+
+    def degree_centrality(self) -> np.ndarray:
+        """In plus out degree, normalized by its maximum ``2 * (n - 1)``."""
+        n = len(self)
+        if n <= 1:
+            return np.zeros(n)
+        return (self.out_degree() + self.in_degree()) / (2 * (n - 1))
+
+    def pagerank(
+        self,
+        damping_factor: float = 0.85,
+        max_iterations: int = 100,
+        tolerance: float = 1e-6,
+    ) -> np.ndarray:
+        """PageRank by power iteration over the pairs.
+
+        Every pair leaving a node gets an equal share of its score. The
+        score of nodes without successors is spread over all nodes, so the
+        scores always sum to 1. Iteration stops when the L1 change drops
+        below ``tolerance``.
+        """
+        n = len(self)
+        if n == 0:
+            return np.zeros(0)
+
+        out_degree = self.out_degree()
+        dangling = out_degree == 0
+        sources = self.sources()
+        share = 1.0 / out_degree[sources]
+
+        scores = np.full(n, 1.0 / n)
+        for _iteration in range(max_iterations):
+            flow = np.bincount(self.indices, scores[sources] * share, minlength=n)
+            new_scores = (1 - damping_factor) / n + damping_factor * (
+                flow + scores[dangling].sum() / n
+            )
+            diff = np.abs(new_scores - scores).sum()
+            scores = new_scores
+            if diff < tolerance:
+                break
+        return scores
+
+    def to_dict(self, values: np.ndarray) -> dict[str, float]:
+        """Map per-node values back to node UIDs."""
+        return dict(zip(self.uids, values.tolist(), strict=True))
@@ -1,16 +1,41 @@
-"""Graph storage implementation using Plone's catalog and relationship fields."""
+"""Graph storage implementation using Plone's catalog and relationship fields.
+
+The graph lives in an annotation on the portal and is stored incrementally:
+
+- ``nodes``: OOBTree of node UID -> node record
+- ``edges``: OOBTree of source UID -> OOBTree of (target UID, relationship
+  type) -> edge record, so each source node has its own bucket
+- ``incoming``: OOBTree of target UID -> OOTreeSet of (source UID,
+  relationship type), to find the edges pointing at a node
+- ``indexes``: ``by_type``, ``by_relationship`` and ``by_tag`` OOTreeSets,
+  kept up to date on every write
+
+``add_node``/``add_edge``/``remove_node``/``remove_edge`` only touch the
+records and buckets they change, and ``save_graph`` applies the difference
+between the stored graph and the one passed in. Writers changing different
+nodes therefore no longer rewrite the same objects, and the BTree buckets
+they do share resolve their conflicts on their own.
+
+Every write also bumps ``version``, a conflict-free ``Length``. Its
+``_p_serial`` is the id of the last transaction that changed the graph, so
+``read_graph`` can keep the materialized ``Graph`` in a process-wide cache
+that is replaced as soon as a newer commit is seen.
+"""
 
 from .model import Edge
 from .model import Graph
 from .model import Node
 from .model import NodeType
 from .relationships import RelationshipType
+from BTrees.Length import Length
 from BTrees.OOBTree import OOBTree
+from BTrees.OOBTree import OOTreeSet
 from persistent.dict import PersistentDict
-from persistent.list import PersistentList
 from zope.annotation.interfaces import IAnnotations
 from typing import Any
+from ZODB.utils import z64
 import json
+import threading
 
 from z3c.relationfield.interfaces import IRelationList
 from zope.security.interfaces import Unauthorized
@@ -19,6 +44,93 @@ from plone import api
 
 GRAPH_ANNOTATION_KEY = "knowledge.curator.graph"
 
+INDEX_NAMES = ("by_type", "by_relationship", "by_tag")
+
+# (database name, version oid) -> (transaction id, shared read-only Graph)
+_graph_cache: dict[tuple, tuple[bytes, Graph]] = {}
+_graph_cache_lock = threading.Lock()
+
+
+def clear_graph_cache():
+    """Drop all cached graphs of this process."""
+    with _graph_cache_lock:
+        _graph_cache.clear()
+
+
+def _isoformat(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def _properties(item, stored_apart: tuple[str, ...]) -> dict[str, Any]:
+    """Return the properties of a node or edge without the dated fields.
+
+    Node and Edge keep ``created``/``modified`` keyword arguments in their
+    properties as well; records hold them once, in their own fields.
+    """
+    return {
+        key: value for key, value in item.properties.items() if key not in stored_apart
+    }
+
+
+def _node_type(value):
+    """Return the NodeType for a stored type string, or the string itself."""
+    for nt in NodeType:
+        if nt.value == value:
+            return nt
+    return value
+
+
+def node_record(node: Node) -> dict[str, Any]:
+    """Return the stored form of a node."""
+    return {
+        "uid": node.uid,
+        "title": node.title,
+        "type": node.node_type.value
+        if hasattr(node.node_type, "value")
+        else node.node_type,
+        "properties": _properties(node, ("created", "modified")),
+        "created": _isoformat(node.created),
+        "modified": _isoformat(node.modified),
+    }
+
+
+def edge_record(edge: Edge) -> dict[str, Any]:
+    """Return the stored form of an edge."""
+    return {
+        "source": edge.source_uid,
+        "target": edge.target_uid,
+        "type": edge.relationship_type,
+        "weight": edge.weight,
+        "properties": _properties(edge, ("created",)),
+        "created": _isoformat(edge.created),
+    }
+
+
+def node_from_record(record) -> Node:
+    """Build a Node from its stored form."""
+    properties = dict(record.get("properties", {}))
+    properties["created"] = record.get("created")
+    properties["modified"] = record.get("modified")
+    return Node(
+        uid=record["uid"],
+        title=record["title"],
+        node_type=_node_type(record["type"]),
+        **properties,
+    )
+
+
+def edge_from_record(record) -> Edge:
+    """Build an Edge from its stored form."""
+    properties = dict(record.get("properties", {}))
+    properties["created"] = record.get("created")
+    return Edge(
+        source_uid=record["source"],
+        target_uid=record["target"],
+        relationship_type=record["type"],
+        weight=record.get("weight", 1.0),
+        **properties,
+    )
+
 
 class GraphStorage:
     """Storage backend for the knowledge graph using Plone's infrastructure."""
@@ -33,71 +145,281 @@ class GraphStorage:
         self._ensure_storage()
 
     def _ensure_storage(self):
-        """Ensure annotation storage exists."""
+        """Create the annotation storage if the portal has none yet.
+
+        Storage in an older layout is converted by ``migrate``.
+        """
         annotations = IAnnotations(self.context)
         if GRAPH_ANNOTATION_KEY not in annotations:
             annotations[GRAPH_ANNOTATION_KEY] = OOBTree()
             annotations[GRAPH_ANNOTATION_KEY]["nodes"] = OOBTree()
-            annotations[GRAPH_ANNOTATION_KEY]["edges"] = PersistentList()
+            annotations[GRAPH_ANNOTATION_KEY]["edges"] = OOBTree()
+            annotations[GRAPH_ANNOTATION_KEY]["incoming"] = OOBTree()
             annotations[GRAPH_ANNOTATION_KEY]["indexes"] = OOBTree()
             annotations[GRAPH_ANNOTATION_KEY]["metadata"] = PersistentDict()
+            annotations[GRAPH_ANNOTATION_KEY]["node_count"] = Length()
+            annotations[GRAPH_ANNOTATION_KEY]["edge_count"] = Length()
+            annotations[GRAPH_ANNOTATION_KEY]["version"] = Length()
+            self._rebuild_indexes()
 
     def _get_storage(self):
         """Get the annotation storage."""
         annotations = IAnnotations(self.context)
         return annotations[GRAPH_ANNOTATION_KEY]
 
+    def migrate(self) -> bool:
+        """Convert storage written by earlier versions to the current layout.
+
+        Run by the ``knowledge.curator`` upgrade step, never on reads.
+
+        Returns:
+            True if the storage was changed
+        """
+        storage = self._get_storage()
+        if "incoming" not in storage:
+            self._migrate_storage()
+            return True
+        if "version" not in storage:
+            # Incremental layout from before versioned reads
+            storage["version"] = Length()
+            return True
+        return False
+
+    def _migrate_storage(self):
+        """Move edges from the single edge list into per-source buckets."""
+        storage = self._get_storage()
+        old_edges = list(storage["edges"])
+        storage["edges"] = OOBTree()
+        storage["incoming"] = OOBTree()
+        storage["node_count"] = Length(len(storage["nodes"]))
+        storage["edge_count"] = Length()
+        storage["version"] = Length()
+        self._rebuild_indexes()
+        for record in old_edges:
+            source = record["source"]
+            target = record["target"]
+            if source not in storage["nodes"] or target not in storage["nodes"]:
+                continue
+            self._write_edge(source, target, record["type"], dict(record))
+
+    def get_node(self, uid: str) -> Node | None:
+        """Get a stored node by its UID."""
+        record = self._get_storage()["nodes"].get(uid)
+        return node_from_record(record) if record is not None else None
+
+    def has_node(self, uid: str) -> bool:
+        """Tell whether a node is stored."""
+        return uid in self._get_storage()["nodes"]
+
+    def get_edge(
+        self, source_uid: str, target_uid: str, relationship_type: str
+    ) -> Edge | None:
+        """Get a stored edge by its endpoints and type."""
+        bucket = self._get_storage()["edges"].get(source_uid)
+        if bucket is None:
+            return None
+        record = bucket.get((target_uid, relationship_type))
+        return edge_from_record(record) if record is not None else None
+
+    def add_node(self, node: Node) -> bool:
+        """Store a new node.
+
+        Returns:
+            True if node was added, False if already exists
+        """
+        if self.has_node(node.uid):
+            return False
+        return self._write_node(node_record(node))
+
+    def update_node(self, node: Node) -> bool:
+        """Store a node, adding it or replacing its record.
+
+        Returns:
+            True if the stored record changed
+        """
+        return self._write_node(node_record(node))
+
+    def remove_node(self, uid: str) -> bool:
+        """Remove a node and every edge from or to it.
+
+        Returns:
+            True if node was removed, False if not found
+        """
+        storage = self._get_storage()
+        record = storage["nodes"].get(uid)
+        if record is None:
+            return False
+
+        for target, rel_type in list(storage["edges"].get(uid, {}).keys()):
+            self.remove_edge(uid, target, rel_type)
+        for source, rel_type in list(storage["incoming"].get(uid, ())):
+            self.remove_edge(source, uid, rel_type)
+        storage["edges"].pop(uid, None)
+        storage["incoming"].pop(uid, None)
+
+        self._unindex(storage["indexes"]["by_type"], record["type"], uid)
+        del storage["nodes"][uid]
+        storage["node_count"].change(-1)
+        storage["version"].change(1)
+        return True
+
+    def add_edge(self, edge: Edge) -> bool:
+        """Store a new edge between stored nodes.
+
+        Returns:
+            True if edge was added, False if already exists or nodes don't exist
+        """
+        if self.get_edge(edge.source_uid, edge.target_uid, edge.relationship_type):
+            return False
+        return self.update_edge(edge)
+
+    def update_edge(self, edge: Edge) -> bool:
+        """Store an edge between stored nodes, adding or replacing it.
+
+        Returns:
+            True if the stored record changed
+        """
+        if not (self.has_node(edge.source_uid) and self.has_node(edge.target_uid)):
+            return False
+        return self._write_edge(
+            edge.source_uid, edge.target_uid, edge.relationship_type, edge_record(edge)
+        )
+
+    def remove_edge(
+        self, source_uid: str, target_uid: str, relationship_type: str
+    ) -> bool:
+        """Remove an edge.
+
+        Returns:
+            True if edge was removed, False if not found
+        """
+        storage = self._get_storage()
+        bucket = storage["edges"].get(source_uid)
+        key = (target_uid, relationship_type)
+        if bucket is None or key not in bucket:
+            return False
+
+        del bucket[key]
+        if not bucket:
+            del storage["edges"][source_uid]
+        incoming = storage["incoming"].get(target_uid)
+        if incoming is not None:
+            incoming.remove((source_uid, relationship_type))
+            if not incoming:
+                del storage["incoming"][target_uid]
+
+        indexes = storage["indexes"]
+        self._unindex(
+            indexes["by_relationship"], relationship_type, (source_uid, target_uid)
+        )
+        if relationship_type == RelationshipType.TAGGED_WITH.value:
+            self._unindex(indexes["by_tag"], target_uid, source_uid)
+        storage["edge_count"].change(-1)
+        storage["version"].change(1)
+        return True
+
+    def _write_node(self, record: dict[str, Any]) -> bool:
+        """Write a node record unless the stored one is identical."""
+        storage = self._get_storage()
+        uid = record["uid"]
+        current = storage["nodes"].get(uid)
+        by_type = storage["indexes"]["by_type"]
+        if current is None:
+            storage["nodes"][uid] = PersistentDict(record)
+            storage["node_count"].change(1)
+        elif dict(current) == record:
+            return False
+        else:
+            if current["type"] != record["type"]:
+                self._unindex(by_type, current["type"], uid)
+            # Update in place: only this record is written, not the BTree
+            current.update(record)
+        self._index(by_type, record["type"], uid)
+        storage["version"].change(1)
+        return True
+
+    def _write_edge(
+        self, source: str, target: str, rel_type: str, record: dict[str, Any]
+    ) -> bool:
+        """Write an edge record unless the stored one is identical."""
+        storage = self._get_storage()
+        bucket = storage["edges"].get(source)
+        if bucket is None:
+            bucket = storage["edges"][source] = OOBTree()
+        key = (target, rel_type)
+        current = bucket.get(key)
+        if current == record:
+            return False
+        bucket[key] = record
+        storage["version"].change(1)
+        if current is not None:
+            return True
+
+        incoming = storage["incoming"].get(target)
+        if incoming is None:
+            incoming = storage["incoming"][target] = OOTreeSet()
+        incoming.insert((source, rel_type))
+
+        indexes = storage["indexes"]
+        self._index(indexes["by_relationship"], rel_type, (source, target))
+        if rel_type == RelationshipType.TAGGED_WITH.value:
+            self._index(indexes["by_tag"], target, source)
+        storage["edge_count"].change(1)
+        return True
+
+    def _index(self, index, key, value):
+        entries = index.get(key)
+        if entries is None:
+            entries = index[key] = OOTreeSet()
+        entries.insert(value)
+
+    def _unindex(self, index, key, value):
+        entries = index.get(key)
+        if entries is not None and value in entries:
+            entries.remove(value)
+            if not entries:
+                del index[key]
+
     def save_graph(self, graph: Graph):
         """Save a graph to persistent storage.
 
+        Only the difference to the stored graph is written: records of
+        unchanged nodes and edges, and buckets of sources whose edges did
+        not change, are left alone.
+
         Args:
             graph: Graph instance to save
         """
         storage = self._get_storage()
 
-        # Clear existing data
-        storage["nodes"].clear()
-        storage["edges"][:] = []
-
-        # Save nodes
-        for uid, node in graph.nodes.items():
-            node_data = {
-                "uid": node.uid,
-                "title": node.title,
-                "type": node.node_type.value
-                if hasattr(node.node_type, "value")
-                else node.node_type,
-                "properties": dict(node.properties),
-                "created": node.created.isoformat()
-                if hasattr(node.created, "isoformat")
-                else node.created,
-                "modified": node.modified.isoformat()
-                if hasattr(node.modified, "isoformat")
-                else node.modified,
-            }
-            storage["nodes"][uid] = PersistentDict(node_data)
-
-        # Save edges
-        for edge in graph.edges:
-            edge_data = {
-                "source": edge.source_uid,
-                "target": edge.target_uid,
-                "type": edge.relationship_type,
-                "weight": edge.weight,
-                "properties": dict(edge.properties),
-                "created": edge.created.isoformat()
-                if hasattr(edge.created, "isoformat")
-                else edge.created,
-            }
-            storage["edges"].append(PersistentDict(edge_data))
-
-        # Update indexes
-        self._rebuild_indexes()
+        changed = 0
+        for uid in [uid for uid in storage["nodes"] if uid not in graph.nodes]:
+            changed += self.remove_node(uid)
+        for node in graph.nodes.values():
+            changed += self._write_node(node_record(node))
 
-        # Update metadata
+        wanted: dict[str, dict[tuple, Edge]] = {}
+        for edge in graph.edges:
+            wanted.setdefault(edge.source_uid, {})[
+                (edge.target_uid, edge.relationship_type)
+            ] = edge
+        for source in list(storage["edges"].keys()):
+            edges = wanted.get(source, {})
+            for key in [key for key in storage["edges"][source] if key not in edges]:
+                changed += self.remove_edge(source, *key)
+        for source, edges in wanted.items():
+            for (target, rel_type), edge in edges.items():
+                changed += self._write_edge(source, target, rel_type, edge_record(edge))
+
+        if changed:
+            self._touch()
+
+    def _touch(self):
+        """Record the time of the last bulk change."""
+        storage = self._get_storage()
         storage["metadata"]["last_modified"] = api.portal.get_localized_time()
-        storage["metadata"]["node_count"] = len(graph.nodes)
-        storage["metadata"]["edge_count"] = len(graph.edges)
+        storage["metadata"]["node_count"] = storage["node_count"]()
+        storage["metadata"]["edge_count"] = storage["edge_count"]()
 
     def load_graph(self) -> Graph:
         """Load graph from persistent storage.
@@ -108,43 +430,52 @@ class GraphStorage:
         storage = self._get_storage()
         graph = Graph()
 
-        # Load nodes
-        for _uid, node_data in storage["nodes"].items():
-            # Convert node type string to NodeType enum if possible
-            node_type = node_data["type"]
-            for nt in NodeType:
-                if nt.value == node_type:
-                    node_type = nt
-                    break
-
-            node = Node(
-                uid=node_data["uid"],
-                title=node_data["title"],
-                node_type=node_type,
-                created=node_data.get("created"),
-                modified=node_data.get("modified"),
-                **dict(node_data.get("properties", {})),
-            )
-            graph.add_node(node)
-
-        # Load edges
-        for edge_data in storage["edges"]:
-            edge = Edge(
-                source_uid=edge_data["source"],
-                target_uid=edge_data["target"],
-                relationship_type=edge_data["type"],
-                weight=edge_data.get("weight", 1.0),
-                created=edge_data.get("created"),
-                **dict(edge_data.get("properties", {})),
-            )
-            graph.add_edge(edge)
+        for record in storage["nodes"].values():
+            graph.add_node(node_from_record(record))
+
+        for bucket in storage["edges"].values():
+            for record in bucket.values():
+                graph.add_edge(edge_from_record(record))
+
+        return graph
+
+    def read_graph(self) -> Graph:
+        """Return the stored graph, shared with other requests of the process.
 
+        The graph is materialized once per committed version and cached;
+        treat it as read-only and use ``load_graph`` for a copy to change.
+        Uncommitted changes of the current transaction bypass the cache.
+        """
+        version = self._get_storage()["version"]
+        version._p_activate()
+        jar = getattr(version, "_p_jar", None)
+        if jar is None or version._p_changed or version._p_serial == z64:
+            return self.load_graph()
+
+        key = (jar.db().database_name, version._p_oid)
+        serial = version._p_serial
+        with _graph_cache_lock:
+            cached = _graph_cache.get(key)
+        if cached is not None and cached[0] == serial:
+            return cached[1]
+
+        graph = self.load_graph()
+        with _graph_cache_lock:
+            # Connections reading an older snapshot must not evict a newer graph
+            cached = _graph_cache.get(key)
+            if cached is None or cached[0] < serial:
+                _graph_cache[key] = (serial, graph)
         return graph
 
     def sync_with_catalog(self):
-        """Synchronize graph with Plone catalog content."""
+        """Synchronize graph with Plone catalog content.
+
+        Works on the stored records directly, so only nodes whose catalog
+        data changed and edges that are new get written.
+        """
         catalog = api.portal.get_tool("portal_catalog")
-        graph = self.load_graph()
+        # Every stored change bumps the version
+        version = self._get_storage()["version"]()
 
         # Get all knowledge content
         brains = catalog(
@@ -159,14 +490,22 @@ class GraphStorage:
             existing_uids.add(uid)
 
             # Update or create node
-            node = graph.get_node(uid)
+            node = self.get_node(uid)
             if node:
-                # Update existing node
-                node.title = brain.Title
-                node.update_property("url", brain.getURL())
-                node.update_property("description", brain.Description)
-                node.update_property("review_state", brain.review_state)
-                node.update_property("portal_type", brain.portal_type)
+                # Update existing node, if anything changed
+                values = {
+                    "url": brain.getURL(),
+                    "description": brain.Description,
+                    "review_state": brain.review_state,
+                    "portal_type": brain.portal_type,
+                }
+                if node.title != brain.Title or any(
+                    node.get_property(key) != value for key, value in values.items()
+                ):
+                    node.title = brain.Title
+                    for key, value in values.items():
+                        node.update_property(key, value)
+                    self.update_node(node)
             else:
                 # Create new node
                 node_type_map = {
@@ -189,26 +528,28 @@ class GraphStorage:
                     created=brain.created,
                     modified=brain.modified,
                 )
-                graph.add_node(node)
+                self.add_node(node)
 
-            # Sync relationships from content
+            # Sync relationships from content; the storage offers the
+            # get_node/add_node/add_edge subset of the Graph API they use
             try:
                 obj = brain.getObject()
-                self._sync_content_relationships(graph, obj, uid)
+                self._sync_content_relationships(self, obj, uid)
             except (AttributeError, Unauthorized):
                 # Object might be inaccessible
                 pass
 
         # Remove nodes for deleted content
         nodes_to_remove = []
-        for uid in graph.nodes:
+        for uid in self._get_storage()["nodes"]:
             if uid not in existing_uids and not uid.startswith(("concept_", "tag_")):
                 nodes_to_remove.append(uid)
 
         for uid in nodes_to_remove:
-            graph.remove_node(uid)
+            self.remove_node(uid)
 
-        self.save_graph(graph)
+        if self._get_storage()["version"]() != version:
+            self._touch()
 
     def _sync_connections(self, graph, obj, uid):
         """Sync 'connections' and 'related_notes' fields."""
@@ -243,47 +584,32 @@ class GraphStorage:
                             )
                         )
 
-    def _sync_content_relationships(self, graph: Graph, obj, uid: str):
-        """Sync relationships from content object to graph."""
+    def _sync_content_relationships(self, graph, obj, uid: str):
+        """Sync relationships from content object to a Graph or this storage."""
         self._sync_connections(graph, obj, uid)
         self._sync_tags(graph, obj, uid)
         self._sync_related_items(graph, obj, uid)
 
     def _rebuild_indexes(self):
-        """Rebuild graph indexes for efficient querying."""
+        """Rebuild graph indexes from the stored nodes and edges."""
         storage = self._get_storage()
         indexes = storage["indexes"]
 
         # Clear existing indexes
         indexes.clear()
+        for name in INDEX_NAMES:
+            indexes[name] = OOBTree()
 
         # Node type index
-        indexes["by_type"] = OOBTree()
-        for uid, node_data in storage["nodes"].items():
-            node_type = node_data["type"]
-            if node_type not in indexes["by_type"]:
-                indexes["by_type"][node_type] = PersistentList()
-            indexes["by_type"][node_type].append(uid)
-
-        # Relationship type index
-        indexes["by_relationship"] = OOBTree()
-        for edge_data in storage["edges"]:
-            rel_type = edge_data["type"]
-            if rel_type not in indexes["by_relationship"]:
-                indexes["by_relationship"][rel_type] = PersistentList()
-            indexes["by_relationship"][rel_type].append((
-                edge_data["source"],
-                edge_data["target"],
-            ))
-
-        # Tag index
-        indexes["by_tag"] = OOBTree()
-        for edge_data in storage["edges"]:
-            if edge_data["type"] == RelationshipType.TAGGED_WITH.value:
-                tag_uid = edge_data["target"]
-                if tag_uid not in indexes["by_tag"]:
-                    indexes["by_tag"][tag_uid] = PersistentList()
-                indexes["by_tag"][tag_uid].append(edge_data["source"])
+        for uid, record in storage["nodes"].items():
+            self._index(indexes["by_type"], record["type"], uid)
+
+        # Relationship type and tag indexes
+        for source, bucket in storage["edges"].items():
+            for target, rel_type in bucket:
+                self._index(indexes["by_relationship"], rel_type, (source, target))
+                if rel_type == RelationshipType.TAGGED_WITH.value:
+                    self._index(indexes["by_tag"], target, source)
 
     def query_nodes(
         self, node_type: str | None = None, properties: dict[str, Any] | None = None
@@ -297,38 +623,27 @@ class GraphStorage:
         Returns:
             List of matching nodes
         """
-        graph = self.load_graph()
+        storage = self._get_storage()
         results = []
 
         # Get candidates by type
         if node_type:
-            storage = self._get_storage()
-            if (
-                "by_type" in storage["indexes"]
-                and node_type in storage["indexes"]["by_type"]
-            ):
-                candidates = storage["indexes"]["by_type"][node_type]
-            else:
-                candidates = []
+            candidates = storage["indexes"]["by_type"].get(node_type, ())
         else:
-            candidates = graph.nodes.keys()
+            candidates = storage["nodes"].keys()
 
         # Filter by properties
         for uid in candidates:
-            node = graph.get_node(uid)
-            if not node:
+            record = storage["nodes"].get(uid)
+            if record is None:
                 continue
 
             if properties:
-                match = True
-                for key, value in properties.items():
-                    if node.get_property(key) != value:
-                        match = False
-                        break
-                if not match:
+                stored = record.get("properties", {})
+                if any(stored.get(key) != value for key, value in properties.items()):
                     continue
 
-            results.append(node)
+            results.append(node_from_record(record))
 
         return results
 
@@ -348,19 +663,39 @@ class GraphStorage:
         Returns:
             List of matching edges
         """
-        graph = self.load_graph()
-        results = []
+        storage = self._get_storage()
 
-        for edge in graph.edges:
+        # Read only the buckets that can hold matches
+        if source_uid:
+            keys = [(source_uid, key) for key in storage["edges"].get(source_uid, ())]
+        elif target_uid:
+            keys = [
+                (source, (target_uid, rel_type))
+                for source, rel_type in storage["incoming"].get(target_uid, ())
+            ]
+        elif relationship_type:
+            keys = [
+                (source, (target, relationship_type))
+                for source, target in storage["indexes"]["by_relationship"].get(
+                    relationship_type, ()
+                )
+            ]
+        else:
+            keys = [
+                (source, key)
+                for source, bucket in storage["edges"].items()
+                for key in bucket
+            ]
+
+        results = []
+        for source, (target, rel_type) in keys:
             # Apply filters
-            if relationship_type and edge.relationship_type != relationship_type:
-                continue
-            if source_uid and edge.source_uid != source_uid:
+            if relationship_type and rel_type != relationship_type:
                 continue
-            if target_uid and edge.target_uid != target_uid:
+            if target_uid and target != target_uid:
                 continue
-
-            results.append(edge)
+            record = storage["edges"][source][(target, rel_type)]
+            results.append(edge_from_record(record))
 
         return results
 
@@ -375,13 +710,12 @@ class GraphStorage:
         """
         tag_uid = f"tag_{tag.lower().replace(' ', '_')}"
         storage = self._get_storage()
-        graph = self.load_graph()
 
-        if "by_tag" in storage["indexes"] and tag_uid in storage["indexes"]["by_tag"]:
-            node_uids = storage["indexes"]["by_tag"][tag_uid]
-            return [graph.get_node(uid) for uid in node_uids if graph.get_node(uid)]
-
-        return []
+        return [
+            node_from_record(storage["nodes"][uid])
+            for uid in storage["indexes"]["by_tag"].get(tag_uid, ())
+            if uid in storage["nodes"]
+        ]
 
     def export_graph(self, file_format: str = "json") -> str:
         """Export graph to various formats.
@@ -392,7 +726,7 @@ class GraphStorage:
         Returns:
             Serialized graph data
         """
-        graph = self.load_graph()
+        graph = self.read_graph()
 
         if file_format == "json":
             return json.dumps(graph.to_dict(), indent=2)
@@ -458,6 +792,9 @@ class GraphStorage:
     def import_graph(self, data: str, file_format: str = "json", merge: bool = True):
         """Import graph from various formats.
 
+        When merging, existing nodes and edges are kept and only new ones are
+        written.
+
         Args:
             data: Graph data to import
             file_format: Input file_format ('json')
@@ -467,27 +804,21 @@ class GraphStorage:
         if file_format == "json":
             import_data = json.loads(data)
 
-            graph = self.load_graph() if merge else Graph()
+            target = self if merge else Graph()
 
             # Import nodes
             for node_data in import_data.get("nodes", []):
-                node_type = node_data["type"]
-                for nt in NodeType:
-                    if nt.value == node_type:
-                        node_type = nt
-                        break
-
-                properties = node_data.get("properties", {})
+                properties = dict(node_data.get("properties", {}))
                 properties["created"] = node_data.get("created")
                 properties["modified"] = node_data.get("modified")
 
                 node = Node(
                     uid=node_data["uid"],
                     title=node_data["title"],
-                    node_type=node_type,
+                    node_type=_node_type(node_data["type"]),
                     **properties,
                 )
-                graph.add_node(node)
+                target.add_node(node)
 
             # Import edges
             for edge_data in import_data.get("edges", []):
@@ -498,9 +829,12 @@ class GraphStorage:
                     weight=edge_data.get("weight", 1.0),
                     **edge_data.get("properties", {}),
                 )
-                graph.add_edge(edge)
+                target.add_edge(edge)
 
-            self.save_graph(graph)
+            if merge:
+                self._touch()
+            else:
+                self.save_graph(target)
 
         else:
             raise ValueError(f"Unsupported format: {file_format}")
@@ -512,32 +846,21 @@ class GraphStorage:
             Dictionary with graph statistics
         """
         storage = self._get_storage()
-        graph = self.load_graph()
-
-        # Count by node type
-        node_types = {}
-        for node in graph.nodes.values():
-            node_type = (
-                node.node_type.value
-                if hasattr(node.node_type, "value")
-                else node.node_type
-            )
-            node_types[node_type] = node_types.get(node_type, 0) + 1
-
-        # Count by relationship type
-        rel_types = {}
-        for edge in graph.edges:
-            rel_types[edge.relationship_type] = (
-                rel_types.get(edge.relationship_type, 0) + 1
-            )
+        indexes = storage["indexes"]
+        node_count = storage["node_count"]()
+        edge_count = storage["edge_count"]()
 
         return {
-            "total_nodes": len(graph.nodes),
-            "total_edges": len(graph.edges),
-            "node_types": node_types,
-            "relationship_types": rel_types,
+            "total_nodes": node_count,
+            "total_edges": edge_count,
+            "node_types": {
+                node_type: len(uids) for node_type, uids in indexes["by_type"].items()
+            },
+            "relationship_types": {
+                rel_type: len(pairs)
+                for rel_type, pairs in indexes["by_relationship"].items()
+            },
             "last_modified": storage["metadata"].get("last_modified"),
-            "average_degree": len(graph.edges) * 2 / len(graph.nodes)
-            if graph.nodes
-            else 0,
+            "version": storage["version"](),
+            "average_degree": edge_count * 2 / node_count if node_count else 0,
         }
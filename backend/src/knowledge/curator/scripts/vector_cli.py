@@ -37,10 +37,14 @@ def cmd_rebuild(args, manager):
     result = manager.rebuild_index(
         content_types=args.content_types.split(",") if args.content_types else None,
         clear_first=args.clear,
+        resume=args.resume,
     )
 
     if result["success"]:
         print("✓ Index rebuilt successfully")
+        print(f"  - Collection: {result['collection']}")
+        if result["resumed"]:
+            print("  - Resumed from checkpoint")
         print(f"  - Processed: {result['processed']} items")
         print(f"  - Errors: {result['errors']}")
         print(f"  - Duration: {result['duration_seconds']:.2f} seconds")
@@ -49,6 +53,123 @@ def cmd_rebuild(args, manager):
         sys.exit(1)
 
 
+def cmd_migrate(args, manager):
+    """Re-embed all content with another model and flip the alias to it."""
+    print(f"Migrating from {manager.embeddings.model_name} to {args.model}...")
+    print("Search keeps using the current collection until the migration ends")
+
+    result = manager.migrate_model(
+        args.model,
+        content_types=args.content_types.split(",") if args.content_types else None,
+        resume=args.resume,
+        keep_previous=args.keep_previous,
+    )
+
+    if result["success"]:
+        print("✓ Migration completed successfully")
+        print(f"  - Collection: {result['collection']}")
+        print(f"  - Processed: {result['processed']} items")
+        print(f"  - Errors: {result['errors']}")
+        print(f"  - Duration: {result['duration_seconds']:.2f} seconds")
+        if result["previous_collection"] and args.keep_previous:
+            print(f"  - Previous collection kept: {result['previous_collection']}")
+    else:
+        print(f"✗ Migration failed: {result.get('error')}")
+        sys.exit(1)
+
+
+def cmd_reconcile(args, manager):
+    """Re-index or delete only the vectors that drifted from the catalog."""
+    mode = "Checking" if args.dry_run else "Reconciling"
+    print(f"{mode} vector index against the catalog...")
+
+    result = manager.reconcile(
+        content_types=args.content_types.split(",") if args.content_types else None,
+        dry_run=args.dry_run,
+        batch_size=args.batch_size,
+    )
+
+    if "error" in result:
+        print(f"✗ Reconciliation failed: {result['error']}")
+        sys.exit(1)
+
+    print(f"  - Catalog items: {result['catalog_items']}")
+    print(f"  - Indexed items: {result['indexed_items']}")
+    for category in ("missing", "stale", "orphaned"):
+        print(f"  - {category.capitalize()}: {result[category]}")
+        for uid in result["samples"][category]:
+            print(f"      {uid}")
+
+    if args.dry_run:
+        print("Dry run, nothing changed")
+    elif result["success"]:
+        print("✓ Index reconciled")
+        print(f"  - Re-indexed: {result['indexed']} items")
+        print(f"  - Deleted: {result['deleted']} vectors")
+        print(f"  - Errors: {result['errors']}")
+        print(f"  - Duration: {result['duration_seconds']:.2f} seconds")
+    else:
+        print("✗ Some changes could not be applied")
+        sys.exit(1)
+
+
+def cmd_benchmark(args, manager):
+    """Compare recall, latency and memory of index settings."""
+    print("Benchmarking index settings on a copy of the collection...")
+
+    result = manager.benchmark_index_settings(
+        names=args.settings.split(",") if args.settings else None,
+        queries=args.queries,
+        limit=args.limit,
+        progress=lambda message: print(f"  {message}"),
+    )
+
+    if not result["success"]:
+        print(f"✗ Benchmark failed: {result['error']}")
+        sys.exit(1)
+
+    recall = f"recall@{args.limit}"
+    print(
+        f"\n{'Setting':<18} {recall:>10} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'RAM MB':>10} {'Disk MB':>10}"
+    )
+    print("-" * 71)
+    for row in result["results"]:
+        print(
+            f"{row['name']:<18} {row[recall]:>10} {row['latency_p50_ms']:>9} "
+            f"{row['latency_p95_ms']:>9} {row['ram_mb']:>10} {row['disk_mb']:>10}"
+        )
+
+
+def cmd_benchmark_embeddings(args, manager):
+    """Compare throughput, memory and agreement of embedding backends."""
+    print("Benchmarking embedding backends...")
+
+    result = manager.benchmark_embeddings(
+        backends=args.backends.split(",") if args.backends else None,
+        sample_size=args.texts,
+        progress=lambda message: print(f"  {message}"),
+    )
+
+    if not result["success"]:
+        print(f"✗ Benchmark failed: {result['error']}")
+        sys.exit(1)
+
+    print(f"\nModel: {result['model']}, {result['texts']} texts")
+    print(
+        f"{'Backend':<12} {'texts/s':>9} {'load s':>8} {'RSS MB':>8} "
+        f"{'mean cos':>9} {'min cos':>9}  compatible"
+    )
+    print("-" * 72)
+    for row in result["results"]:
+        print(
+            f"{row['backend']:<12} {row['texts_per_second']:>9} "
+            f"{row['load_seconds']:>8} {row['rss_mb']:>8} "
+            f"{row['mean_cosine']:>9} {row['min_cosine']:>9}  "
+            f"{'yes' if row['compatible'] else 'NO'}"
+        )
+
+
 def cmd_stats(args, manager):
     """Show database statistics."""
     stats = manager.get_database_stats()
@@ -119,10 +240,39 @@ def cmd_search(args, search):
             print(f"   Description: {result['description'][:100]}...")
 
 
+def cmd_duplicates(args, search):
+    """Find groups of near-duplicate content."""
+    print(f"Finding duplicates with similarity >= {args.threshold}...")
+
+    def progress(done, total):
+        print(f"\r  Compared {done}/{total} items", end="", flush=True)
+
+    groups = search.find_duplicates(
+        score_threshold=args.threshold,
+        content_types=args.content_types.split(",") if args.content_types else None,
+        block_size=args.block_size,
+        progress=progress,
+    )
+
+    print(f"\n\nFound {len(groups)} duplicate groups:")
+    print("-" * 60)
+
+    for i, group in enumerate(groups, 1):
+        print(f"\n{i}. {group[0]['title']} ({group[0]['content_type']})")
+        print(f"   Path: {group[0]['path']}")
+        for item in group[1:]:
+            print(f"   - {item['score']:.3f} {item['title']}")
+            print(f"     Path: {item['path']}")
+
+
 def cmd_backup(args, manager):
     """Backup vector data."""
     print(f"Backing up vectors to: {args.output}")
-    success = manager.backup_vectors(args.output)
+    success = manager.backup_vectors(
+        args.output,
+        dtype="float16" if args.float16 else "float32",
+        compression=args.compression,
+    )
 
     if success:
         print("✓ Backup completed successfully")
@@ -175,6 +325,80 @@ def main():
         action="store_false",
         help="Don't clear existing vectors",
     )
+    parser_rebuild.add_argument(
+        "--no-resume",
+        dest="resume",
+        action="store_false",
+        help="Ignore the checkpoint of an interrupted rebuild",
+    )
+
+    # Migrate command
+    parser_migrate = subparsers.add_parser(
+        "migrate", help="Switch to another embedding model without downtime"
+    )
+    parser_migrate.add_argument("model", help="Embedding model name")
+    parser_migrate.add_argument(
+        "--content-types", help="Comma-separated content types (default: all)"
+    )
+    parser_migrate.add_argument(
+        "--no-resume",
+        dest="resume",
+        action="store_false",
+        help="Ignore the checkpoint of an interrupted migration",
+    )
+    parser_migrate.add_argument(
+        "--drop-previous",
+        dest="keep_previous",
+        action="store_false",
+        help="Delete the previous collection instead of keeping it for rollback",
+    )
+
+    # Reconcile command
+    parser_reconcile = subparsers.add_parser(
+        "reconcile", help="Fix vectors that are missing, stale or orphaned"
+    )
+    parser_reconcile.add_argument(
+        "--content-types", help="Comma-separated content types (default: all)"
+    )
+    parser_reconcile.add_argument(
+        "--dry-run", action="store_true", help="Only report the differences"
+    )
+    parser_reconcile.add_argument(
+        "--batch-size",
+        type=int,
+        default=100,
+        help="Items re-embedded per batch (default: 100)",
+    )
+
+    # Benchmark command
+    parser_benchmark = subparsers.add_parser(
+        "benchmark", help="Compare recall, latency and memory of index settings"
+    )
+    parser_benchmark.add_argument(
+        "--settings",
+        help="Comma-separated settings, e.g. float32,scalar,product_x16 "
+        "(default: all)",
+    )
+    parser_benchmark.add_argument(
+        "--queries", type=int, default=100, help="Sampled queries (default: 100)"
+    )
+    parser_benchmark.add_argument(
+        "--limit", type=int, default=10, help="Hits per query (default: 10)"
+    )
+
+    # Embedding backend benchmark command
+    parser_benchmark_embeddings = subparsers.add_parser(
+        "benchmark-embeddings",
+        help="Compare texts/sec, memory and agreement of embedding backends",
+    )
+    parser_benchmark_embeddings.add_argument(
+        "--backends",
+        help="Comma-separated backends, the first is the reference "
+        "(default: torch,onnx,onnx-int8)",
+    )
+    parser_benchmark_embeddings.add_argument(
+        "--texts", type=int, default=500, help="Content items embedded (default: 500)"
+    )
 
     # Stats command
     _parser_stats = subparsers.add_parser("stats", help="Show database statistics")
@@ -195,13 +419,46 @@ def main():
         help="Similarity threshold (default: 0.5)",
     )
 
+    # Duplicates command
+    parser_duplicates = subparsers.add_parser(
+        "duplicates", help="Find groups of near-duplicate content"
+    )
+    parser_duplicates.add_argument(
+        "--threshold",
+        type=float,
+        default=0.9,
+        help="Similarity threshold (default: 0.9)",
+    )
+    parser_duplicates.add_argument(
+        "--content-types", help="Comma-separated content types (default: all)"
+    )
+    parser_duplicates.add_argument(
+        "--block-size",
+        type=int,
+        default=256,
+        help="Rows compared per block (default: 256)",
+    )
+
     # Backup command
     parser_backup = subparsers.add_parser("backup", help="Backup vector data")
-    parser_backup.add_argument("output", help="Output file path")
+    parser_backup.add_argument("output", help="Output directory")
+    parser_backup.add_argument(
+        "--float16",
+        action="store_true",
+        help="Store vectors as float16 (half the size, slight precision loss)",
+    )
+    parser_backup.add_argument(
+        "--compression",
+        choices=["gzip", "zstd"],
+        default="gzip",
+        help="Block compression (default: gzip; zstd needs 'zstandard')",
+    )
 
     # Restore command
     parser_restore = subparsers.add_parser("restore", help="Restore vector data")
-    parser_restore.add_argument("input", help="Input file path")
+    parser_restore.add_argument(
+        "input", help="Backup directory (or JSON file of older backups)"
+    )
     parser_restore.add_argument(
         "--force", action="store_true", help="Skip confirmation prompt"
     )
@@ -224,6 +481,9 @@ def main():
         if args.command == "search":
             search = SimilaritySearch()
             cmd_search(args, search)
+        elif args.command == "duplicates":
+            search = SimilaritySearch()
+            cmd_duplicates(args, search)
         else:
             manager = VectorCollectionManager()
 
@@ -231,6 +491,10 @@ def main():
             commands = {
                 "init": cmd_init,
                 "rebuild": cmd_rebuild,
+                "migrate": cmd_migrate,
+                "reconcile": cmd_reconcile,
+                "benchmark": cmd_benchmark,
+                "benchmark-embeddings": cmd_benchmark_embeddings,
                 "stats": cmd_stats,
                 "health": cmd_health,
                 "backup": cmd_backup,
@@ -244,7 +508,7 @@ def main():
                 sys.exit(1)
 
         # Commit transaction if needed
-        if args.command in ["init", "rebuild", "restore"]:
+        if args.command in ["init", "rebuild", "migrate", "restore"]:
             transaction.commit()
 
     finally:
@@ -139,6 +139,25 @@ class TestSearchAPI(unittest.TestCase):
             # First result should be the most similar
             self.assertGreater(data["items"][0]["similarity_score"], 0.5)
 
+    def test_hybrid_search(self):
+        """Test hybrid search fuses both sources."""
+        response = self.api_session.post(
+            "/@knowledge-search",
+            json={"type": "hybrid", "query": "Python", "limit": 5},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertEqual(data["search_type"], "hybrid")
+        self.assertEqual(data["sources"]["fulltext"], "ok")
+        self.assertLessEqual(len(data["items"]), 5)
+        self.assertGreater(len(data["items"]), 0)
+        scores = [item["score"] for item in data["items"]]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        for item in data["items"]:
+            self.assertTrue(item["sources"])
+
     def test_search_with_filters(self):
         """Test search with filters."""
         response = self.api_session.post(
@@ -209,6 +228,16 @@ class TestSearchAPI(unittest.TestCase):
         data = response.json()
         self.assertIn("error", data)
 
+    def test_semantic_search_unindexed_type(self):
+        """Test that semantic search rejects types outside the vector index."""
+        response = self.api_session.post(
+            "/@knowledge-search",
+            json={"type": "semantic", "query": "python", "portal_types": ["Document"]},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Document", response.json()["error"])
+
     def test_search_missing_query(self):
         """Test search without query."""
         response = self.api_session.post(
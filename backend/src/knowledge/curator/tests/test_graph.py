@@ -10,10 +10,19 @@ from knowledge.curator.graph import Node
 from knowledge.curator.graph import NodeType
 from knowledge.curator.graph import RelationshipManager
 from knowledge.curator.graph import RelationshipType
+from BTrees.OOBTree import OOBTree
+from knowledge.curator.graph.storage import clear_graph_cache
+from knowledge.curator.graph.storage import GRAPH_ANNOTATION_KEY
 from knowledge.curator.testing import PLONE_APP_KNOWLEDGE_INTEGRATION_TESTING
+from knowledge.curator.upgrades.graph_storage import migrate_graph_storage
+from persistent.dict import PersistentDict
+from persistent.list import PersistentList
 from plone import api
 from plone.app.testing import setRoles
 from plone.app.testing import TEST_USER_ID
+from unittest.mock import Mock
+from unittest.mock import patch
+from zope.annotation.interfaces import IAnnotations
 
 import unittest
 
@@ -85,6 +94,39 @@ class TestGraphModel(unittest.TestCase):
         incoming = self.graph.get_incoming_neighbors("test1")
         self.assertEqual(set(incoming), {"test0"})
 
+    def test_typed_edges_and_multiplicity(self):
+        """Test typed lookups and removing one of several edges between nodes."""
+        for i in range(3):
+            self.graph.add_node(Node(f"test{i}", f"Node {i}", NodeType.RESEARCH_NOTE))
+
+        related = RelationshipType.RELATED_TO.value
+        builds_on = RelationshipType.BUILDS_ON.value
+        self.graph.add_edge(Edge("test0", "test1", related))
+        self.graph.add_edge(Edge("test0", "test1", builds_on))
+        self.graph.add_edge(Edge("test2", "test1", builds_on))
+
+        self.assertEqual(self.graph.get_neighbors("test0", builds_on), ["test1"])
+        self.assertEqual(
+            set(self.graph.get_incoming_neighbors("test1", builds_on)),
+            {"test0", "test2"},
+        )
+        self.assertEqual(len(self.graph.get_edges_to_node("test1")), 3)
+        self.assertEqual(len(self.graph.get_edges_from_node("test0", related)), 1)
+
+        # The nodes stay adjacent through the remaining edge
+        self.assertTrue(self.graph.remove_edge("test0", "test1", related))
+        self.assertEqual(self.graph.get_neighbors("test0"), ["test1"])
+        self.assertEqual(self.graph.get_neighbors("test0", related), [])
+
+        self.assertTrue(self.graph.remove_edge("test0", "test1", builds_on))
+        self.assertEqual(self.graph.get_neighbors("test0"), [])
+        self.assertEqual(self.graph.get_incoming_neighbors("test1"), ["test2"])
+        self.assertFalse(self.graph.remove_edge("test0", "test1", builds_on))
+
+        self.assertTrue(self.graph.remove_node("test1"))
+        self.assertEqual(len(self.graph.edges), 0)
+        self.assertEqual(self.graph.get_edges_from_node("test2"), [])
+
     def test_get_subgraph(self):
         """Test getting subgraph."""
         # Create nodes
@@ -297,6 +339,62 @@ class TestGraphAlgorithms(unittest.TestCase):
         max_pagerank_node = max(pagerank.items(), key=lambda x: x[1])[0]
         self.assertEqual(max_pagerank_node, "node0")
 
+    def test_csr_snapshot(self):
+        """Test the compact snapshot and the centralities computed on it."""
+        related = RelationshipType.RELATED_TO.value
+        self.graph.add_edge(Edge("node0", "node1", related, 0.5))
+        self.graph.add_edge(Edge("node0", "node1", RelationshipType.BUILDS_ON.value))
+        self.graph.add_edge(Edge("node1", "node2", related))
+        self.graph.add_edge(Edge("node2", "node0", related))
+
+        snapshot = self.graph.snapshot()
+        self.assertIs(self.graph.snapshot(), snapshot)
+        # Two typed edges between node0 and node1 form one weighted pair
+        self.assertEqual(snapshot.edge_count, 3)
+        self.assertEqual(snapshot.successors(0).tolist(), [1])
+        self.assertEqual(snapshot.predecessors(0).tolist(), [2])
+        self.assertAlmostEqual(self.algo.weighted_degree()["node0"], 2.5)
+
+        # Scores of the isolated (dangling) nodes flow back, so they sum to 1
+        pagerank = self.algo.pagerank()
+        self.assertAlmostEqual(sum(pagerank.values()), 1.0)
+        self.assertAlmostEqual(pagerank["node0"], pagerank["node1"], places=4)
+        self.assertLess(pagerank["node5"], pagerank["node0"])
+
+        self.graph.add_edge(Edge("node3", "node4", related))
+        self.assertIsNot(self.graph.snapshot(), snapshot)
+        self.assertEqual(self.algo.degree_centrality()["node3"], 0.1)
+
+    def test_node_importance_from_shared_pass(self):
+        """Test that node metrics come from one cached centrality pass."""
+        # Chain node0 -> node1 -> node2 -> node3
+        related = RelationshipType.RELATED_TO.value
+        for i in range(3):
+            self.graph.add_edge(Edge(f"node{i}", f"node{i + 1}", related))
+
+        engine = self.algo.centrality()
+        self.assertIs(self.algo.centrality(), engine)
+
+        importance = self.algo.analyze_node_importance("node1")
+        metrics = importance["metrics"]
+        # node1 lies on the paths node0 -> node2 and node0 -> node3 of 20 pairs
+        self.assertAlmostEqual(metrics["betweenness_centrality"], 0.1)
+        # Two nodes reached at 1 and 2 hops
+        self.assertAlmostEqual(metrics["closeness_centrality"], 2 / 3)
+        self.assertEqual(importance["connections"]["total"], 2)
+        self.assertEqual(
+            importance["community"], self.algo.find_communities()["node3"]
+        )
+
+        # Sampling every node as a pivot gives the exact results
+        sampled = GraphAlgorithms(self.graph, pivots=6).betweenness_centrality()
+        self.assertEqual(sampled, self.algo.betweenness_centrality())
+        estimated = GraphAlgorithms(self.graph, pivots=2).closeness_centrality()
+        self.assertEqual(len(estimated), 6)
+
+        self.graph.add_edge(Edge("node3", "node4", related))
+        self.assertIsNot(self.algo.centrality(), engine)
+
     def test_find_communities(self):
         """Test community detection."""
         # Create two connected components
@@ -330,6 +428,10 @@ class TestGraphStorage(unittest.TestCase):
         setRoles(self.portal, TEST_USER_ID, ["Manager"])
 
         self.storage = GraphStorage(self.portal)
+        clear_graph_cache()
+
+    def tearDown(self):
+        clear_graph_cache()
 
     def test_save_and_load_graph(self):
         """Test saving and loading graph."""
@@ -363,6 +465,105 @@ class TestGraphStorage(unittest.TestCase):
         )
         self.assertEqual(loaded_edge.weight, 0.8)
 
+    def test_incremental_updates(self):
+        """Test adding and removing single nodes and edges."""
+        self.assertTrue(self.storage.add_node(Node("a", "A", NodeType.RESEARCH_NOTE)))
+        self.assertTrue(self.storage.add_node(Node("tag_x", "x", NodeType.TAG)))
+        self.assertFalse(self.storage.add_node(Node("a", "A", NodeType.RESEARCH_NOTE)))
+
+        tagged = RelationshipType.TAGGED_WITH.value
+        self.assertTrue(self.storage.add_edge(Edge("a", "tag_x", tagged)))
+        self.assertFalse(self.storage.add_edge(Edge("a", "missing", tagged)))
+        self.assertEqual([n.uid for n in self.storage.get_nodes_by_tag("x")], ["a"])
+        self.assertEqual(len(self.storage.query_relationships(target_uid="tag_x")), 1)
+
+        # Removing a node removes the edges pointing at it
+        self.assertTrue(self.storage.remove_node("tag_x"))
+        self.assertEqual(self.storage.query_relationships(source_uid="a"), [])
+        self.assertEqual(self.storage.get_nodes_by_tag("x"), [])
+        stats = self.storage.get_statistics()
+        self.assertEqual((stats["total_nodes"], stats["total_edges"]), (1, 0))
+
+    def test_save_graph_writes_only_changes(self):
+        """Test that saving an unchanged graph leaves the records alone."""
+        graph = Graph()
+        graph.add_node(Node("a", "A", NodeType.RESEARCH_NOTE))
+        graph.add_node(Node("b", "B", NodeType.RESEARCH_NOTE))
+        graph.add_edge(Edge("a", "b", RelationshipType.RELATED_TO.value))
+        self.storage.save_graph(graph)
+
+        storage = self.storage._get_storage()
+        record = storage["nodes"]["a"]
+        bucket = storage["edges"]["a"]
+        loaded = self.storage.load_graph()
+        loaded.get_node("b").title = "B2"
+        self.storage.save_graph(loaded)
+
+        self.assertIs(storage["nodes"]["a"], record)
+        self.assertIs(storage["edges"]["a"], bucket)
+        self.assertEqual(self.storage.get_node("b").title, "B2")
+
+    def test_storage_without_version_upgraded(self):
+        """Test that the upgrade step adds the version counter."""
+        graph = Graph()
+        graph.add_node(Node("a", "A", NodeType.RESEARCH_NOTE))
+        self.storage.save_graph(graph)
+        del self.storage._get_storage()["version"]
+
+        migrate_graph_storage(self.portal)
+
+        storage = GraphStorage(self.portal)
+        self.assertEqual(len(storage.read_graph().nodes), 1)
+        self.assertEqual(storage.get_statistics()["version"], 0)
+        self.assertFalse(storage.migrate())
+
+    def test_edge_list_storage_upgraded(self):
+        """Test that the upgrade step moves the edge list into buckets."""
+        IAnnotations(self.portal)[GRAPH_ANNOTATION_KEY] = OOBTree({
+            "nodes": OOBTree({
+                uid: {"uid": uid, "title": uid.upper(), "type": "ResearchNote"}
+                for uid in ("a", "b")
+            }),
+            "edges": PersistentList([
+                {"source": "a", "target": "b", "type": "related_to", "weight": 0.5},
+                {"source": "a", "target": "gone", "type": "related_to"},
+            ]),
+            "indexes": OOBTree(),
+            "metadata": PersistentDict(),
+        })
+
+        # Reads do not write; the upgrade step converts the storage
+        self.assertNotIn("incoming", GraphStorage(self.portal)._get_storage())
+        migrate_graph_storage(self.portal)
+
+        storage = GraphStorage(self.portal)
+        self.assertEqual(storage.get_edge("a", "b", "related_to").weight, 0.5)
+        stats = storage.get_statistics()
+        self.assertEqual((stats["total_nodes"], stats["total_edges"]), (2, 1))
+
+    def test_read_graph_cached_per_commit(self):
+        """Test that the shared graph is rebuilt only after a new commit."""
+        graph = Graph()
+        graph.add_node(Node("a", "A", NodeType.RESEARCH_NOTE))
+        self.storage.save_graph(graph)
+
+        version = Mock(_p_changed=False, _p_oid=b"oid", _p_serial=b"\0" * 7 + b"\1")
+        version._p_jar.db.return_value.database_name = "main"
+        self.storage._get_storage()["version"] = version
+
+        first = self.storage.read_graph()
+        self.assertIs(self.storage.read_graph(), first)
+        self.assertEqual(len(first.nodes), 1)
+
+        version._p_serial = b"\0" * 7 + b"\2"
+        second = self.storage.read_graph()
+        self.assertIsNot(second, first)
+        self.assertIs(self.storage.read_graph(), second)
+
+        # Uncommitted changes are never served from or put in the cache
+        version._p_changed = True
+        self.assertIsNot(self.storage.read_graph(), second)
+
     def test_sync_with_catalog(self):
         """Test syncing graph with catalog content."""
         # Create some content
@@ -406,6 +607,11 @@ class TestGraphStorage(unittest.TestCase):
         edge = graph.get_edge(uid2, uid1, RelationshipType.RELATED_TO.value)
         self.assertIsNotNone(edge)
 
+        # A sync without changes writes nothing
+        with patch.object(self.storage, "_touch") as touch:
+            self.storage.sync_with_catalog()
+        touch.assert_not_called()
+
     def test_query_nodes(self):
         """Test querying nodes."""
         # Create and save a graph
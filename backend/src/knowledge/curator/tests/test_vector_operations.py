@@ -1,15 +1,69 @@
 """Tests for vector database operations."""
 
+from DateTime import DateTime
 from knowledge.curator.testing import PLONE_APP_KNOWLEDGE_INTEGRATION_TESTING
+from knowledge.curator.vector.adapter import chunk_key
+from knowledge.curator.vector.adapter import index_settings
+from knowledge.curator.vector.adapter import model_slug
+from knowledge.curator.vector.adapter import point_id_for_uid
 from knowledge.curator.vector.adapter import QdrantAdapter
+from knowledge.curator.vector.adapter import quantization_config
+from knowledge.curator.vector.adapter import search_params
+from knowledge.curator.vector.backup import BackupReader
+from knowledge.curator.vector.backup import is_stream_backup
+from knowledge.curator.vector.benchmark import estimate_memory
+from knowledge.curator.vector.benchmark import IndexBenchmark
+from knowledge.curator.vector.cache import DiskVectorStore
+from knowledge.curator.vector.cache import EmbeddingCache
+from knowledge.curator.vector.cache import text_digest
+from knowledge.curator.vector.clustering import ClusteringEngine
+from knowledge.curator.vector.duplicates import DuplicateDetector
+from knowledge.curator.vector.duplicates import UnionFind
+from knowledge.curator.vector.config import get_vector_config
+from knowledge.curator.vector.config import set_active_embedding_model
+from knowledge.curator.vector.embeddings import BACKEND_MIN_COSINE
+from knowledge.curator.vector.embeddings import EmbeddingGenerator
+from knowledge.curator.vector.embeddings import int8_onnx_file
+from knowledge.curator.vector.embeddings import onnx_quantization_target
+from knowledge.curator.vector.filters import compile_filter
+from knowledge.curator.vector.filters import to_timestamp
+from knowledge.curator.vector.indexing import _after_commit
+from knowledge.curator.vector.indexing import merge_jobs
+from knowledge.curator.vector.indexing import PendingVectorChanges
+from knowledge.curator.vector.local import LocalVectorClient
 from knowledge.curator.vector.management import VectorCollectionManager
+from knowledge.curator.vector.matrix import EmbeddingMatrix
+from knowledge.curator.vector.matrix import get_embedding_matrix
+from knowledge.curator.vector.pool import VectorComponentPool
+from knowledge.curator.vector.profiles import PROFILES_ANNOTATION_KEY
+from knowledge.curator.vector.profiles import UserProfiles
+from knowledge.curator.vector.queries import get_query_embedder
+from knowledge.curator.vector.queries import QueryBatcher
+from knowledge.curator.vector.queries import QueryEmbedder
+from knowledge.curator.vector.queries import QueryEmbeddingCache
+from knowledge.curator.vector.rebuild import _UpsertProgress
+from knowledge.curator.vector.rebuild import RebuildCheckpoint
+from knowledge.curator.vector.rebuild import RebuildPipeline
+from knowledge.curator.vector.reconcile import is_indexed
+from knowledge.curator.vector.reconcile import is_stale
+from knowledge.curator.vector.reconcile import merge_sorted
+from knowledge.curator.vector.reconcile import VectorReconciler
+from knowledge.curator.vector.search import reciprocal_rank_fusion
 from knowledge.curator.vector.search import SimilaritySearch
 from plone import api
 from plone.app.testing import setRoles
 from plone.app.testing import TEST_USER_ID
 from unittest.mock import Mock
 from unittest.mock import patch
+from zope.annotation.interfaces import IAnnotations
 
+import fcntl
+import json
+import numpy as np
+import os
+import shutil
+import tempfile
+import threading
 import unittest
 
 
@@ -46,10 +100,11 @@ class TestVectorOperations(unittest.TestCase):
         """Test collection initialization."""
         mock_client_class.return_value = self.mock_client
 
-        # Mock get_collections response
+        # Mock get_collections/get_aliases responses
         mock_collections = Mock()
         mock_collections.collections = []
         self.mock_client.get_collections.return_value = mock_collections
+        self.mock_client.get_aliases.return_value.aliases = []
 
         adapter = QdrantAdapter()
         adapter.initialize_collection(vector_size=768)
@@ -86,6 +141,79 @@ class TestVectorOperations(unittest.TestCase):
         self.assertTrue(result)
         self.mock_client.upsert.assert_called()
 
+    @patch("knowledge.curator.vector.adapter.QdrantClient")
+    def test_upsert_many_uses_deterministic_ids(self, mock_client_class):
+        """Test that re-upserting a UID targets the same point."""
+        mock_client_class.return_value = self.mock_client
+
+        adapter = QdrantAdapter()
+        adapter.upsert_many(["doc1"], [[0.1] * 384], [{"uid": "doc1"}])
+        adapter.upsert_many(["doc1"], [[0.2] * 384], [{"uid": "doc1"}])
+
+        first = self.mock_client.upsert.call_args_list[0].kwargs["points"][0]
+        second = self.mock_client.upsert.call_args_list[1].kwargs["points"][0]
+        self.assertEqual(first.id, point_id_for_uid("doc1"))
+        self.assertEqual(first.id, second.id)
+        self.mock_client.scroll.assert_not_called()
+
+    @patch("knowledge.curator.vector.adapter.QdrantClient")
+    def test_delete_many(self, mock_client_class):
+        """Test deleting vectors by UID in a single request."""
+        mock_client_class.return_value = self.mock_client
+
+        adapter = QdrantAdapter()
+        result = adapter.delete_many(["doc1", "doc2"])
+
+        self.assertTrue(result)
+        self.mock_client.delete.assert_called_once()
+        selector = self.mock_client.delete.call_args.kwargs["points_selector"]
+        self.assertEqual(
+            selector.points, [point_id_for_uid("doc1"), point_id_for_uid("doc2")]
+        )
+        self.mock_client.scroll.assert_not_called()
+
+    @patch("knowledge.curator.vector.adapter.QdrantClient")
+    def test_swap_alias(self, mock_client_class):
+        """Test that an existing alias is re-pointed in a single request."""
+        mock_client_class.return_value = self.mock_client
+        alias = Mock(
+            alias_name="plone_knowledge", collection_name="plone_knowledge__v1"
+        )
+        self.mock_client.get_aliases.return_value.aliases = [alias]
+
+        adapter = QdrantAdapter()
+        previous = adapter.swap_alias("plone_knowledge__v2")
+
+        self.assertEqual(previous, "plone_knowledge__v1")
+        self.mock_client.update_collection_aliases.assert_called_once()
+        operations = self.mock_client.update_collection_aliases.call_args.kwargs[
+            "change_aliases_operations"
+        ]
+        self.assertEqual(len(operations), 2)
+        self.assertEqual(
+            operations[1].create_alias.collection_name, "plone_knowledge__v2"
+        )
+        self.mock_client.delete_collection.assert_not_called()
+
+    @patch("knowledge.curator.vector.adapter.QdrantClient")
+    def test_next_collection_name_is_versioned_per_model(self, mock_client_class):
+        """Test that collection names carry the model and a new version."""
+        mock_client_class.return_value = self.mock_client
+        existing = []
+        for name in ("plone_knowledge__all_minilm_l6_v2__v1", "plone_knowledge__v2"):
+            collection = Mock()
+            collection.name = name
+            existing.append(collection)
+        self.mock_client.get_collections.return_value.collections = existing
+
+        adapter = QdrantAdapter()
+        name = adapter.next_collection_name("sentence-transformers/all-mpnet-base-v2")
+
+        self.assertEqual(
+            model_slug("sentence-transformers/all-mpnet-base-v2"), "all_mpnet_base_v2"
+        )
+        self.assertEqual(name, "plone_knowledge__all_mpnet_base_v2__v3")
+
 
 class TestVectorCollectionManager(unittest.TestCase):
     """Test vector collection management."""
@@ -96,15 +224,14 @@ class TestVectorCollectionManager(unittest.TestCase):
         self.portal = self.layer["portal"]
         setRoles(self.portal, TEST_USER_ID, ["Manager"])
 
-    @patch("knowledge.curator.vector.management.QdrantAdapter")
-    @patch("knowledge.curator.vector.management.EmbeddingGenerator")
-    def test_update_content_vector(self, mock_embeddings_class, mock_adapter_class):
+    @patch("knowledge.curator.vector.management.get_component_pool")
+    def test_update_content_vector(self, mock_get_pool):
         """Test updating vector for content."""
         # Create mocks
         mock_adapter = Mock()
         mock_embeddings = Mock()
-        mock_adapter_class.return_value = mock_adapter
-        mock_embeddings_class.return_value = mock_embeddings
+        mock_get_pool.return_value.adapter.return_value = mock_adapter
+        mock_get_pool.return_value.embedding_generator.return_value = mock_embeddings
 
         # Configure mocks
         mock_embeddings.prepare_content_text.return_value = "Test content"
@@ -127,15 +254,14 @@ class TestVectorCollectionManager(unittest.TestCase):
         mock_embeddings.generate_embedding.assert_called_once_with("Test content")
         mock_adapter.update_vector.assert_called_once()
 
-    @patch("knowledge.curator.vector.management.QdrantAdapter")
-    @patch("knowledge.curator.vector.management.EmbeddingGenerator")
-    def test_health_check(self, mock_embeddings_class, mock_adapter_class):
+    @patch("knowledge.curator.vector.management.get_component_pool")
+    def test_health_check(self, mock_get_pool):
         """Test health check functionality."""
         # Create mocks
         mock_adapter = Mock()
         mock_embeddings = Mock()
-        mock_adapter_class.return_value = mock_adapter
-        mock_embeddings_class.return_value = mock_embeddings
+        mock_get_pool.return_value.adapter.return_value = mock_adapter
+        mock_get_pool.return_value.embedding_generator.return_value = mock_embeddings
 
         # Configure mocks
         mock_collections = Mock()
@@ -156,6 +282,20 @@ class TestVectorCollectionManager(unittest.TestCase):
         self.assertTrue(health["embeddings"]["healthy"])
         self.assertTrue(health["collection"]["exists"])
 
+    @patch.dict(os.environ, {"EMBEDDING_MODEL": "model-b"})
+    def test_active_model_overrides_configured(self):
+        """Test that the migrated model wins, with a warning naming both."""
+        set_active_embedding_model("model-a")
+
+        with self.assertLogs("knowledge.curator.vector", "WARNING") as logs:
+            config = get_vector_config()
+            get_vector_config()
+
+        self.assertEqual(config["embedding_model"], "model-a")
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("'model-b'", logs.output[0])
+        self.assertIn("'model-a'", logs.output[0])
+
 
 class TestSimilaritySearch(unittest.TestCase):
     """Test similarity search functionality."""
@@ -166,15 +306,14 @@ class TestSimilaritySearch(unittest.TestCase):
         self.portal = self.layer["portal"]
         setRoles(self.portal, TEST_USER_ID, ["Manager"])
 
-    @patch("knowledge.curator.vector.search.QdrantAdapter")
-    @patch("knowledge.curator.vector.search.EmbeddingGenerator")
-    def test_search_by_text(self, mock_embeddings_class, mock_adapter_class):
+    @patch("knowledge.curator.vector.search.get_component_pool")
+    def test_search_by_text(self, mock_get_pool):
         """Test text-based similarity search."""
         # Create mocks
         mock_adapter = Mock()
         mock_embeddings = Mock()
-        mock_adapter_class.return_value = mock_adapter
-        mock_embeddings_class.return_value = mock_embeddings
+        mock_get_pool.return_value.adapter.return_value = mock_adapter
+        mock_get_pool.return_value.embedding_generator.return_value = mock_embeddings
 
         # Configure mocks
         mock_embeddings.generate_embedding.return_value = [0.1] * 384
@@ -205,15 +344,14 @@ class TestSimilaritySearch(unittest.TestCase):
         mock_embeddings.generate_embedding.assert_called_once_with("test query")
         mock_adapter.search_similar.assert_called_once()
 
-    @patch("knowledge.curator.vector.search.QdrantAdapter")
-    @patch("knowledge.curator.vector.search.EmbeddingGenerator")
-    def test_find_similar_content(self, mock_embeddings_class, mock_adapter_class):
+    @patch("knowledge.curator.vector.search.get_component_pool")
+    def test_find_similar_content(self, mock_get_pool):
         """Test finding similar content."""
         # Create mocks
         mock_adapter = Mock()
         mock_embeddings = Mock()
-        mock_adapter_class.return_value = mock_adapter
-        mock_embeddings_class.return_value = mock_embeddings
+        mock_get_pool.return_value.adapter.return_value = mock_adapter
+        mock_get_pool.return_value.embedding_generator.return_value = mock_embeddings
 
         # Create test content
         api.content.create(
@@ -248,5 +386,1440 @@ class TestSimilaritySearch(unittest.TestCase):
         self.assertEqual(results[0]["uid"], "similar-uid")
         self.assertEqual(results[0]["score"], 0.85)
         mock_adapter.find_related_content.assert_called_once_with(
-            "source-uid", limit=3, score_threshold=0.6
+            "source-uid", limit=3, score_threshold=0.6, filters=None
+        )
+
+    @patch("knowledge.curator.vector.search.UserProfiles")
+    @patch("knowledge.curator.vector.search.get_component_pool")
+    def test_recommendations_exclude_interacted_uids(
+        self, mock_get_pool, mock_profiles_class
+    ):
+        """Test that content the user touched is dropped from the hits."""
+        for uid in ("own-uid", "other-uid"):
+            api.content.create(
+                container=self.portal, type="BookmarkPlus", title=uid, UID=uid
+            )
+        mock_adapter = Mock()
+        mock_adapter.search_similar.return_value = [
+            {"uid": "own-uid", "score": 0.9},
+            {"uid": "other-uid", "score": 0.8},
+        ]
+        mock_get_pool.return_value.adapter.return_value = mock_adapter
+        mock_profiles_class.return_value.interacted_among.return_value = {"own-uid"}
+
+        results = SimilaritySearch().recommend_for_profile(
+            [1.0, 0.0], TEST_USER_ID, limit=5
+        )
+
+        kwargs = mock_adapter.search_similar.call_args.kwargs
+        self.assertEqual(kwargs["limit"], 10)
+        self.assertNotIn("filters", kwargs)
+        mock_profiles_class.return_value.interacted_among.assert_called_once_with(
+            TEST_USER_ID, ["own-uid", "other-uid"]
+        )
+        self.assertEqual([result["uid"] for result in results], ["other-uid"])
+
+    @patch("knowledge.curator.vector.search.get_component_pool")
+    def test_recommendations_without_profile_exclude_own_content(
+        self, mock_get_pool
+    ):
+        """Test that the items seeding a new profile are not recommended."""
+        own = api.content.create(
+            container=self.portal, type="BookmarkPlus", title="Own", UID="own-uid"
+        )
+        other = api.content.create(
+            container=self.portal, type="BookmarkPlus", title="Other", UID="other-uid"
+        )
+        other.setCreators(["someone-else"])
+        other.reindexObject()
+        adapter = QdrantAdapter(client=LocalVectorClient())
+        adapter.initialize_collection(vector_size=3)
+        adapter.add_vectors(
+            [{"uid": own.UID()}, {"uid": other.UID()}],
+            [[1.0, 0.0, 0.0], [0.9, 0.1, 0.0]],
         )
+        mock_get_pool.return_value.adapter.return_value = adapter
+        mock_get_pool.return_value.embedding_generator.return_value.model_name = (
+            "test-model"
+        )
+
+        results = SimilaritySearch().get_recommendation_candidates(TEST_USER_ID)
+
+        self.assertEqual([result["uid"] for result in results], ["other-uid"])
+
+    def test_reciprocal_rank_fusion(self):
+        """Test that items found by both sources rank first, once."""
+        fused = reciprocal_rank_fusion({
+            "fulltext": ["a", "b", "c"],
+            "semantic": ["c", "d", "a"],
+        })
+
+        self.assertEqual([uid for uid, _score, _ranks in fused], ["a", "c", "b", "d"])
+        self.assertEqual(fused[0][2], {"fulltext": 1, "semantic": 3})
+        self.assertAlmostEqual(fused[0][1], 1 / 61 + 1 / 63)
+
+    @patch("knowledge.curator.vector.search.api.portal.get_tool")
+    @patch("knowledge.curator.vector.search.get_component_pool")
+    def test_results_hydrated_with_one_catalog_query(self, mock_get_pool, mock_tool):
+        """Test that hits are enriched from brain metadata in a single query."""
+        brain = Mock(UID="a", Creator="admin", review_state="published")
+        brain.getURL.return_value = "http://nohost/plone/a"
+        brain.created.ISO8601.return_value = "2024-01-01T00:00:00+00:00"
+        mock_tool.return_value.return_value = [brain]
+
+        search = SimilaritySearch()
+        results = search._hydrate_results([
+            {"uid": "a", "title": "A", "score": 0.9},
+            {"uid": "hidden", "title": "Hidden", "score": 0.8},
+        ])
+
+        mock_tool.return_value.assert_called_once_with(UID=["a", "hidden"])
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["url"], "http://nohost/plone/a")
+        self.assertEqual(results[0]["creator"], "admin")
+        self.assertEqual(results[0]["review_state"], "published")
+        brain.getObject.assert_not_called()
+
+
+class TestVectorFilters(unittest.TestCase):
+    """Test compiling search predicates into Qdrant filters."""
+
+    def test_empty_predicates_compile_to_none(self):
+        """Test that missing predicates do not produce a filter."""
+        self.assertIsNone(compile_filter(None))
+        self.assertIsNone(compile_filter({"content_type": None, "tags": []}))
+
+    def test_lists_and_operators_become_match_any(self):
+        """Test that list predicates match any of their values."""
+        search_filter = compile_filter({
+            "content_type": ["BookmarkPlus", "ResearchNote"],
+            "tags": {"$any": ["ai"]},
+            "knowledge_type": "conceptual",
+        })
+
+        content_type, tags, knowledge_type = search_filter.must
+        self.assertEqual(content_type.key, "content_type")
+        self.assertEqual(content_type.match.any, ["BookmarkPlus", "ResearchNote"])
+        self.assertEqual(tags.match.any, ["ai"])
+        self.assertEqual(knowledge_type.match.value, "conceptual")
+
+    def test_modified_range_uses_timestamps(self):
+        """Test that date bounds compile to a numeric range."""
+        search_filter = compile_filter({
+            "modified": {"start": "2024-01-01T00:00:00+00:00", "end": None}
+        })
+
+        (condition,) = search_filter.must
+        self.assertEqual(condition.key, "modified_ts")
+        self.assertEqual(condition.range.gte, 1704067200.0)
+        self.assertIsNone(condition.range.lte)
+
+    def test_operators_on_one_key_combine(self):
+        """Test that every operator of a predicate must hold."""
+        search_filter = compile_filter({
+            "tags": {"$in": ["ai", "ml"], "$all": ["ai", "nlp"]},
+        })
+
+        (condition,) = search_filter.must
+        match_any, match_all = condition.must
+        self.assertEqual(match_any.match.any, ["ai", "ml"])
+        self.assertEqual([item.match.value for item in match_all.must], ["ai", "nlp"])
+
+    def test_scalar_operands_are_single_items(self):
+        """Test that a string operand is not split into characters."""
+        search_filter = compile_filter({
+            "tags": {"$all": "ai", "$nin": "ml"},
+            "content_type": {"$in": "ResearchNote"},
+        })
+
+        tags, content_type = search_filter.must
+        match_all, excluded = tags.must
+        self.assertEqual(match_all.match.value, "ai")
+        self.assertEqual(excluded.must_not[0].match.any, ["ml"])
+        self.assertEqual(content_type.match.any, ["ResearchNote"])
+
+    def test_exact_date_becomes_point_range(self):
+        """Test that a scalar date matches its timestamp exactly."""
+        search_filter = compile_filter({"created": "2024-01-01T00:00:00+00:00"})
+
+        (condition,) = search_filter.must
+        self.assertEqual(condition.key, "created_ts")
+        self.assertEqual(condition.range.gte, 1704067200.0)
+        self.assertEqual(condition.range.lte, 1704067200.0)
+
+    def test_nin_excludes_values(self):
+        """Test that $nin compiles to a must_not condition."""
+        search_filter = compile_filter({"uid": {"$nin": ["a", "b"]}})
+
+        (condition,) = search_filter.must
+        (excluded,) = condition.must_not
+        self.assertEqual(excluded.key, "uid")
+        self.assertEqual(excluded.match.any, ["a", "b"])
+
+    def test_unknown_operator(self):
+        """Test that unsupported operators are rejected."""
+        with self.assertRaises(ValueError):
+            compile_filter({"tags": {"$regex": "a.*"}})
+
+
+class TestEmbeddingMatrix(unittest.TestCase):
+    """Test the in-process similarity index used without Qdrant."""
+
+    def setUp(self):
+        self.matrix = EmbeddingMatrix(
+            ["a", "b", "c"], np.array([[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]])
+        )
+
+    def test_top_k_ordered_by_score(self):
+        """Test that the best matches come first."""
+        hits = self.matrix.search([1.0, 0.0], limit=2)
+        self.assertEqual([uid for uid, _score in hits], ["a", "b"])
+        self.assertAlmostEqual(hits[0][1], 1.0, places=5)
+
+    def test_allowed_and_excluded_uids(self):
+        """Test that candidates are restricted by UID."""
+        hits = self.matrix.search(
+            [1.0, 0.0], limit=5, allowed_uids={"b", "c"}, exclude_uids=["c"]
+        )
+        self.assertEqual([uid for uid, _score in hits], ["b"])
+
+    def test_threshold_and_dimension_mismatch(self):
+        """Test that low scores and foreign dimensions return nothing."""
+        self.assertEqual(
+            [uid for uid, _ in self.matrix.search([1.0, 0.0], score_threshold=0.5)],
+            ["a", "b"],
+        )
+        self.assertEqual(self.matrix.search([1.0, 0.0, 0.0]), [])
+
+    @patch("knowledge.curator.vector.matrix.build_embedding_matrix")
+    @patch("knowledge.curator.vector.matrix.api")
+    def test_rebuilt_only_when_indexed_content_changes(self, mock_api, mock_build):
+        """Test that the cached matrix survives commits to other content."""
+        mock_api.portal.get.return_value.getPhysicalPath.return_value = ("", "site")
+        catalog = mock_api.portal.get_tool.return_value
+        newest = Mock(UID="a", modified="2024-01-01T00:00:00+00:00")
+        catalog.unrestrictedSearchResults.return_value = [newest]
+        mock_build.return_value = self.matrix
+
+        first = get_embedding_matrix(["ResearchNote"])
+        self.assertIs(get_embedding_matrix(["ResearchNote"]), first)
+        mock_build.assert_called_once()
+
+        newest.modified = "2024-02-01T00:00:00+00:00"
+        get_embedding_matrix(["ResearchNote"])
+        self.assertEqual(mock_build.call_count, 2)
+
+
+class TestLocalVectorEngine(unittest.TestCase):
+    """Test the in-process engine behind the Qdrant adapter interface."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.documents = [
+            {
+                "uid": "a",
+                "content_type": "ResearchNote",
+                "tags": ["ai", "ml"],
+                "modified": "2024-06-01T00:00:00+00:00",
+            },
+            {
+                "uid": "b",
+                "content_type": "BookmarkPlus",
+                "tags": ["ml"],
+                "modified": "2025-01-01T00:00:00+00:00",
+            },
+            {
+                "uid": "c",
+                "content_type": "ResearchNote",
+                "tags": [],
+                "modified": "2023-01-01T00:00:00+00:00",
+            },
+        ]
+        self.vectors = [[1.0, 0.0, 0.0], [0.9, 0.1, 0.0], [0.0, 1.0, 0.0]]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _adapter(self, path=None):
+        adapter = QdrantAdapter(client=LocalVectorClient(path))
+        adapter.initialize_collection(vector_size=3)
+        adapter.add_vectors(self.documents, self.vectors)
+        return adapter
+
+    def _uids(self, adapter, **kwargs):
+        results = adapter.search_similar([1.0, 0.0, 0.0], score_threshold=0.0, **kwargs)
+        return [result["uid"] for result in results]
+
+    def test_search_and_filters(self):
+        """Test top-k ordering and mask-based payload filtering."""
+        adapter = self._adapter()
+
+        self.assertEqual(self._uids(adapter), ["a", "b", "c"])
+        self.assertEqual(self._uids(adapter, limit=1), ["a"])
+        self.assertEqual(
+            self._uids(adapter, filters={"content_type": ["ResearchNote"]}),
+            ["a", "c"],
+        )
+        self.assertEqual(
+            self._uids(adapter, filters={"tags": {"$all": ["ai", "ml"]}}), ["a"]
+        )
+        self.assertEqual(
+            self._uids(adapter, filters={"uid": {"$nin": ["b"]}}), ["a", "c"]
+        )
+        self.assertEqual(
+            self._uids(
+                adapter, filters={"modified": {"start": "2024-01-01T00:00:00+00:00"}}
+            ),
+            ["a", "b"],
+        )
+
+    def test_upsert_replaces_and_delete_removes(self):
+        """Test that points are keyed by UID."""
+        adapter = self._adapter()
+        adapter.add_vectors(self.documents[:1], [[0.5, 0.0, 0.5]])
+        adapter.delete_many(["b"])
+
+        self.assertEqual(adapter.get_collection_info()["points_count"], 2)
+        results = adapter.search_similar([1.0, 0.0, 0.0], score_threshold=0.0)
+        self.assertEqual([result["uid"] for result in results], ["a", "c"])
+        self.assertAlmostEqual(results[0]["score"], 0.7071, places=3)
+
+    def test_update_vector_inserts_missing_point(self):
+        """Test that a vector-only update keeps payloads or inserts the point."""
+        adapter = self._adapter()
+
+        self.assertTrue(adapter.update_vector("a", [0.0, 0.0, 1.0]))
+        self.assertTrue(adapter.update_vector("new", [0.0, 0.0, 1.0]))
+
+        points = adapter.client.retrieve(
+            adapter.collection_name,
+            [point_id_for_uid("a"), point_id_for_uid("new")],
+            with_vectors=True,
+        )
+        self.assertEqual(points[0].payload["content_type"], "ResearchNote")
+        np.testing.assert_allclose(points[0].vector, [0.0, 0.0, 1.0])
+        self.assertEqual(points[1].payload["uid"], "new")
+        self.assertEqual(adapter.get_collection_info()["points_count"], 4)
+
+    def test_persists_across_restarts(self):
+        """Test that vectors, payloads and aliases are reloaded from disk."""
+        adapter = self._adapter(self.tmpdir)
+        collection = adapter.next_collection_name("test/model")
+        adapter.for_collection(collection).create_collection(collection, 3)
+        adapter.for_collection(collection).add_vectors(
+            self.documents[:2], self.vectors[:2]
+        )
+        adapter.swap_alias(collection)
+        adapter.client.close()
+
+        reopened = QdrantAdapter(client=LocalVectorClient(self.tmpdir))
+        self.assertEqual(reopened.resolve_collection(), collection)
+        self.assertEqual(self._uids(reopened), ["a", "b"])
+
+
+    def test_deleted_rows_reused(self):
+        """Test that churn does not grow the vector file."""
+        adapter = self._adapter(self.tmpdir)
+        collection = adapter.client._get(adapter.collection_name)
+        for _ in range(3):
+            adapter.delete_many(["a", "b"])
+            adapter.add_vectors(self.documents[:2], self.vectors[:2])
+
+        self.assertEqual(collection.count, 3)
+        self.assertEqual(self._uids(adapter), ["a", "b", "c"])
+        adapter.client.close()
+
+        reopened = QdrantAdapter(client=LocalVectorClient(self.tmpdir))
+        reopened.delete_many(["c"])
+        reopened.add_vectors(
+            [{"uid": "d", "content_type": "ResearchNote"}], [[0.0, 0.0, 1.0]]
+        )
+        self.assertEqual(reopened.client._get(reopened.collection_name).count, 3)
+        self.assertEqual(self._uids(reopened), ["a", "b", "d"])
+
+    def test_path_locked_against_other_processes(self):
+        """Test that a storage directory is used by one process at a time."""
+        client = LocalVectorClient(self.tmpdir)
+        lock_path = os.path.join(self.tmpdir, "lock")
+        with open(lock_path) as lock_file, self.assertRaises(BlockingIOError):
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        client.close()
+
+        with open(lock_path) as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            with self.assertRaises(RuntimeError):
+                LocalVectorClient(self.tmpdir)
+
+
+class TestDocumentChunking(unittest.TestCase):
+    """Test chunked embeddings of long documents."""
+
+    def test_chunk_text_overlapping_windows(self):
+        """Test that long text is split into overlapping windows."""
+        generator = EmbeddingGenerator("test-model")
+        generator._model = Mock()
+        generator._model.tokenizer.side_effect = TypeError("no offsets")
+        generator._model_info = {"max_seq_length": 6, "embedding_dimension": 3}
+        text = " ".join(f"w{i}" for i in range(10))
+
+        self.assertEqual(
+            generator.chunk_text(text, overlap=2),
+            ["w0 w1 w2 w3", "w2 w3 w4 w5", "w4 w5 w6 w7", "w6 w7 w8 w9"],
+        )
+        self.assertEqual(
+            generator.chunk_text(text, overlap=2, max_chunks=2)[-1], "w2 w3 w4 w5"
+        )
+        self.assertEqual(generator.chunk_text("w0 w1"), ["w0 w1"])
+
+    def test_chunks_embedded_whole(self):
+        """Test that chunks with long tokens are not cut before tokenizing."""
+        generator = EmbeddingGenerator("test-model", chunking=True)
+        generator._model = Mock()
+        generator._model.encode.return_value = np.zeros((1, 3))
+        generator._model_info = {"max_seq_length": 6, "embedding_dimension": 3}
+        # Four tokens of ten characters, well within the model's window
+        chunk = " ".join(["knowledge"] * 4)
+
+        generator.generate_embeddings([chunk])
+        self.assertEqual(generator._model.encode.call_args[0][0], [chunk])
+
+    def test_unchunked_text_bounded(self):
+        """Test that text is cut explicitly when documents are not chunked."""
+        note = Mock(portal_type="ResearchNote", title="", description="")
+        note.content.output = "x" * 5000
+        note.key_findings = []
+        note.tags = []
+        self.assertEqual(
+            len(EmbeddingGenerator("test-model").prepare_content_text(note)),
+            len("Content: ") + 2000,
+        )
+        chunked = EmbeddingGenerator("test-model", chunking=True)
+        self.assertIn("x" * 5000, chunked.prepare_content_text(note))
+
+        generator = EmbeddingGenerator("test-model")
+        generator._model = Mock()
+        generator._model.encode.return_value = np.zeros((1, 3))
+        generator._model_info = {"max_seq_length": 6, "embedding_dimension": 3}
+        generator.generate_embeddings(["x" * 100])
+        self.assertEqual(generator._model.encode.call_args[0][0], ["x" * 24])
+
+    def test_search_collapses_chunks(self):
+        """Test that each document is represented by its best chunk."""
+        adapter = QdrantAdapter(client=LocalVectorClient())
+        adapter.chunked = True
+        adapter.initialize_collection(vector_size=3)
+        adapter.upsert_many(
+            [chunk_key("a", 0), chunk_key("a", 1), chunk_key("b", 0)],
+            [[0.0, 0.0, 1.0], [1.0, 0.0, 0.0], [0.9, 0.1, 0.0]],
+            [
+                {"uid": "a", "chunk": 0, "chunks": 2},
+                {"uid": "a", "chunk": 1, "chunks": 2},
+                {"uid": "b", "chunk": 0, "chunks": 1},
+            ],
+        )
+
+        results = adapter.search_similar([1.0, 0.0, 0.0], score_threshold=0.5)
+        self.assertEqual([result["uid"] for result in results], ["a", "b"])
+        self.assertEqual(results[0]["chunk"], 1)
+
+        adapter.delete_chunks(["a"])
+        results = adapter.search_similar([1.0, 0.0, 0.0], score_threshold=0.5)
+        self.assertEqual([result["uid"] for result in results], ["b"])
+
+    def test_delete_vector_removes_all_chunks(self):
+        """Test that deleting a chunked document leaves no chunk behind."""
+        adapter = QdrantAdapter(client=LocalVectorClient())
+        adapter.chunked = True
+        adapter.initialize_collection(vector_size=3)
+        adapter.upsert_many(
+            [chunk_key("a", 0), chunk_key("a", 1), chunk_key("a", 2)],
+            [[1.0, 0.0, 0.0]] * 3,
+            [{"uid": "a", "chunk": i, "chunks": 3} for i in range(3)],
+        )
+
+        self.assertTrue(adapter.delete_vector("a"))
+        self.assertEqual(list(adapter.scroll_points()), [])
+
+
+class TestDuplicateDetector(unittest.TestCase):
+    """Test the blocked all-pairs duplicate join."""
+
+    def setUp(self):
+        self.adapter = QdrantAdapter(client=LocalVectorClient())
+        self.adapter.initialize_collection(vector_size=3)
+        documents = [
+            {"uid": "a", "title": "A", "content_type": "ResearchNote"},
+            {"uid": "b", "title": "B", "content_type": "ResearchNote"},
+            {"uid": "c", "title": "C", "content_type": "ResearchNote"},
+            {"uid": "d", "title": "D", "content_type": "BookmarkPlus"},
+            {"uid": "e", "title": "E", "content_type": "ResearchNote"},
+        ]
+        vectors = [
+            [1.0, 0.0, 0.0],
+            [0.99, 0.1, 0.0],
+            [0.98, 0.2, 0.0],
+            [1.0, 0.01, 0.0],
+            [0.0, 0.0, 1.0],
+        ]
+        self.adapter.add_vectors(documents, vectors)
+
+    def test_groups_chained_pairs(self):
+        """Test that pairs across blocks are merged into one group."""
+        progress = []
+        detector = DuplicateDetector(
+            self.adapter,
+            score_threshold=0.99,
+            block_size=2,
+            progress=lambda done, total: progress.append((done, total)),
+        )
+        groups = detector.run()
+
+        self.assertEqual(len(groups), 1)
+        self.assertEqual([item["uid"] for item in groups[0]], ["a", "b", "c"])
+        self.assertEqual(groups[0][0]["score"], 1.0)
+        self.assertEqual(progress, [(2, 5), (4, 5), (5, 5)])
+
+    def test_same_type_only(self):
+        """Test that items of different types are grouped only on request."""
+        detector = DuplicateDetector(
+            self.adapter, score_threshold=0.999, same_type_only=False
+        )
+        self.assertEqual(
+            [[item["uid"] for item in group] for group in detector.run()],
+            [["a", "d"]],
+        )
+        self.assertEqual(
+            DuplicateDetector(self.adapter, score_threshold=0.999).run(), []
+        )
+
+    def test_union_find(self):
+        """Test set merging."""
+        union_find = UnionFind(5)
+        union_find.union(0, 3)
+        union_find.union(3, 4)
+        self.assertEqual(union_find.groups(), [[0, 3, 4]])
+
+
+class TestClusteringEngine(unittest.TestCase):
+    """Test streamed mini-batch clustering and its model cache."""
+
+    def setUp(self):
+        self.adapter = QdrantAdapter(client=LocalVectorClient())
+        self.adapter.initialize_collection(vector_size=3)
+        rng = np.random.default_rng(0)
+        documents = []
+        vectors = []
+        for i in range(40):
+            center = [1.0, 0.0, 0.0] if i % 2 else [0.0, 0.0, 1.0]
+            documents.append({
+                "uid": f"item-{i}",
+                "title": f"Item {i}",
+                "content_type": "ResearchNote",
+            })
+            vectors.append((np.array(center) + rng.normal(0, 0.05, 3)).tolist())
+        self.adapter.add_vectors(documents, vectors)
+
+    def test_clusters_streamed_vectors(self):
+        """Test that every point is assigned across several scroll pages."""
+        model = ClusteringEngine(self.adapter, batch_size=8).fit(n_clusters=2)
+        clusters = model.clusters()
+
+        self.assertEqual(len(clusters), 2)
+        for items in clusters.values():
+            self.assertEqual(len(items), 20)
+            parities = {int(item["uid"].split("-")[1]) % 2 for item in items}
+            self.assertEqual(len(parities), 1)
+            self.assertEqual(
+                sum(item["cluster_representative"] for item in items), 1
+            )
+
+    def test_model_cached_until_collection_changes(self):
+        """Test that the model is re-fitted only after material changes."""
+        engine = ClusteringEngine(self.adapter, batch_size=8)
+        model = engine.get_model(n_clusters=2)
+        self.assertIs(engine.get_model(n_clusters=2), model)
+
+        self.adapter.add_vectors([{"uid": "extra"}], [[0.0, 1.0, 0.0]])
+        self.assertIs(engine.get_model(n_clusters=2), model)
+
+        self.adapter.add_vectors(
+            [{"uid": f"more-{i}"} for i in range(5)], [[0.0, 1.0, 0.0]] * 5
+        )
+        self.assertIsNot(engine.get_model(n_clusters=2), model)
+
+
+class TestUserProfiles(unittest.TestCase):
+    """Test the incrementally maintained user preference vectors."""
+
+    layer = PLONE_APP_KNOWLEDGE_INTEGRATION_TESTING
+
+    def setUp(self):
+        self.portal = self.layer["portal"]
+        self.profiles = UserProfiles(self.portal, decay=0.5)
+
+    def test_decayed_running_mean(self):
+        """Test that interactions pull the profile towards their vector."""
+        self.profiles.update("jane", [2.0, 0.0], "model")
+        np.testing.assert_allclose(self.profiles.get("jane", "model"), [1.0, 0.0])
+
+        profile = self.profiles.update("jane", [0.0, 1.0], "model")
+        np.testing.assert_allclose(profile, [0.7071, 0.7071], atol=1e-4)
+
+        profile = self.profiles.update("jane", [0.0, 1.0], "model", weight=0.0)
+        np.testing.assert_allclose(profile, [0.7071, 0.7071], atol=1e-4)
+
+    def test_stored_as_float32_bytes(self):
+        """Test the compact storage format and model isolation."""
+        self.profiles.update("jane", [0.6, 0.8, 0.0], "model")
+
+        model_name, data, _updated = IAnnotations(self.portal)[
+            PROFILES_ANNOTATION_KEY
+        ]["jane"]
+        self.assertEqual(model_name, "model")
+        self.assertEqual(len(data), 3 * 4)
+        self.assertIsNone(self.profiles.get("jane", "other-model"))
+
+    def test_interacted_uids_recorded(self):
+        """Test that the content behind each interaction is remembered."""
+        self.profiles.update("jane", [1.0, 0.0], "model", uid="b")
+        self.profiles.update("jane", [0.0, 1.0], "model", weight=0.5, uid="a")
+        self.profiles.update("jane", [0.0, 1.0], "model", uid="a")
+
+        self.assertEqual(self.profiles.interacted("jane"), ["a", "b"])
+        self.assertEqual(self.profiles.interacted("joe"), [])
+        self.assertEqual(self.profiles.interacted_among("jane", ["a", "c"]), {"a"})
+        self.assertEqual(self.profiles.interacted_among("joe", ["a"]), set())
+        self.profiles.remove("jane")
+        self.assertEqual(self.profiles.interacted("jane"), [])
+
+
+class TestVectorReconciler(unittest.TestCase):
+    """Test the catalog/collection drift reconciler."""
+
+    def setUp(self):
+        self.adapter = QdrantAdapter(client=LocalVectorClient())
+        self.adapter.initialize_collection(vector_size=3)
+        self.adapter.add_vectors(
+            [
+                {
+                    "uid": "current",
+                    "content_type": "ResearchNote",
+                    "workflow_state": "private",
+                    "modified": "2024-01-01T00:00:00+00:00",
+                },
+                {
+                    "uid": "edited",
+                    "content_type": "ResearchNote",
+                    "workflow_state": "private",
+                    "modified": "2024-01-01T00:00:00+00:00",
+                },
+                {
+                    "uid": "removed",
+                    "content_type": "ResearchNote",
+                    "workflow_state": "private",
+                    "modified": "2024-01-01T00:00:00+00:00",
+                },
+            ],
+            [[1.0, 0.0, 0.0]] * 3,
+        )
+        self.manager = Mock()
+        self.manager.adapter = self.adapter
+        self.manager.apply_changes.return_value = {
+            "indexed": 0,
+            "deleted": 1,
+            "success": True,
+        }
+
+    def _brain(self, uid, modified):
+        brain = Mock()
+        brain.UID = uid
+        brain.modified.timeTime.return_value = to_timestamp(modified)
+        brain.review_state = "private"
+        return brain
+
+    @patch("knowledge.curator.vector.reconcile.api")
+    def test_dry_run_reports_drift(self, mock_api):
+        """Test that missing, stale and orphaned vectors are found."""
+        catalog = mock_api.portal.get_tool.return_value
+        catalog.unrestrictedSearchResults.return_value = [
+            self._brain("current", "2024-01-01T00:00:00+00:00"),
+            self._brain("edited", "2024-03-01T00:00:00+00:00"),
+            self._brain("new", "2024-03-01T00:00:00+00:00"),
+        ]
+
+        report = VectorReconciler(self.manager).run(dry_run=True)
+
+        self.assertEqual(report["catalog_items"], 3)
+        self.assertEqual(report["indexed_items"], 3)
+        self.assertEqual(report["samples"]["missing"], ["new"])
+        self.assertEqual(report["samples"]["stale"], ["edited"])
+        self.assertEqual(report["samples"]["orphaned"], ["removed"])
+        self.manager.apply_changes.assert_not_called()
+
+    @patch("knowledge.curator.vector.reconcile.api")
+    def test_orphans_deleted_by_point_id(self, mock_api):
+        """Test that a legacy point is removed without touching the live one."""
+        # Legacy points of "current" with random IDs: a document and a chunk
+        legacy = "0f6f4b1e-2c1d-4a55-9a0e-7d2c9b8e1f00"
+        legacy_chunk = "0f6f4b1e-2c1d-4a55-9a0e-7d2c9b8e1f01"
+        payload = {"uid": "current", "content_type": "ResearchNote"}
+        self.adapter.upsert_points(
+            [legacy, legacy_chunk],
+            [[0.0, 1.0, 0.0]] * 2,
+            [payload, {**payload, "chunk": 1}],
+        )
+        brain = self._brain("current", "2024-01-01T00:00:00+00:00")
+        catalog = mock_api.portal.get_tool.return_value
+        catalog.unrestrictedSearchResults.side_effect = lambda **query: (
+            [] if "UID" in query else [brain]
+        )
+
+        report = VectorReconciler(self.manager).run()
+
+        self.assertEqual(report["orphaned"], 3)
+        self.assertEqual(report["orphaned_chunks"], 1)
+        self.assertEqual(report["deleted"], 4)
+        remaining = [p.id for batch in self.adapter.scroll_points() for p in batch]
+        self.assertEqual(remaining, [point_id_for_uid("current")])
+
+    @patch("knowledge.curator.vector.reconcile.api")
+    def test_points_outside_requested_types(self, mock_api):
+        """Test that points of unindexed types are orphaned, others skipped."""
+        self.adapter.upsert_points(
+            [point_id_for_uid("page"), point_id_for_uid("goal")],
+            [[0.0, 1.0, 0.0]] * 2,
+            [
+                {"uid": "page", "content_type": "Document"},
+                {"uid": "goal", "content_type": "LearningGoal"},
+            ],
+        )
+        catalog = mock_api.portal.get_tool.return_value
+        catalog.unrestrictedSearchResults.return_value = [
+            self._brain("current", "2024-01-01T00:00:00+00:00"),
+            self._brain("edited", "2024-01-01T00:00:00+00:00"),
+            self._brain("removed", "2024-01-01T00:00:00+00:00"),
+        ]
+
+        report = VectorReconciler(self.manager).run(
+            content_types=["ResearchNote"], dry_run=True
+        )
+
+        self.assertEqual(report["samples"]["orphaned"], ["page"])
+        self.assertEqual(report["indexed_items"], 4)
+
+    @patch("knowledge.curator.vector.reconcile.api")
+    def test_chunks_of_removed_content_orphaned(self, mock_api):
+        """Test that chunks are checked against the sorted catalog entries."""
+        self.adapter.upsert_points(
+            [
+                point_id_for_uid(chunk_key("current", 1)),
+                point_id_for_uid(chunk_key("removed", 1)),
+            ],
+            [[0.0, 1.0, 0.0]] * 2,
+            [
+                {"uid": "current", "content_type": "ResearchNote", "chunk": 1},
+                {"uid": "removed", "content_type": "ResearchNote", "chunk": 1},
+            ],
+        )
+        catalog = mock_api.portal.get_tool.return_value
+        catalog.unrestrictedSearchResults.return_value = [
+            self._brain("current", "2024-01-01T00:00:00+00:00"),
+        ]
+
+        report = VectorReconciler(self.manager).run(dry_run=True)
+
+        self.assertEqual(report["orphaned_chunks"], 1)
+        self.assertTrue(is_indexed([(point_id_for_uid("current"),)], "current"))
+        self.assertFalse(is_indexed([(point_id_for_uid("current"),)], "removed"))
+
+    def test_points_without_timestamps_stale(self):
+        """Test that points indexed before modified_ts existed are re-indexed."""
+        entry = (point_id_for_uid("a"), "a", 1704067200.0, "published")
+
+        self.assertTrue(is_stale(entry, {"workflow_state": "published"}))
+        current = {"modified_ts": 1704067200.0, "workflow_state": "published"}
+        self.assertFalse(is_stale(entry, current))
+
+    def test_merge_sorted(self):
+        """Test the point ID ordered merge of both sides."""
+        points = [Mock(id="b"), Mock(id="c")]
+        pairs = list(merge_sorted([("a",), ("c",)], points))
+
+        self.assertEqual(
+            [(entry and entry[0], point and point.id) for entry, point in pairs],
+            [("a", None), (None, "b"), ("c", "c")],
+        )
+
+
+class TestVectorBackup(unittest.TestCase):
+    """Test streamed vector backups."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.adapter = QdrantAdapter(client=LocalVectorClient())
+        self.adapter.initialize_collection(vector_size=3)
+        self.adapter.add_vectors(
+            [{"uid": f"uid-{i}", "title": f"Item {i}"} for i in range(3)],
+            [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.6, 0.8]],
+        )
+        # A point whose ID is not derived from its UID
+        self.adapter.upsert_points(
+            ["0f6f4b1e-2c1d-4a55-9a0e-7d2c9b8e1f00"], [[0.5, 0.5, 0.0]], [{}]
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _manager(self, mock_get_pool):
+        embeddings = Mock(model_name="test-model", embedding_dimension=3)
+        mock_get_pool.return_value.adapter.return_value = self.adapter
+        mock_get_pool.return_value.embedding_generator.return_value = embeddings
+        return VectorCollectionManager({"embedding_model": "test-model"})
+
+    @patch("knowledge.curator.vector.management.get_component_pool")
+    def test_backup_restore_roundtrip(self, mock_get_pool):
+        """Test that a restore keeps point IDs, vectors and payloads."""
+        manager = self._manager(mock_get_pool)
+        path = os.path.join(self.tmpdir, "backup")
+        original = {
+            point.id: point
+            for batch in self.adapter.scroll_points(with_vectors=True)
+            for point in batch
+        }
+
+        self.assertTrue(manager.backup_vectors(path, block_size=3))
+        reader = BackupReader(path)
+        self.assertEqual(len(reader), 4)
+        self.assertEqual(len(reader.manifest["blocks"]), 2)
+
+        self.assertTrue(manager.restore_vectors(path))
+        self.assertIsNotNone(self.adapter.get_alias_target())
+        restored = {
+            point.id: point
+            for batch in self.adapter.scroll_points(with_vectors=True)
+            for point in batch
+        }
+        self.assertEqual(set(restored), set(original))
+        for point_id, point in original.items():
+            self.assertEqual(restored[point_id].payload, point.payload)
+            np.testing.assert_allclose(restored[point_id].vector, point.vector)
+
+    @patch("knowledge.curator.vector.management.get_component_pool")
+    def test_legacy_backup_rekeyed(self, mock_get_pool):
+        """Test that points of old JSON backups get UID-derived IDs."""
+        manager = self._manager(mock_get_pool)
+        path = os.path.join(self.tmpdir, "backup.json")
+        legacy = {
+            "vector_dimension": 3,
+            "points": [
+                {
+                    "id": "0f6f4b1e-2c1d-4a55-9a0e-7d2c9b8e1f0" + str(i),
+                    "vector": [1.0, 0.0, 0.0],
+                    "payload": payload,
+                }
+                for i, payload in enumerate([
+                    {"uid": "old"},
+                    {"uid": "old", "chunk": 1},
+                    {"title": "No UID"},
+                ])
+            ],
+        }
+        with open(path, "w") as f:
+            json.dump(legacy, f)
+
+        self.assertTrue(manager.restore_vectors(path))
+        restored = {p.id for batch in self.adapter.scroll_points() for p in batch}
+        self.assertEqual(
+            restored,
+            {
+                point_id_for_uid("old"),
+                point_id_for_uid(chunk_key("old", 1)),
+                "0f6f4b1e-2c1d-4a55-9a0e-7d2c9b8e1f02",
+            },
+        )
+
+    @patch("knowledge.curator.vector.management.get_component_pool")
+    def test_failed_restore_drops_new_collection(self, mock_get_pool):
+        """Test that a failed restore leaves only the live collection."""
+        manager = self._manager(mock_get_pool)
+        path = os.path.join(self.tmpdir, "backup")
+        self.assertTrue(manager.backup_vectors(path))
+        before = {c.name for c in self.adapter.client.get_collections().collections}
+
+        with patch.object(QdrantAdapter, "upsert_points", return_value=False):
+            self.assertFalse(manager.restore_vectors(path))
+
+        after = {c.name for c in self.adapter.client.get_collections().collections}
+        self.assertEqual(after, before)
+        self.assertEqual(self.adapter.get_collection_info()["points_count"], 4)
+
+    @patch("knowledge.curator.vector.management.get_component_pool")
+    def test_float16_backup(self, mock_get_pool):
+        """Test that float16 backups read back as float32 vectors."""
+        manager = self._manager(mock_get_pool)
+        path = os.path.join(self.tmpdir, "backup")
+
+        self.assertTrue(manager.backup_vectors(path, dtype="float16"))
+        self.assertTrue(is_stream_backup(path))
+        ids, vectors, payloads = next(BackupReader(path).blocks())
+
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(vectors.dtype, np.float32)
+        self.assertEqual(vectors.shape, (4, 3))
+        self.assertIn("uid-0", [payload.get("uid") for payload in payloads])
+
+
+class TestIndexSettings(unittest.TestCase):
+    """Test quantization, HNSW settings and their benchmark."""
+
+    def test_create_collection_applies_settings(self):
+        """Test that new collections get quantization and HNSW settings."""
+        client = Mock()
+        adapter = QdrantAdapter(client=client)
+        adapter.index_settings = index_settings({
+            "quantization": "scalar",
+            "on_disk": True,
+            "hnsw_m": 32,
+        })
+        adapter.create_collection("test", 768)
+
+        kwargs = client.create_collection.call_args.kwargs
+        self.assertTrue(kwargs["vectors_config"].on_disk)
+        self.assertEqual(kwargs["hnsw_config"].m, 32)
+        self.assertEqual(kwargs["quantization_config"].scalar.type, "int8")
+
+    def test_search_params_rescore_quantized(self):
+        """Test that quantized searches are rescored with oversampling."""
+        self.assertIsNone(search_params(index_settings()))
+        params = search_params(index_settings({"quantization": "product"}))
+        self.assertTrue(params.quantization.rescore)
+        self.assertEqual(params.quantization.oversampling, 2.0)
+        with self.assertRaises(ValueError):
+            quantization_config({"quantization": "binary"})
+
+    def test_estimate_memory(self):
+        """Test that quantized, on-disk settings need less RAM."""
+        full = estimate_memory(100000, 768, {})
+        scalar = estimate_memory(
+            100000, 768, {"quantization": "scalar", "on_disk": True}
+        )
+        self.assertLess(scalar["ram_mb"], full["ram_mb"] / 3)
+        self.assertGreater(scalar["disk_mb"], full["disk_mb"])
+
+    def test_benchmark(self):
+        """Test that every setting is measured on a scratch collection."""
+        adapter = QdrantAdapter(client=LocalVectorClient())
+        adapter.initialize_collection(vector_size=4)
+        rng = np.random.default_rng(0)
+        adapter.add_vectors(
+            [{"uid": f"uid-{i}"} for i in range(50)], rng.random((50, 4)).tolist()
+        )
+
+        results = IndexBenchmark(adapter, queries=5, limit=3).run({
+            "float32": {},
+            "scalar": {"quantization": "scalar"},
+        })
+
+        self.assertEqual([row["name"] for row in results], ["float32", "scalar"])
+        # The local engine always searches exactly
+        self.assertEqual(results[1]["recall@3"], 1.0)
+        self.assertEqual(
+            [c.name for c in adapter.client.get_collections().collections],
+            ["plone_knowledge"],
+        )
+
+
+class TestQueryEmbedder(unittest.TestCase):
+    """Test the query embedding cache and cross-thread batching."""
+
+    def test_cache_hits_and_normalization(self):
+        """Test that repeated queries are encoded once."""
+        generator = Mock()
+        generator.generate_embedding.return_value = [0.1, 0.2]
+        embedder = QueryEmbedder(generator, max_wait=0)
+
+        embedder.embed("machine  learning")
+        embedder.embed(" machine learning ")
+
+        generator.generate_embedding.assert_called_once_with("machine learning")
+        stats = embedder.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_cache_expiry_and_eviction(self):
+        """Test that entries expire after the TTL and the LRU is bounded."""
+        cache = QueryEmbeddingCache(max_entries=2, ttl=0)
+        cache.put("a", [1.0])
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["expired"], 1)
+
+        cache = QueryEmbeddingCache(max_entries=2, ttl=60)
+        for query in ("a", "b", "c"):
+            cache.put(query, [1.0])
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), [1.0])
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_concurrent_queries_are_batched(self):
+        """Test that queries from several threads share one model call."""
+        generator = Mock()
+        generator.generate_embeddings.side_effect = lambda texts, batch_size: [
+            [float(len(text))] for text in texts
+        ]
+        batcher = QueryBatcher(generator, max_batch=4, max_wait=5.0)
+        results = {}
+
+        def embed(text):
+            results[text] = batcher.embed(text)
+
+        threads = [
+            threading.Thread(target=embed, args=("x" * n,)) for n in range(1, 5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        generator.generate_embeddings.assert_called_once()
+        self.assertEqual(results, {"x" * n: [float(n)] for n in range(1, 5)})
+        self.assertEqual(batcher.stats()["mean_batch_size"], 4)
+
+    def test_one_embedder_per_model_and_backend(self):
+        """Test that query embedders are shared like pooled generators."""
+        torch = Mock(model_name="query-model", backend="torch")
+        reloaded = Mock(model_name="query-model", backend="torch")
+        int8 = Mock(model_name="query-model", backend="onnx-int8")
+
+        embedder = get_query_embedder(torch)
+        self.assertIs(get_query_embedder(reloaded), embedder)
+        self.assertIsNot(get_query_embedder(int8), embedder)
+
+
+class TestVectorComponentPool(unittest.TestCase):
+    """Test the shared embedding model and Qdrant client pool."""
+
+    @patch("knowledge.curator.vector.pool.EmbeddingGenerator")
+    def test_one_generator_per_model(self, mock_generator_class):
+        """Test that a model is only constructed once per process."""
+        pool = VectorComponentPool()
+        first = pool.embedding_generator("model-a")
+        second = pool.embedding_generator("model-a")
+        pool.embedding_generator("model-b")
+
+        self.assertIs(first, second)
+        self.assertEqual(mock_generator_class.call_count, 2)
+
+    @patch("knowledge.curator.vector.pool.EmbeddingGenerator")
+    def test_one_generator_per_backend(self, mock_generator_class):
+        """Test that each inference backend of a model gets its own generator."""
+        pool = VectorComponentPool()
+        pool.embedding_generator("model-a", {"embedding_backend": "torch"})
+        pool.embedding_generator("model-a", {"embedding_backend": "onnx-int8"})
+        pool.embedding_generator("model-a", {"embedding_backend": "onnx-int8"})
+
+        self.assertEqual(mock_generator_class.call_count, 2)
+        self.assertEqual(
+            mock_generator_class.call_args.kwargs["backend"], "onnx-int8"
+        )
+
+    @patch("knowledge.curator.vector.pool.QdrantClient")
+    def test_adapters_share_client(self, mock_client_class):
+        """Test that adapters for the same host reuse one client."""
+        config = {"qdrant_host": "localhost", "qdrant_port": 6333}
+        pool = VectorComponentPool()
+        first = pool.adapter(config)
+        second = pool.adapter(config)
+
+        mock_client_class.assert_called_once_with(
+            host="localhost", port=6333, api_key=None, https=False
+        )
+        self.assertIs(first.client, second.client)
+
+    def test_local_engine_selected_by_config(self):
+        """Test that the local engine replaces the Qdrant client."""
+        pool = VectorComponentPool()
+        adapter = pool.adapter({"vector_engine": "local"})
+
+        self.assertIsInstance(adapter.client, LocalVectorClient)
+        self.assertIs(adapter.client, pool.adapter({"vector_engine": "local"}).client)
+
+
+class TestEmbeddingBackends(unittest.TestCase):
+    """Test the ONNX Runtime embedding backends."""
+
+    def test_unknown_backend_rejected(self):
+        """Test that a misspelled backend fails early."""
+        with self.assertRaises(ValueError):
+            EmbeddingGenerator("test-model", backend="tensorrt")
+
+    @patch("knowledge.curator.vector.embeddings.SentenceTransformer")
+    def test_onnx_backend_loads_onnx_model(self, mock_transformer):
+        """Test that the onnx backend asks sentence-transformers for ONNX."""
+        mock_transformer.return_value.max_seq_length = 256
+        mock_transformer.return_value.get_sentence_embedding_dimension.return_value = (
+            384
+        )
+        generator = EmbeddingGenerator("test-model", backend="onnx")
+
+        self.assertEqual(generator.embedding_dimension, 384)
+        mock_transformer.assert_called_once_with("test-model", backend="onnx")
+
+    @patch("knowledge.curator.vector.embeddings.list_repo_files")
+    @patch("knowledge.curator.vector.embeddings.SentenceTransformer")
+    def test_int8_backend_prefers_published_export(
+        self, mock_transformer, mock_list_files
+    ):
+        """Test that a quantized export shipped with the model is used as is."""
+        target = onnx_quantization_target()
+        mock_list_files.return_value = [
+            "onnx/model.onnx",
+            f"onnx/model_quint8_{target}.onnx",
+            "onnx/model_qint8_other.onnx",
+        ]
+        generator = EmbeddingGenerator("test-model", backend="onnx-int8")
+        _ = generator.model
+
+        mock_transformer.assert_called_once_with(
+            "test-model",
+            backend="onnx",
+            model_kwargs={"file_name": f"onnx/model_quint8_{target}.onnx"},
+        )
+
+    @patch("knowledge.curator.vector.embeddings.list_repo_files")
+    @patch("knowledge.curator.vector.embeddings.SentenceTransformer")
+    def test_int8_file_name_configured(self, mock_transformer, mock_list_files):
+        """Test that a configured int8 file is loaded without a lookup."""
+        generator = EmbeddingGenerator(
+            "test-model", backend="onnx-int8", onnx_file_name="onnx/custom.onnx"
+        )
+        _ = generator.model
+
+        mock_list_files.assert_not_called()
+        self.assertEqual(
+            mock_transformer.call_args.kwargs["model_kwargs"],
+            {"file_name": "onnx/custom.onnx"},
+        )
+
+    def test_int8_onnx_file(self):
+        """Test that both signed and unsigned exports are recognized."""
+        files = ["onnx/model_qint8_arm64.onnx", "onnx/model_quint8_avx2.onnx"]
+        self.assertEqual(int8_onnx_file(files, "avx2"), "onnx/model_quint8_avx2.onnx")
+        self.assertEqual(int8_onnx_file(files, "arm64"), "onnx/model_qint8_arm64.onnx")
+        self.assertIsNone(int8_onnx_file(files, "avx512"))
+
+    def test_backends_agree_with_torch(self):
+        """Test that ONNX embeddings stay within the cosine tolerance."""
+        texts = [
+            "Spaced repetition improves long-term retention.",
+            "Knowledge graphs link concepts through typed relationships.",
+            "Vector search ranks documents by embedding similarity.",
+        ]
+        reference = np.asarray(EmbeddingGenerator().generate_embeddings(texts))
+        reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+        for backend in ("onnx", "onnx-int8"):
+            vectors = np.asarray(
+                EmbeddingGenerator(backend=backend).generate_embeddings(texts)
+            )
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            cosines = np.sum(vectors * reference, axis=1)
+            self.assertGreaterEqual(cosines.min(), BACKEND_MIN_COSINE[backend])
+
+
+class TestRebuildCheckpoint(unittest.TestCase):
+    """Test rebuild checkpointing."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "rebuild.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_round_trip(self):
+        """Test that a saved checkpoint is loaded and cleared."""
+        checkpoint = RebuildCheckpoint(self.path)
+        self.assertIsNone(checkpoint.load())
+
+        checkpoint.save({"last_uid": "abc", "processed": 10})
+        self.assertEqual(checkpoint.load()["last_uid"], "abc")
+
+        checkpoint.clear()
+        self.assertIsNone(checkpoint.load())
+
+    def test_progress_only_advances_over_contiguous_batches(self):
+        """Test that a slow batch holds the checkpoint back."""
+        checkpoint = RebuildCheckpoint(self.path)
+        state = {"last_uid": "", "processed": 0}
+        progress = _UpsertProgress(state, checkpoint)
+
+        progress.done(1, "b", 5)
+        self.assertEqual(state["last_uid"], "")
+        self.assertIsNone(checkpoint.load())
+
+        progress.done(0, "a", 5)
+        self.assertEqual(state["last_uid"], "b")
+        self.assertEqual(state["processed"], 10)
+        self.assertEqual(checkpoint.load()["last_uid"], "b")
+
+    def test_fresh_rebuild_drops_abandoned_shadow(self):
+        """Test that a rebuild not resumed deletes the earlier partial shadow."""
+        adapter = QdrantAdapter(client=LocalVectorClient())
+        adapter.create_collection("plone_knowledge__v1", 3)
+        adapter.swap_alias("plone_knowledge__v1")
+        adapter.create_collection("plone_knowledge__v2", 3)
+        RebuildCheckpoint(self.path).save(
+            {"collection": "plone_knowledge__v2", "shadow": True}
+        )
+        manager = Mock(adapter=adapter)
+        manager.embeddings.model_name = "model"
+
+        pipeline = RebuildPipeline(manager, checkpoint_path=self.path)
+        state = pipeline._start_state(["Note"], shadow=True, resume=False)
+
+        self.assertFalse(adapter.collection_exists("plone_knowledge__v2"))
+        self.assertTrue(adapter.collection_exists("plone_knowledge__v1"))
+        self.assertEqual(state["collection"], "plone_knowledge__model__v2")
+
+    @patch("knowledge.curator.vector.rebuild.getToolByName")
+    @patch("knowledge.curator.vector.rebuild.api")
+    def test_changes_before_swap_caught_up(self, mock_api, mock_get_tool):
+        """Test that a second catch-up after the swap covers the last window."""
+        mock_get_tool.return_value.searchResults.return_value = []
+        manager = Mock()
+        manager.adapter.swap_alias.return_value = None
+        state = {
+            "collection": "plone_knowledge__model__v2",
+            "started": "2026/01/01 00:00:00 UTC",
+            "resumed": False,
+            "last_uid": "",
+            "processed": 0,
+            "errors": 0,
+        }
+        pipeline = RebuildPipeline(manager, checkpoint_path=self.path)
+        calls = Mock()
+        with (
+            patch.object(pipeline, "_start_state", return_value=state),
+            patch.object(pipeline, "_run_stages"),
+            patch.object(pipeline, "_sync_target", return_value=(0, 0)),
+            patch.object(pipeline, "_catch_up", calls.catch_up),
+        ):
+            manager.adapter.swap_alias.side_effect = calls.swap_alias
+            pipeline.run(["Note"])
+
+        self.assertEqual(
+            [name for name, _args, _kwargs in calls.mock_calls],
+            ["catch_up", "swap_alias", "catch_up"],
+        )
+        first_since = calls.catch_up.call_args_list[0].args[-1]
+        second_since = calls.catch_up.call_args_list[1].args[-1]
+        self.assertEqual(first_since, DateTime(state["started"]))
+        self.assertGreater(second_since, first_since)
+
+    def test_points_removed_during_rebuild_dropped(self):
+        """Test that content removed while the shadow filled is not swapped in."""
+        target = QdrantAdapter(client=LocalVectorClient())
+        target.initialize_collection(vector_size=3)
+        keys = ["kept", "gone", chunk_key("gone", 1)]
+        target.upsert_points(
+            [point_id_for_uid(key) for key in keys],
+            [[1.0, 0.0, 0.0]] * 3,
+            [{"uid": "kept"}, {"uid": "gone"}, {"uid": "gone", "chunk": 1}],
+        )
+        catalog = Mock()
+        catalog.searchResults.return_value = [Mock(UID="kept")]
+
+        pipeline = RebuildPipeline(Mock())
+        self.assertEqual(pipeline._sync_target(target, catalog, ["Note"], {}), (2, 0))
+        remaining = [p.id for batch in target.scroll_points() for p in batch]
+        self.assertEqual(remaining, [point_id_for_uid("kept")])
+
+    def test_content_published_during_rebuild_indexed(self):
+        """Test that content without a point in the shadow is indexed."""
+        target = QdrantAdapter(client=LocalVectorClient())
+        target.initialize_collection(vector_size=3)
+        target.upsert_points(
+            [point_id_for_uid("kept")], [[1.0, 0.0, 0.0]], [{"uid": "kept"}]
+        )
+        published = Mock(UID="published")
+        catalog = Mock()
+        catalog.searchResults.return_value = [Mock(UID="kept"), published]
+        state = {}
+
+        pipeline = RebuildPipeline(Mock())
+        with patch.object(pipeline, "_run_stages") as mock_run_stages:
+            result = pipeline._sync_target(target, catalog, ["Note"], state)
+
+        self.assertEqual(result, (0, 1))
+        mock_run_stages.assert_called_once_with(
+            [published], target, state, checkpoint=False
+        )
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    """Test the content-hash embedding cache."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_memory_hit_and_miss(self):
+        """Test that a stored embedding is returned and counted."""
+        cache = EmbeddingCache("test-model")
+        self.assertIsNone(cache.get("hello"))
+
+        cache.put("hello", [0.5, 0.25, 0.125])
+        self.assertEqual(cache.get("hello"), [0.5, 0.25, 0.125])
+
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_zero_vectors_not_cached(self):
+        """Test that failed (all-zero) embeddings are not cached."""
+        cache = EmbeddingCache("test-model")
+        cache.put("broken", [0.0, 0.0, 0.0])
+        self.assertIsNone(cache.get("broken"))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted."""
+        cache = EmbeddingCache("test-model", max_entries=2)
+        cache.put("a", [1.0])
+        cache.put("b", [2.0])
+        cache.get("a")
+        cache.put("c", [3.0])
+
+        self.assertEqual(cache.get("a"), [1.0])
+        self.assertIsNone(cache.get("b"))
+
+    def test_disk_tier_survives_restart(self):
+        """Test that embeddings persist in the on-disk store."""
+        cache = EmbeddingCache("test/model", directory=self.tmpdir)
+        cache.put("persisted", [0.5, 0.25])
+
+        reopened = EmbeddingCache("test/model", directory=self.tmpdir)
+        self.assertEqual(reopened.get("persisted"), [0.5, 0.25])
+        self.assertEqual(reopened.stats()["disk_hits"], 1)
+
+    def test_disk_tier_torn_and_shared_writes(self):
+        """Test that keys stay on their rows after crashes and shared writers."""
+        cache = EmbeddingCache("test-model", directory=self.tmpdir)
+        cache.put("first", [1.0, 2.0])
+        # A crash after the vector append leaves a row without a key
+        with open(cache.disk.vectors_path, "ab") as f:
+            f.write(np.zeros(2, dtype=np.float32).tobytes())
+
+        # Another process sharing the directory appends in between
+        other = DiskVectorStore(cache.disk.directory)
+        other.put(text_digest("second"), np.array([3.0, 4.0]))
+        cache.put("third", [5.0, 6.0])
+
+        reopened = EmbeddingCache("test-model", directory=self.tmpdir)
+        self.assertEqual(reopened.get("first"), [1.0, 2.0])
+        self.assertEqual(reopened.get("second"), [3.0, 4.0])
+        self.assertEqual(reopened.get("third"), [5.0, 6.0])
+        self.assertEqual(len(reopened.disk), 3)
+
+    def test_backend_variants_cached_apart(self):
+        """Test that embeddings of one backend are not served for another."""
+        torch = EmbeddingCache("test-model", directory=self.tmpdir)
+        torch.put("text", [1.0, 0.0])
+
+        int8 = EmbeddingCache(
+            "test-model", directory=self.tmpdir, variant="onnx-int8-avx2"
+        )
+        self.assertIsNone(int8.get("text"))
+        self.assertNotEqual(int8.disk.directory, torch.disk.directory)
+        self.assertEqual(
+            EmbeddingGenerator("test-model", backend="onnx").variant, "onnx"
+        )
+
+
+class TestVectorIndexQueue(unittest.TestCase):
+    """Test the transaction-aware vector indexing queue."""
+
+    def _job(self, documents=(), deletes=()):
+        return {
+            "documents": [{"uid": uid, "title": title} for uid, title in documents],
+            "texts": [title for _uid, title in documents],
+            "deletes": list(deletes),
+            "config": {"async_indexing": True},
+        }
+
+    def test_pending_changes_deduplicate_by_uid(self):
+        """Test that repeated events for one object collapse to one update."""
+        obj = Mock()
+        obj.UID.return_value = "uid1"
+
+        pending = PendingVectorChanges()
+        pending.index(obj)
+        pending.index(obj)
+        pending.index(obj)
+
+        self.assertEqual(pending.resolve(), {"uid1": ("index", obj)})
+
+    def test_pending_changes_last_operation_wins(self):
+        """Test that a deletion after an edit removes the vector."""
+        obj = Mock()
+        obj.UID.return_value = "uid1"
+
+        pending = PendingVectorChanges()
+        pending.index(obj)
+        pending.delete("uid1")
+
+        self.assertEqual(pending.resolve(), {"uid1": ("delete", "uid1")})
+
+    def test_merge_jobs(self):
+        """Test that jobs are merged in commit order."""
+        merged = merge_jobs([
+            self._job(documents=[("a", "A1"), ("b", "B1")]),
+            self._job(documents=[("a", "A2")], deletes=["b"]),
+            self._job(documents=[("c", "C1")]),
+        ])
+
+        self.assertEqual([doc["uid"] for doc in merged["documents"]], ["a", "c"])
+        self.assertEqual(merged["texts"], ["A2", "C1"])
+        self.assertEqual(merged["deletes"], ["b"])
+
+    def test_interactions_keep_strongest_weight(self):
+        """Test that one user touching an object twice counts once."""
+        obj = Mock()
+        obj.UID.return_value = "uid1"
+
+        pending = PendingVectorChanges()
+        pending.index(obj, "create", "jane")
+        pending.index(obj, "edit", "jane")
+        pending.index(obj, "edit", None)
+
+        self.assertEqual(pending.resolve_interactions(), {("jane", "uid1"): 1.0})
+
+    def test_merge_jobs_collects_interactions(self):
+        """Test that profile interactions of all merged jobs are kept."""
+        first = self._job(documents=[("a", "A")])
+        first["profiles"] = {
+            "db": None,
+            "portal_path": ("", "plone"),
+            "interactions": [{"user_id": "jane", "uid": "a", "weight": 1.0}],
+        }
+        second = self._job(documents=[("b", "B")])
+        second["profiles"] = {
+            "db": None,
+            "portal_path": ("", "plone"),
+            "interactions": [{"user_id": "joe", "uid": "b", "weight": 0.5}],
+        }
+
+        merged = merge_jobs([first, self._job(deletes=["c"]), second])
+        self.assertEqual(
+            [item["user_id"] for item in merged["profiles"]["interactions"]],
+            ["jane", "joe"],
+        )
+        self.assertIsNone(merge_jobs([self._job()])["profiles"])
+
+    @patch("knowledge.curator.vector.indexing.get_index_worker")
+    def test_aborted_transaction_is_discarded(self, mock_get_worker):
+        """Test that changes from failed commits never reach the worker."""
+        _after_commit(False, self._job(documents=[("a", "A")]))
+        mock_get_worker.assert_not_called()
+
+        _after_commit(True, self._job(documents=[("a", "A")]))
+        mock_get_worker.return_value.submit.assert_called_once()
@@ -0,0 +1,17 @@
+"""Upgrade step moving the knowledge graph to incremental storage."""
+
+from knowledge.curator.graph.storage import GraphStorage
+from plone import api
+
+import logging
+
+
+logger = logging.getLogger("knowledge.curator.upgrades")
+
+
+def migrate_graph_storage(context):
+    """Move graph edges into per-source buckets and add the version counter."""
+    if GraphStorage(api.portal.get()).migrate():
+        logger.info("Migrated knowledge graph storage")
+    else:
+        logger.info("Knowledge graph storage already up to date")
@@ -1,21 +1,162 @@
 """Qdrant vector database adapter for Plone knowledge system."""
 
+from knowledge.curator.vector.filters import compile_filter
+from knowledge.curator.vector.filters import INDEXED_PAYLOAD_FIELDS
+from knowledge.curator.vector.filters import to_timestamp
 from qdrant_client import QdrantClient
 from qdrant_client.models import (
+    CompressionRatio,
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
     Distance,
-    FieldCondition,
-    Filter,
-    MatchValue,
+    FilterSelector,
+    HnswConfigDiff,
+    PointIdsList,
     PointStruct,
+    PointVectors,
+    ProductQuantization,
+    ProductQuantizationConfig,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
     VectorParams,
 )
 from typing import Any
 import logging
+import re
 import uuid
 
 
 logger = logging.getLogger("knowledge.curator.vector")
 
+# Namespace for deriving Qdrant point IDs from Plone UIDs
+POINT_ID_NAMESPACE = uuid.UUID("5b0a3c1e-7d2f-4e8a-9c61-2f4d8b7a1e03")
+
+
+def point_id_for_uid(uid: str) -> str:
+    """Return the deterministic Qdrant point ID for a Plone UID."""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, uid))
+
+
+def chunk_key(uid: str, index: int) -> str:
+    """Return the key a document chunk's point ID is derived from.
+
+    The first chunk uses the plain UID, so the document can still be looked
+    up with ``point_id_for_uid``.
+    """
+    return uid if index == 0 else f"{uid}#{index}"
+
+
+def point_id_for_payload(payload: dict[str, Any], point_id: str) -> str:
+    """Return the point ID a point with this payload is stored under.
+
+    Points written before IDs were derived from UIDs carry random IDs; they
+    are re-keyed from their UID and chunk number. Points without a UID keep
+    ``point_id``.
+    """
+    uid = (payload or {}).get("uid")
+    if not uid:
+        return point_id
+    return point_id_for_uid(chunk_key(uid, payload.get("chunk") or 0))
+
+
+# Storage and search settings of new collections, see ``get_vector_config``
+DEFAULT_INDEX_SETTINGS = {
+    "quantization": None,  # None, "scalar" or "product"
+    "quantization_always_ram": True,
+    "product_compression": "x16",
+    "on_disk": False,
+    "hnsw_m": None,
+    "hnsw_ef_construct": None,
+    "hnsw_ef": None,
+    "rescore": True,
+    "oversampling": 2.0,
+}
+
+
+def index_settings(config: dict[str, Any] | None = None) -> dict[str, Any]:
+    """Pick the index settings out of a vector configuration."""
+    config = config or {}
+    return {
+        key: config.get(key, default) for key, default in DEFAULT_INDEX_SETTINGS.items()
+    }
+
+
+def quantization_config(settings: dict[str, Any]):
+    """Return the Qdrant quantization config for the settings, or None."""
+    kind = (settings.get("quantization") or "none").lower()
+    always_ram = settings.get("quantization_always_ram", True)
+    if kind == "none":
+        return None
+    if kind == "scalar":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8, quantile=0.99, always_ram=always_ram
+            )
+        )
+    if kind == "product":
+        return ProductQuantization(
+            product=ProductQuantizationConfig(
+                compression=CompressionRatio(settings.get("product_compression")),
+                always_ram=always_ram,
+            )
+        )
+    raise ValueError(f"Unknown quantization: {kind}")
+
+
+def search_params(settings: dict[str, Any]) -> SearchParams | None:
+    """Return the search parameters for the settings, or None for defaults.
+
+    Quantized collections are searched on the compressed vectors and the
+    ``oversampling`` times ``limit`` best candidates are rescored with the
+    original vectors, which recovers most of the lost recall.
+    """
+    quantization = None
+    if (settings.get("quantization") or "none").lower() != "none":
+        quantization = QuantizationSearchParams(
+            rescore=settings.get("rescore", True),
+            oversampling=settings.get("oversampling"),
+        )
+    if quantization is None and settings.get("hnsw_ef") is None:
+        return None
+    return SearchParams(hnsw_ef=settings.get("hnsw_ef"), quantization=quantization)
+
+
+def model_slug(model_name: str) -> str:
+    """Return a collection-name-safe short form of an embedding model name."""
+    name = model_name.rsplit("/", 1)[-1].lower()
+    return re.sub(r"[^a-z0-9]+", "_", name).strip("_")
+
+
+def build_payload(doc: dict[str, Any]) -> dict[str, Any]:
+    """Build the point payload stored alongside a vector.
+
+    ``modified_ts`` and ``created_ts`` duplicate ``modified`` and ``created``
+    as numbers so that date ranges can be filtered with a payload index.
+    """
+    modified = doc.get("modified")
+    created = doc.get("created")
+    return {
+        "uid": doc.get("uid"),
+        "path": doc.get("path"),
+        "title": doc.get("title"),
+        "description": doc.get("description"),
+        "content_type": doc.get("content_type"),
+        "workflow_state": doc.get("workflow_state"),
+        "modified": modified,
+        "modified_ts": to_timestamp(modified) if modified else None,
+        "url": doc.get("url"),
+        "created": created,
+        "created_ts": to_timestamp(created) if created else None,
+        "creator": doc.get("creator"),
+        "tags": doc.get("tags", []),
+        "knowledge_type": doc.get("knowledge_type"),
+    }
+
 
 class QdrantAdapter:
     """Adapter for Qdrant vector database operations."""
@@ -26,11 +167,21 @@ class QdrantAdapter:
         port: int = 6333,
         api_key: str | None = None,
         https: bool = False,
+        client: QdrantClient | None = None,
     ):
-        """Initialize Qdrant client with configuration."""
-        self.client = QdrantClient(host=host, port=port, api_key=api_key, https=https)
+        """Initialize Qdrant client with configuration.
+
+        An existing ``client`` (e.g. from the component pool) is reused instead
+        of opening a new connection.
+        """
+        if client is None:
+            client = QdrantClient(host=host, port=port, api_key=api_key, https=https)
+        self.client = client
         self.collection_name = "plone_knowledge"
         self.vector_size = 384  # Default for sentence-transformers/all-MiniLM-L6-v2
+        # Documents may be stored as several chunk points sharing their UID
+        self.chunked = False
+        self.index_settings = dict(DEFAULT_INDEX_SETTINGS)
 
     def initialize_collection(self, vector_size: int | None = None):
         """Create or recreate the collection with proper configuration."""
@@ -38,105 +189,261 @@ class QdrantAdapter:
             self.vector_size = vector_size
 
         try:
-            # Check if collection exists
-            collections = self.client.get_collections().collections
-            exists = any(c.name == self.collection_name for c in collections)
-
-            if exists:
+            # Check if collection (or an alias of that name) exists
+            if self.collection_exists(self.collection_name):
                 logger.info(f"Collection '{self.collection_name}' already exists")
+                self.create_payload_indexes(self.collection_name)
             else:
                 # Create collection
-                self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=VectorParams(
-                        size=self.vector_size, distance=Distance.COSINE
-                    ),
-                )
-                logger.info(f"Created collection '{self.collection_name}'")
+                self.create_collection(self.collection_name)
 
         except Exception as e:
             logger.error(f"Failed to initialize collection: {e}")
             raise
 
+    def create_collection(self, name: str, vector_size: int | None = None):
+        """Create a physical collection with the adapter's vector settings.
+
+        Quantization, on-disk storage and HNSW parameters come from
+        ``index_settings``; they only take effect for new collections.
+        """
+        settings = self.index_settings
+        hnsw_config = None
+        if settings.get("hnsw_m") or settings.get("hnsw_ef_construct"):
+            hnsw_config = HnswConfigDiff(
+                m=settings.get("hnsw_m"), ef_construct=settings.get("hnsw_ef_construct")
+            )
+        self.client.create_collection(
+            collection_name=name,
+            vectors_config=VectorParams(
+                size=vector_size or self.vector_size,
+                distance=Distance.COSINE,
+                on_disk=settings.get("on_disk") or None,
+            ),
+            hnsw_config=hnsw_config,
+            quantization_config=quantization_config(settings),
+        )
+        logger.info(f"Created collection '{name}'")
+        self.create_payload_indexes(name)
+
+    def create_payload_indexes(self, name: str):
+        """Index the payload fields that searches filter on."""
+        for field_name, schema in INDEXED_PAYLOAD_FIELDS.items():
+            try:
+                self.client.create_payload_index(
+                    collection_name=name, field_name=field_name, field_schema=schema
+                )
+            except Exception as e:
+                logger.warning(f"Failed to create payload index on {field_name}: {e}")
+
+    def collection_exists(self, name: str) -> bool:
+        """Check whether a collection or alias with this name exists."""
+        collections = self.client.get_collections().collections
+        if any(c.name == name for c in collections):
+            return True
+        return self.get_alias_target(name) is not None
+
+    def get_alias_target(self, alias: str | None = None) -> str | None:
+        """Return the collection an alias points to, or None."""
+        alias = alias or self.collection_name
+        for description in self.client.get_aliases().aliases:
+            if description.alias_name == alias:
+                return description.collection_name
+        return None
+
+    def resolve_collection(self) -> str:
+        """Return the physical collection behind ``collection_name``."""
+        return self.get_alias_target() or self.collection_name
+
+    def next_collection_name(self, model_name: str | None = None) -> str:
+        """Return an unused versioned collection name for ``collection_name``.
+
+        Names look like ``plone_knowledge__<model>__v<n>``; versions are
+        counted across all models so that every build gets a new number.
+        """
+        prefix = re.escape(self.collection_name)
+        pattern = re.compile(rf"^{prefix}__(?:[a-z0-9_]+?__)?v(\d+)$")
+        versions = [
+            int(match.group(1))
+            for c in self.client.get_collections().collections
+            if (match := pattern.match(c.name))
+        ]
+        version = max(versions, default=0) + 1
+        if model_name:
+            return f"{self.collection_name}__{model_slug(model_name)}__v{version}"
+        return f"{self.collection_name}__v{version}"
+
+    def list_versions(self) -> list[str]:
+        """Return the versioned collections that belong to ``collection_name``."""
+        prefix = f"{self.collection_name}__"
+        return sorted(
+            c.name
+            for c in self.client.get_collections().collections
+            if c.name.startswith(prefix)
+        )
+
+    def swap_alias(self, collection: str) -> str | None:
+        """Point ``collection_name`` at another collection in one operation.
+
+        Returns the collection the alias pointed to before. A legacy physical
+        collection that still carries the alias name is dropped first, which
+        is the only moment without a searchable index.
+        """
+        alias = self.collection_name
+        previous = self.get_alias_target(alias)
+        operations = []
+        if previous is not None:
+            operations.append(
+                DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias))
+            )
+        elif any(c.name == alias for c in self.client.get_collections().collections):
+            logger.warning(f"Replacing legacy collection '{alias}' with an alias")
+            self.client.delete_collection(alias)
+        operations.append(
+            CreateAliasOperation(
+                create_alias=CreateAlias(collection_name=collection, alias_name=alias)
+            )
+        )
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        logger.info(f"Alias '{alias}' now points to '{collection}'")
+        return previous
+
+    def for_collection(self, name: str) -> "QdrantAdapter":
+        """Return an adapter on the same client that targets another collection."""
+        adapter = QdrantAdapter(client=self.client)
+        adapter.collection_name = name
+        adapter.vector_size = self.vector_size
+        adapter.chunked = self.chunked
+        adapter.index_settings = dict(self.index_settings)
+        return adapter
+
     def add_vectors(
         self,
         documents: list[dict[str, Any]],
         embeddings: list[list[float]],
         batch_size: int = 100,
     ) -> bool:
-        """Add multiple vectors to the collection in batches."""
+        """Add multiple vectors to the collection in batches.
+
+        Points are keyed by the document UID, so adding a document that is
+        already indexed overwrites it instead of creating a duplicate.
+        """
+        uids = [doc.get("uid") for doc in documents]
+        payloads = [build_payload(doc) for doc in documents]
+        return self.upsert_many(uids, embeddings, payloads, batch_size=batch_size)
+
+    def upsert_many(
+        self,
+        uids: list[str],
+        vectors: list[list[float]],
+        payloads: list[dict[str, Any]],
+        batch_size: int = 100,
+    ) -> bool:
+        """Insert or replace vectors keyed by UID, one request per batch."""
+        point_ids = [
+            point_id_for_uid(uid) if uid else str(uuid.uuid4()) for uid in uids
+        ]
+        return self.upsert_points(point_ids, vectors, payloads, batch_size=batch_size)
+
+    def upsert_points(
+        self,
+        point_ids: list,
+        vectors: list[list[float]],
+        payloads: list[dict[str, Any]],
+        batch_size: int = 100,
+    ) -> bool:
+        """Insert or replace points with the given IDs, one request per batch."""
         try:
             points = []
-            for _i, (doc, embedding) in enumerate(
-                zip(documents, embeddings, strict=False)
+            for point_id, vector, payload in zip(
+                point_ids, vectors, payloads, strict=True
             ):
-                point_id = str(uuid.uuid4())
-                payload = {
-                    "uid": doc.get("uid"),
-                    "path": doc.get("path"),
-                    "title": doc.get("title"),
-                    "description": doc.get("description"),
-                    "content_type": doc.get("content_type"),
-                    "workflow_state": doc.get("workflow_state"),
-                    "modified": doc.get("modified"),
-                    "tags": doc.get("tags", []),
-                    "knowledge_type": doc.get("knowledge_type"),
-                }
-
-                points.append(
-                    PointStruct(id=point_id, vector=embedding, payload=payload)
-                )
+                points.append(PointStruct(id=point_id, vector=vector, payload=payload))
 
-                # Upload in batches
                 if len(points) >= batch_size:
                     self.client.upsert(
                         collection_name=self.collection_name, points=points
                     )
                     points = []
 
-            # Upload remaining points
             if points:
                 self.client.upsert(collection_name=self.collection_name, points=points)
 
-            logger.info(f"Added {len(documents)} vectors to collection")
+            logger.info(f"Upserted {len(point_ids)} vectors to collection")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to upsert vectors: {e}")
+            return False
+
+    def delete_many(self, uids: list[str], batch_size: int = 1000) -> bool:
+        """Delete vectors by UID, one request per batch."""
+        try:
+            point_ids = [point_id_for_uid(uid) for uid in uids]
+            for i in range(0, len(point_ids), batch_size):
+                self.client.delete(
+                    collection_name=self.collection_name,
+                    points_selector=PointIdsList(points=point_ids[i : i + batch_size]),
+                )
+
+            logger.info(f"Deleted {len(uids)} vectors from collection")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to delete vectors: {e}")
+            return False
+
+    def delete_points(self, point_ids: list[str], batch_size: int = 1000) -> bool:
+        """Delete points by their point IDs, one request per batch.
+
+        Unlike ``delete_many`` this also reaches points whose ID is not
+        derived from their UID, e.g. from legacy or restored collections.
+        """
+        try:
+            for i in range(0, len(point_ids), batch_size):
+                self.client.delete(
+                    collection_name=self.collection_name,
+                    points_selector=PointIdsList(points=point_ids[i : i + batch_size]),
+                )
+
+            logger.info(f"Deleted {len(point_ids)} points from collection")
             return True
 
         except Exception as e:
-            logger.error(f"Failed to add vectors: {e}")
+            logger.error(f"Failed to delete points: {e}")
             return False
 
     def update_vector(
         self, uid: str, embedding: list[float], metadata: dict[str, Any] | None = None
     ) -> bool:
-        """Update a single vector by UID."""
+        """Update a single vector by UID.
+
+        Without metadata only the vector is replaced and the stored payload is
+        kept as is. A point that does not exist yet, e.g. one stored under a
+        random ID before IDs were derived from UIDs, is inserted with a
+        payload holding just the UID; run the reconciler to fill it in.
+        """
+        if metadata is not None:
+            return self.upsert_many([uid], [embedding], [build_payload(metadata)])
+
+        point_id = point_id_for_uid(uid)
         try:
-            # Find existing point by UID
-            results = self.client.scroll(
+            if not self.client.retrieve(
                 collection_name=self.collection_name,
-                scroll_filter=Filter(
-                    must=[FieldCondition(key="uid", match=MatchValue(value=uid))]
-                ),
-                limit=1,
-            )
-
-            if results[0]:
-                point_id = results[0][0].id
-                # Update the vector
-                self.client.upsert(
-                    collection_name=self.collection_name,
-                    points=[
-                        PointStruct(
-                            id=point_id,
-                            vector=embedding,
-                            payload=metadata or results[0][0].payload,
-                        )
-                    ],
+                ids=[point_id],
+                with_payload=False,
+                with_vectors=False,
+            ):
+                return self.upsert_many(
+                    [uid], [embedding], [build_payload({"uid": uid})]
                 )
-                logger.info(f"Updated vector for UID: {uid}")
-                return True
-            else:
-                # Create new point if not found
-                return self.add_vectors([metadata], [embedding])
+
+            self.client.update_vectors(
+                collection_name=self.collection_name,
+                points=[PointVectors(id=point_id, vector=embedding)],
+            )
+            logger.info(f"Updated vector for UID: {uid}")
+            return True
 
         except Exception as e:
             logger.error(f"Failed to update vector: {e}")
@@ -149,29 +456,40 @@ class QdrantAdapter:
         score_threshold: float = 0.5,
         filters: dict[str, Any] | None = None,
     ) -> list[dict[str, Any]]:
-        """Search for similar vectors."""
+        """Search for similar vectors.
+
+        ``filters`` maps payload keys to predicates, see
+        ``knowledge.curator.vector.filters``. They are evaluated by Qdrant
+        against indexed payload fields, so no over-fetching is needed.
+        On chunked collections hits are grouped by UID and each document is
+        represented by its best matching chunk.
+        """
         try:
-            # Build filter conditions
-            filter_conditions = []
-            if filters:
-                for key, value in filters.items():
-                    if value is not None:
-                        filter_conditions.append(
-                            FieldCondition(key=key, match=MatchValue(value=value))
-                        )
-
-            search_filter = (
-                Filter(must=filter_conditions) if filter_conditions else None
-            )
+            search_filter = compile_filter(filters)
+            params = search_params(self.index_settings)
 
             # Perform search
-            results = self.client.search(
-                collection_name=self.collection_name,
-                query_vector=query_embedding,
-                limit=limit,
-                score_threshold=score_threshold,
-                query_filter=search_filter,
-            )
+            if self.chunked:
+                groups = self.client.query_points_groups(
+                    collection_name=self.collection_name,
+                    query=query_embedding,
+                    group_by="uid",
+                    limit=limit,
+                    group_size=1,
+                    score_threshold=score_threshold,
+                    query_filter=search_filter,
+                    search_params=params,
+                )
+                results = [group.hits[0] for group in groups.groups if group.hits]
+            else:
+                results = self.client.query_points(
+                    collection_name=self.collection_name,
+                    query=query_embedding,
+                    limit=limit,
+                    score_threshold=score_threshold,
+                    query_filter=search_filter,
+                    search_params=params,
+                ).points
 
             # Format results
             similar_items = []
@@ -188,30 +506,32 @@ class QdrantAdapter:
             return []
 
     def find_related_content(
-        self, uid: str, limit: int = 5, score_threshold: float = 0.6
+        self,
+        uid: str,
+        limit: int = 5,
+        score_threshold: float = 0.6,
+        filters: dict[str, Any] | None = None,
     ) -> list[dict[str, Any]]:
         """Find content related to a specific item by UID."""
         try:
             # Get the vector for the given UID
-            results = self.client.scroll(
+            points = self.client.retrieve(
                 collection_name=self.collection_name,
-                scroll_filter=Filter(
-                    must=[FieldCondition(key="uid", match=MatchValue(value=uid))]
-                ),
-                limit=1,
+                ids=[point_id_for_uid(uid)],
                 with_vectors=True,
             )
 
-            if not results[0]:
+            if not points:
                 logger.warning(f"No vector found for UID: {uid}")
                 return []
 
             # Search for similar content, excluding the source
-            query_vector = results[0][0].vector
+            query_vector = points[0].vector
             similar = self.search_similar(
                 query_vector,
                 limit=limit + 1,  # Get extra to exclude self
                 score_threshold=score_threshold,
+                filters=filters,
             )
 
             # Filter out the source document
@@ -221,37 +541,62 @@ class QdrantAdapter:
             logger.error(f"Failed to find related content: {e}")
             return []
 
-    def delete_vector(self, uid: str) -> bool:
-        """Delete vector by UID."""
+    def delete_chunks(self, uids: list[str], batch_size: int = 1000) -> bool:
+        """Delete all but the first chunk point of the given documents."""
         try:
-            # Find and delete point by UID
-            results = self.client.scroll(
-                collection_name=self.collection_name,
-                scroll_filter=Filter(
-                    must=[FieldCondition(key="uid", match=MatchValue(value=uid))]
-                ),
-                limit=1,
-            )
-
-            if results[0]:
-                point_id = results[0][0].id
+            for i in range(0, len(uids), batch_size):
                 self.client.delete(
-                    collection_name=self.collection_name, points_selector=[point_id]
+                    collection_name=self.collection_name,
+                    points_selector=FilterSelector(
+                        filter=compile_filter({
+                            "uid": uids[i : i + batch_size],
+                            "chunk": {"$gte": 1},
+                        })
+                    ),
                 )
-                logger.info(f"Deleted vector for UID: {uid}")
-                return True
-            else:
-                logger.warning(f"No vector found to delete for UID: {uid}")
-                return False
-
+            return True
         except Exception as e:
-            logger.error(f"Failed to delete vector: {e}")
+            logger.error(f"Failed to delete chunks: {e}")
             return False
 
+    def scroll_points(
+        self,
+        filters: dict[str, Any] | None = None,
+        batch_size: int = 256,
+        with_vectors: bool = False,
+        with_payload=True,
+    ):
+        """Yield the collection's points page by page.
+
+        Only one page is held in memory at a time; ``filters`` takes the same
+        predicates as ``search_similar``.
+        """
+        scroll_filter = compile_filter(filters)
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=scroll_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=with_payload,
+                with_vectors=with_vectors,
+            )
+            if points:
+                yield points
+            if offset is None:
+                break
+
+    def delete_vector(self, uid: str) -> bool:
+        """Delete vector by UID, with its further chunks on chunked collections."""
+        if self.chunked and not self.delete_chunks([uid]):
+            return False
+        return self.delete_many([uid])
+
     def get_collection_info(self) -> dict[str, Any]:
         """Get information about the collection."""
         try:
-            info = self.client.get_collection(self.collection_name)
+            info = self.client.get_collection(self.resolve_collection())
             return {
                 "status": info.status,
                 "points_count": info.points_count,
@@ -269,8 +614,15 @@ class QdrantAdapter:
     def clear_collection(self) -> bool:
         """Clear all vectors from the collection."""
         try:
-            self.client.delete_collection(self.collection_name)
-            self.initialize_collection()
+            target = self.get_alias_target()
+            if target is None:
+                self.client.delete_collection(self.collection_name)
+                self.initialize_collection()
+            else:
+                # Dropping the collection also drops its aliases
+                self.client.delete_collection(target)
+                self.create_collection(target)
+                self.swap_alias(target)
             logger.info("Collection cleared and recreated")
             return True
         except Exception as e:
@@ -0,0 +1,216 @@
+"""Streamed vector backups.
+
+A backup is a directory with three files:
+
+- ``manifest.json``: collection, model, dimension, vector dtype, compression
+  and the block index
+- ``payloads.ndjson.<ext>``: one JSON record per point (``id`` and
+  ``payload``), in the same order as the vectors
+- ``vectors.<dtype>.<ext>``: the raw little-endian vectors, one row per
+  point
+
+Points are written in blocks. Each block is compressed on its own (a gzip
+member or a zstd frame) and the manifest records its byte offset and length
+in both files, so a reader can seek to any block and only ever holds one
+block in memory. zstd needs the optional ``zstandard`` package.
+"""
+
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Any
+import gzip
+import json
+import logging
+import numpy as np
+import os
+
+
+logger = logging.getLogger("knowledge.curator.vector")
+
+BACKUP_FORMAT_VERSION = 1
+
+MANIFEST_NAME = "manifest.json"
+
+# Points per compressed block
+DEFAULT_BLOCK_SIZE = 1000
+
+VECTOR_DTYPES = {"float32": "<f4", "float16": "<f2"}
+
+COMPRESSION_EXTENSIONS = {"gzip": "gz", "zstd": "zst"}
+
+
+def _codec(compression: str):
+    """Return (compress, decompress) functions for a compression name."""
+    if compression == "gzip":
+        return gzip.compress, gzip.decompress
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError(
+                "zstd compression requires the 'zstandard' package"
+            ) from e
+        return (
+            zstandard.ZstdCompressor().compress,
+            zstandard.ZstdDecompressor().decompress,
+        )
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def _file_names(dtype: str, compression: str) -> tuple[str, str]:
+    extension = COMPRESSION_EXTENSIONS[compression]
+    short = "f32" if dtype == "float32" else "f16"
+    return f"payloads.ndjson.{extension}", f"vectors.{short}.{extension}"
+
+
+def is_stream_backup(path: str) -> bool:
+    """Tell whether ``path`` is a streamed backup directory."""
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+class BackupWriter:
+    """Write points to a streamed backup, one compressed block at a time."""
+
+    def __init__(
+        self,
+        path: str,
+        metadata: dict[str, Any],
+        dimension: int,
+        dtype: str = "float32",
+        compression: str = "gzip",
+        block_size: int = DEFAULT_BLOCK_SIZE,
+    ):
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        self.path = path
+        self.dimension = dimension
+        self.dtype = dtype
+        self.compression = compression
+        self.block_size = max(1, block_size)
+        self.compress, _ = _codec(compression)
+        self.manifest = {
+            "format": BACKUP_FORMAT_VERSION,
+            "timestamp": datetime.now().isoformat(),
+            **metadata,
+            "vector_dimension": dimension,
+            "dtype": dtype,
+            "compression": compression,
+            "total_points": 0,
+            "blocks": [],
+        }
+        payloads_name, vectors_name = _file_names(dtype, compression)
+        self.manifest["files"] = {"payloads": payloads_name, "vectors": vectors_name}
+
+        os.makedirs(path, exist_ok=True)
+        with ExitStack() as files:
+            self._payloads = files.enter_context(
+                open(os.path.join(path, payloads_name), "wb")
+            )
+            self._vectors = files.enter_context(
+                open(os.path.join(path, vectors_name), "wb")
+            )
+            # Both are open: keep them until close() instead of closing here
+            self._files = files.pop_all()
+        self._pending: list[tuple[Any, list[float], dict]] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._files.close()
+
+    def write(self, point_id, vector, payload: dict[str, Any] | None):
+        """Add one point, flushing a block when it is full."""
+        self._pending.append((point_id, vector, payload or {}))
+        if len(self._pending) >= self.block_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        vectors = np.asarray(
+            [vector for _id, vector, _payload in self._pending],
+            dtype=VECTOR_DTYPES[self.dtype],
+        )
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(
+                f"Vector dimension {vectors.shape[1]} does not match "
+                f"{self.dimension}"
+            )
+        records = "".join(
+            json.dumps({"id": point_id, "payload": payload}) + "\n"
+            for point_id, _vector, payload in self._pending
+        )
+        payload_data = self.compress(records.encode("utf-8"))
+        vector_data = self.compress(vectors.tobytes())
+
+        self.manifest["blocks"].append({
+            "start": self.manifest["total_points"],
+            "count": len(self._pending),
+            "payloads": [self._payloads.tell(), len(payload_data)],
+            "vectors": [self._vectors.tell(), len(vector_data)],
+        })
+        self._payloads.write(payload_data)
+        self._vectors.write(vector_data)
+        self.manifest["total_points"] += len(self._pending)
+        self._pending = []
+
+    def close(self):
+        """Write the last block and the manifest."""
+        self._flush()
+        self._files.close()
+        # The manifest goes last: a backup without one is incomplete
+        with open(os.path.join(self.path, MANIFEST_NAME), "w") as f:
+            json.dump(self.manifest, f, indent=2)
+
+
+class BackupReader:
+    """Read a streamed backup block by block."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != BACKUP_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported backup format: {self.manifest.get('format')}"
+            )
+        _, self.decompress = _codec(self.manifest["compression"])
+
+    def __len__(self) -> int:
+        return self.manifest["total_points"]
+
+    def blocks(self, start: int = 0):
+        """Yield (point ids, float32 vectors, payloads) per block.
+
+        ``start`` skips the blocks before the one holding that point.
+        """
+        dtype = VECTOR_DTYPES[self.manifest["dtype"]]
+        dimension = self.manifest["vector_dimension"]
+        files = self.manifest["files"]
+        with (
+            open(os.path.join(self.path, files["payloads"]), "rb") as payloads,
+            open(os.path.join(self.path, files["vectors"]), "rb") as vectors,
+        ):
+            for block in self.manifest["blocks"]:
+                if block["start"] + block["count"] <= start:
+                    continue
+                records = self._read(payloads, block["payloads"]).splitlines()
+                matrix = np.frombuffer(
+                    self._read(vectors, block["vectors"]), dtype=dtype
+                ).reshape(block["count"], dimension)
+                ids = []
+                block_payloads = []
+                for line in records:
+                    record = json.loads(line)
+                    ids.append(record["id"])
+                    block_payloads.append(record["payload"])
+                yield ids, matrix.astype(np.float32), block_payloads
+
+    def _read(self, f, location: list[int]) -> bytes:
+        offset, length = location
+        f.seek(offset)
+        return self.decompress(f.read(length))
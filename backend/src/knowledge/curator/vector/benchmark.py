@@ -0,0 +1,280 @@
+"""Benchmarks for sizing vector search and embedding nodes.
+
+``IndexBenchmark`` measures recall, latency and memory of collection index
+settings. It copies the live collection into a scratch collection per
+setting, runs the same sample of queries against each copy and compares
+the hits with an exact (brute force) search on the original. Memory is
+estimated from the point count, the dimension and the setting, following
+Qdrant's sizing rules, because the server does not report it per
+collection.
+
+``benchmark_embedding_backends`` measures throughput, memory and agreement
+of the embedding inference backends on the same texts.
+"""
+
+from collections.abc import Callable
+from knowledge.curator.vector.adapter import search_params
+from knowledge.curator.vector.embeddings import BACKEND_MIN_COSINE
+from knowledge.curator.vector.embeddings import EMBEDDING_BACKENDS
+from knowledge.curator.vector.embeddings import EmbeddingGenerator
+from knowledge.curator.vector.matrix import normalize_rows
+from qdrant_client.models import SearchParams
+from typing import Any
+import gc
+import logging
+import numpy as np
+import os
+import resource
+import time
+
+
+logger = logging.getLogger("knowledge.curator.vector")
+
+# Setting name -> index settings overriding the adapter's
+BENCHMARK_SETTINGS = {
+    "float32": {"quantization": None, "on_disk": False},
+    "float32_on_disk": {"quantization": None, "on_disk": True},
+    "scalar": {"quantization": "scalar", "on_disk": False},
+    "scalar_on_disk": {"quantization": "scalar", "on_disk": True},
+    "product_x16": {
+        "quantization": "product",
+        "product_compression": "x16",
+        "on_disk": True,
+    },
+}
+
+# Qdrant's default number of HNSW links per node
+DEFAULT_HNSW_M = 16
+
+# Seconds to wait for a scratch collection to finish indexing
+READY_TIMEOUT = 600.0
+
+
+def estimate_memory(
+    points: int, dimension: int, settings: dict[str, Any]
+) -> dict[str, float]:
+    """Estimate RAM and disk use in MB for a collection with these settings."""
+    original = points * dimension * 4
+    kind = (settings.get("quantization") or "none").lower()
+    if kind == "scalar":
+        quantized = points * dimension
+    elif kind == "product":
+        ratio = int(str(settings.get("product_compression") or "x16").lstrip("x"))
+        quantized = original // ratio
+    else:
+        quantized = 0
+    # Level 0 of the graph keeps 2 * m four-byte links per point
+    graph = points * 2 * (settings.get("hnsw_m") or DEFAULT_HNSW_M) * 4
+
+    ram = graph
+    if not settings.get("on_disk"):
+        ram += original
+    if quantized and settings.get("quantization_always_ram", True):
+        ram += quantized
+    disk = original + quantized + graph
+    return {
+        "ram_mb": round(ram / 2**20, 2),
+        "disk_mb": round(disk / 2**20, 2),
+    }
+
+
+class IndexBenchmark:
+    """Compare index settings on a copy of the collection."""
+
+    def __init__(
+        self,
+        adapter,
+        queries: int = 100,
+        limit: int = 10,
+        batch_size: int = 256,
+        progress: Callable[[str], None] | None = None,
+        random_state: int = 42,
+    ):
+        self.adapter = adapter
+        self.queries = queries
+        self.limit = limit
+        self.batch_size = batch_size
+        self.progress = progress
+        self.random_state = random_state
+
+    def run(
+        self, settings: dict[str, dict[str, Any]] | None = None
+    ) -> list[dict[str, Any]]:
+        """Return one result per setting: recall@limit, latency and memory."""
+        settings = settings or BENCHMARK_SETTINGS
+        info = self.adapter.get_collection_info()
+        points = info.get("points_count") or 0
+        dimension = info["config"]["vector_size"]
+
+        queries = self.sample_queries()
+        if not queries:
+            return []
+        truth = [self._search(self.adapter, query, exact=True) for query in queries]
+
+        results = []
+        for name, overrides in settings.items():
+            self._report(f"Benchmarking {name}")
+            index = {**self.adapter.index_settings, **overrides}
+            target = self.adapter.for_collection(
+                f"{self.adapter.resolve_collection()}_bench_{name}"
+            )
+            target.index_settings = index
+            try:
+                self._copy(target, dimension)
+                self._wait_until_ready(target)
+                recalls = []
+                latencies = []
+                for query, expected in zip(queries, truth, strict=True):
+                    started = time.perf_counter()
+                    found = self._search(target, query)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    if expected:
+                        recalls.append(len(set(found) & set(expected)) / len(expected))
+            finally:
+                self.adapter.client.delete_collection(target.collection_name)
+
+            results.append({
+                "name": name,
+                "settings": overrides,
+                f"recall@{self.limit}": round(float(np.mean(recalls)), 4)
+                if recalls
+                else None,
+                "latency_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "latency_p95_ms": round(float(np.percentile(latencies, 95)), 3),
+                **estimate_memory(points, dimension, index),
+            })
+        return results
+
+    def sample_queries(self) -> list[list[float]]:
+        """Draw query vectors uniformly from the collection (reservoir sample)."""
+        rng = np.random.default_rng(self.random_state)
+        sample: list[list[float]] = []
+        seen = 0
+        for batch in self.adapter.scroll_points(
+            batch_size=self.batch_size, with_vectors=True, with_payload=False
+        ):
+            for point in batch:
+                if not point.vector:
+                    continue
+                seen += 1
+                if len(sample) < self.queries:
+                    sample.append(point.vector)
+                else:
+                    slot = rng.integers(seen)
+                    if slot < self.queries:
+                        sample[slot] = point.vector
+        return sample
+
+    def _search(self, adapter, query: list[float], exact: bool = False) -> list:
+        if exact:
+            params = SearchParams(exact=True)
+        else:
+            params = search_params(adapter.index_settings)
+        hits = adapter.client.query_points(
+            collection_name=adapter.collection_name,
+            query=query,
+            limit=self.limit,
+            search_params=params,
+            with_payload=False,
+        ).points
+        return [hit.id for hit in hits]
+
+    def _copy(self, target, dimension: int):
+        """Copy all points of the collection into ``target``."""
+        target.create_collection(target.collection_name, dimension)
+        for batch in self.adapter.scroll_points(
+            batch_size=self.batch_size, with_vectors=True
+        ):
+            if not target.upsert_points(
+                [point.id for point in batch],
+                [point.vector for point in batch],
+                [point.payload for point in batch],
+                batch_size=self.batch_size,
+            ):
+                raise RuntimeError(f"Failed to copy points to {target.collection_name}")
+
+    def _wait_until_ready(self, target):
+        """Wait for the optimizer to build the index of ``target``."""
+        deadline = time.monotonic() + READY_TIMEOUT
+        while time.monotonic() < deadline:
+            info = self.adapter.client.get_collection(target.collection_name)
+            if str(getattr(info.status, "value", info.status)) == "green":
+                return
+            time.sleep(1.0)
+        logger.warning(f"{target.collection_name} still indexing, measuring anyway")
+
+    def _report(self, message: str):
+        logger.info(message)
+        if self.progress is not None:
+            self.progress(message)
+
+
+def current_rss_mb() -> float:
+    """Return the resident set size of this process in MB.
+
+    Falls back to the peak RSS where ``/proc`` is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def benchmark_embedding_backends(
+    model_name: str,
+    texts: list[str],
+    backends: tuple[str, ...] | list[str] = EMBEDDING_BACKENDS,
+    batch_size: int = 32,
+    onnx_dir: str | None = None,
+    progress: Callable[[str], None] | None = None,
+) -> list[dict[str, Any]]:
+    """Embed ``texts`` with every backend and compare them.
+
+    Reports load time, texts per second, the RSS growth caused by loading
+    and running the backend, and the cosine similarity of its embeddings to
+    those of the first backend (normally ``torch``). Backends run one after
+    the other in this process, so RSS growth also includes runtime state
+    that a previous backend left behind; put the backend of interest first
+    or run it alone for a clean number.
+    """
+    reference = None
+    results = []
+    for backend in backends:
+        message = f"Benchmarking {backend} embeddings"
+        logger.info(message)
+        if progress is not None:
+            progress(message)
+
+        gc.collect()
+        rss_before = current_rss_mb()
+        generator = EmbeddingGenerator(model_name, backend=backend, onnx_dir=onnx_dir)
+        started = time.perf_counter()
+        _ = generator.model
+        load_seconds = time.perf_counter() - started
+        # Warm up so that one-off graph optimizations are not timed
+        generator.generate_embeddings(texts[:batch_size], batch_size=batch_size)
+
+        started = time.perf_counter()
+        vectors = generator.generate_embeddings(texts, batch_size=batch_size)
+        elapsed = time.perf_counter() - started
+        rss_mb = current_rss_mb() - rss_before
+
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        if reference is None:
+            reference = vectors
+        cosines = np.sum(vectors * reference, axis=1)
+        results.append({
+            "backend": backend,
+            "load_seconds": round(load_seconds, 2),
+            "texts_per_second": round(len(texts) / elapsed, 1) if elapsed else None,
+            "rss_mb": round(rss_mb, 1),
+            "mean_cosine": round(float(cosines.mean()), 5),
+            "min_cosine": round(float(cosines.min()), 5),
+            "compatible": bool(cosines.min() >= BACKEND_MIN_COSINE[backend]),
+        })
+
+        del generator
+        gc.collect()
+    return results
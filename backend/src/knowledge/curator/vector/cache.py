@@ -0,0 +1,276 @@
+"""Content-hash embedding cache with an in-memory LRU and on-disk tier."""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any
+import fcntl
+import hashlib
+import json
+import logging
+import numpy as np
+import os
+import re
+import threading
+
+
+logger = logging.getLogger("knowledge.curator.vector")
+
+_caches: dict[tuple[str, str, str], "EmbeddingCache"] = {}
+_caches_lock = threading.Lock()
+
+
+def text_digest(text: str) -> str:
+    """Return the SHA-256 hex digest used as cache key for a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DiskVectorStore:
+    """Append-only float32 vector store memory-mapped from disk.
+
+    Vectors live in ``vectors.f32`` as contiguous rows and their keys in
+    ``keys.txt``, one digest per line in the same order, so the n-th key
+    names the n-th row. Writers take an exclusive lock on ``lock``, catch up
+    with keys appended by other processes sharing the directory and write
+    at the current end of the key list. A crash between the vector and the
+    key append leaves a trailing row (or a partial key line) without a
+    partner; both files are cut back to the complete key lines under the
+    lock before the next load or append.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.keys_path = os.path.join(directory, "keys.txt")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.lock_path = os.path.join(directory, "lock")
+        self.dimension: int | None = None
+        self.index: dict[str, int] = {}
+        self.rows = 0
+        self._keys_offset = 0
+        self._mmap = None
+        self._mapped_rows = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @contextmanager
+    def _locked(self):
+        """Hold the store's inter-process write lock."""
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _load(self):
+        """Load the key index and metadata from disk."""
+        with self._locked():
+            self._sync()
+
+    def _sync(self):
+        """Catch up with the files and cut off incomplete trailing writes.
+
+        Must be called with the lock held.
+        """
+        if self.dimension is None and os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.dimension = json.load(f).get("dimension")
+        if not self.dimension:
+            return
+
+        row_bytes = self.dimension * 4
+        stored_bytes = 0
+        if os.path.exists(self.vectors_path):
+            stored_bytes = os.path.getsize(self.vectors_path)
+
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "rb") as f:
+                f.seek(self._keys_offset)
+                for line in f:
+                    # A line without newline or without its vector is torn
+                    complete = line.endswith(b"\n")
+                    if not complete or (self.rows + 1) * row_bytes > stored_bytes:
+                        break
+                    self.index[line.decode("ascii").strip()] = self.rows
+                    self.rows += 1
+                    self._keys_offset += len(line)
+            if os.path.getsize(self.keys_path) > self._keys_offset:
+                os.truncate(self.keys_path, self._keys_offset)
+        if stored_bytes > self.rows * row_bytes:
+            os.truncate(self.vectors_path, self.rows * row_bytes)
+
+    def _remap(self):
+        """Map the vectors file, picking up rows appended since the last map."""
+        if self.rows == 0:
+            self._mmap = None
+        else:
+            self._mmap = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(self.rows, self.dimension),
+            )
+        self._mapped_rows = self.rows
+
+    def get(self, key: str) -> np.ndarray | None:
+        """Return the stored vector for a key, or None."""
+        row = self.index.get(key)
+        if row is None:
+            return None
+        if row >= self._mapped_rows:
+            self._remap()
+        return np.array(self._mmap[row])
+
+    def put(self, key: str, vector: np.ndarray):
+        """Append a vector to the store."""
+        if key in self.index:
+            return
+        with self._locked():
+            self._sync()
+            if key in self.index:
+                return
+            if self.dimension is None:
+                self.dimension = len(vector)
+                with open(self.meta_path, "w") as f:
+                    json.dump({"dimension": self.dimension}, f)
+            elif len(vector) != self.dimension:
+                logger.warning(
+                    f"Not caching embedding of dimension {len(vector)} in store "
+                    f"of dimension {self.dimension}"
+                )
+                return
+
+            with open(self.vectors_path, "ab") as f:
+                # The row follows from where the vector actually landed
+                row = f.tell() // (self.dimension * 4)
+                f.write(np.asarray(vector, dtype=np.float32).tobytes())
+            line = (key + "\n").encode("ascii")
+            with open(self.keys_path, "ab") as f:
+                f.write(line)
+            self.index[key] = row
+            self.rows = row + 1
+            self._keys_offset += len(line)
+
+    def __len__(self):
+        return len(self.index)
+
+
+class EmbeddingCache:
+    """Cache embeddings keyed by (model name, SHA-256 of the prepared text).
+
+    Lookups go to a bounded in-memory LRU first, then to the optional
+    on-disk store. Disk hits are promoted into the LRU. Each inference
+    variant of a model (see ``EmbeddingGenerator.variant``) gets its own
+    cache and disk directory.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_entries: int = 10000,
+        directory: str | None = None,
+        variant: str = "torch",
+    ):
+        self.model_name = model_name
+        self.variant = variant
+        self.max_entries = max_entries
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = None
+        if directory:
+            safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{model_name}@{variant}")
+            try:
+                self.disk = DiskVectorStore(os.path.join(directory, safe_name))
+            except OSError as e:
+                logger.warning(f"Embedding disk cache disabled: {e}")
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, vector: np.ndarray):
+        """Insert into the LRU, evicting the least recently used entry."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str) -> list[float] | None:
+        """Return the cached embedding for a text, or None on a miss."""
+        key = text_digest(text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector.tolist()
+
+            if self.disk is not None:
+                vector = self.disk.get(key)
+                if vector is not None:
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector.tolist()
+
+            self.misses += 1
+            return None
+
+    def get_many(self, texts: list[str]) -> list[list[float] | None]:
+        """Look up several texts at once."""
+        return [self.get(text) for text in texts]
+
+    def put(self, text: str, embedding: list[float]):
+        """Store an embedding for a text.
+
+        All-zero vectors are what the generator returns for empty input or
+        on failure, so they are never cached.
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        if not vector.any():
+            return
+        key = text_digest(text)
+        with self._lock:
+            self._remember(key, vector)
+            if self.disk is not None:
+                try:
+                    self.disk.put(key, vector)
+                except OSError as e:
+                    logger.warning(f"Failed to write embedding to disk cache: {e}")
+
+    def clear_memory(self):
+        """Drop the in-memory tier, keeping the disk store."""
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return hit/miss counters and tier sizes."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "model": self.model_name,
+            "variant": self.variant,
+            "memory_entries": len(self._memory),
+            "memory_capacity": self.max_entries,
+            "disk_entries": len(self.disk) if self.disk is not None else 0,
+            "disk_enabled": self.disk is not None,
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+def get_embedding_cache(
+    model_name: str,
+    max_entries: int = 10000,
+    directory: str | None = None,
+    variant: str = "torch",
+) -> EmbeddingCache:
+    """Return the process-wide embedding cache for a model variant."""
+    key = (model_name, variant, directory or "")
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = EmbeddingCache(model_name, max_entries, directory, variant)
+            _caches[key] = cache
+        return cache
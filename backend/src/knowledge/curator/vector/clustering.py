@@ -0,0 +1,196 @@
+"""Semantic clustering of the vector collection with mini-batch k-means.
+
+Vectors are paged out of the collection with ``scroll`` and fed to
+``MiniBatchKMeans.partial_fit`` one page at a time, so memory is bounded by
+the page size rather than the collection size. A second pass assigns every
+point to its nearest centroid.
+
+Fitted models are cached per process together with a version stamp (the
+physical collection behind the alias and its point count). They are
+re-fitted only when the collection was swapped, its size changed by more
+than ``REFIT_CHANGE_RATIO`` or the model is older than ``MAX_MODEL_AGE``.
+"""
+
+from dataclasses import dataclass
+from dataclasses import field
+from knowledge.curator.vector.matrix import normalize_rows
+from typing import Any
+import logging
+import numpy as np
+import threading
+import time
+
+
+logger = logging.getLogger("knowledge.curator.vector")
+
+# Share of points added or removed that makes a cached model stale
+REFIT_CHANGE_RATIO = 0.05
+
+# Seconds after which a model is re-fitted to pick up edited content
+MAX_MODEL_AGE = 24 * 60 * 60.0
+
+# Item key -> payload field kept per clustered point
+POINT_FIELDS = {
+    "uid": "uid",
+    "title": "title",
+    "path": "path",
+    "url": "url",
+    "type": "content_type",
+}
+
+_models: dict[tuple, "ClusterModel"] = {}
+_models_lock = threading.Lock()
+
+
+@dataclass
+class ClusterModel:
+    """Centroids and assignments of one clustering run."""
+
+    collection: str
+    points_count: int
+    fitted_at: float
+    centroids: np.ndarray
+    # (point fields, cluster label, distance to the centroid) per point
+    assignments: list[tuple[dict[str, Any], int, float]] = field(default_factory=list)
+
+    def is_stale(self, collection: str, points_count: int) -> bool:
+        """Tell whether the collection changed enough to warrant a re-fit."""
+        if collection != self.collection:
+            return True
+        if time.time() - self.fitted_at > MAX_MODEL_AGE:
+            return True
+        changed = abs(points_count - self.points_count)
+        return changed > REFIT_CHANGE_RATIO * max(self.points_count, 1)
+
+    def clusters(self) -> dict[str, list[dict[str, Any]]]:
+        """Group the points by cluster, flagging the item nearest the centroid."""
+        representatives: dict[int, tuple[float, str]] = {}
+        for point, label, distance in self.assignments:
+            best = representatives.get(label)
+            if best is None or distance < best[0]:
+                representatives[label] = (distance, point["uid"])
+
+        clusters: dict[str, list[dict[str, Any]]] = {}
+        for point, label, _distance in self.assignments:
+            item = dict(point)
+            item["cluster_representative"] = point["uid"] == representatives[label][1]
+            clusters.setdefault(f"cluster_{label}", []).append(item)
+        return clusters
+
+
+class ClusteringEngine:
+    """Fit k-means over a collection by streaming its vectors."""
+
+    def __init__(self, adapter, batch_size: int = 512, random_state: int = 42):
+        self.adapter = adapter
+        self.batch_size = batch_size
+        self.random_state = random_state
+
+    def get_model(
+        self,
+        content_types: list[str] | None = None,
+        n_clusters: int = 5,
+        refresh: bool = False,
+    ) -> ClusterModel | None:
+        """Return the cached model, fitting a new one if it is stale."""
+        collection = self.adapter.resolve_collection()
+        points_count = self.adapter.get_collection_info().get("points_count") or 0
+        key = (
+            self.adapter.client,
+            self.adapter.collection_name,
+            tuple(sorted(content_types or ())),
+            n_clusters,
+        )
+        with _models_lock:
+            cached = _models.get(key)
+        if (
+            cached is not None
+            and not refresh
+            and not cached.is_stale(collection, points_count)
+        ):
+            return cached
+
+        model = self.fit(content_types, n_clusters)
+        if model is None:
+            return None
+        model.collection = collection
+        model.points_count = points_count
+        with _models_lock:
+            _models[key] = model
+        return model
+
+    def fit(
+        self, content_types: list[str] | None = None, n_clusters: int = 5
+    ) -> ClusterModel | None:
+        """Fit centroids page by page, then assign every point to one."""
+        from sklearn.cluster import MiniBatchKMeans
+
+        filters = {"content_type": content_types} if content_types else None
+        kmeans = None
+        pending: list[np.ndarray] = []
+        pending_rows = 0
+        for vectors, _points in self._pages(filters):
+            pending.append(vectors)
+            pending_rows += len(vectors)
+            # The first partial_fit needs at least n_clusters samples
+            if kmeans is None and pending_rows < n_clusters:
+                continue
+            if kmeans is None:
+                kmeans = MiniBatchKMeans(
+                    n_clusters=n_clusters,
+                    batch_size=self.batch_size,
+                    random_state=self.random_state,
+                    n_init=3,
+                )
+            kmeans.partial_fit(np.vstack(pending))
+            pending = []
+            pending_rows = 0
+
+        if kmeans is None:
+            if not pending_rows:
+                return None
+            logger.warning(f"Not enough content for {n_clusters} clusters")
+            kmeans = MiniBatchKMeans(
+                n_clusters=pending_rows, random_state=self.random_state, n_init=3
+            )
+            kmeans.fit(np.vstack(pending))
+
+        assignments = []
+        for vectors, points in self._pages(filters):
+            labels = kmeans.predict(vectors)
+            distances = np.linalg.norm(
+                vectors - kmeans.cluster_centers_[labels], axis=1
+            )
+            assignments.extend(
+                zip(points, labels.tolist(), distances.tolist(), strict=True)
+            )
+
+        logger.info(
+            f"Clustered {len(assignments)} items into {kmeans.n_clusters} clusters"
+        )
+        return ClusterModel(
+            collection=self.adapter.collection_name,
+            points_count=len(assignments),
+            fitted_at=time.time(),
+            centroids=kmeans.cluster_centers_,
+            assignments=assignments,
+        )
+
+    def _pages(self, filters: dict[str, Any] | None):
+        """Yield (normalized vectors, point fields) for every scrolled page."""
+        for batch in self.adapter.scroll_points(
+            filters=filters, batch_size=self.batch_size, with_vectors=True
+        ):
+            points = []
+            vectors = []
+            for point in batch:
+                payload = point.payload or {}
+                # Documents are represented by their first chunk
+                if not point.vector or payload.get("chunk"):
+                    continue
+                points.append({
+                    name: payload.get(key) for name, key in POINT_FIELDS.items()
+                })
+                vectors.append(point.vector)
+            if vectors:
+                yield normalize_rows(np.array(vectors, dtype=np.float32)), points
@@ -1,16 +1,38 @@
 """Vector Database Configuration Management."""
 
+import logging
 import os
+import tempfile
 
 from plone import api
 from plone.api.exc import CannotGetPortalError, InvalidParameterError
+from zope.annotation.interfaces import IAnnotations
 from zope.component import ComponentLookupError
 
 
+logger = logging.getLogger("knowledge.curator.vector")
+
+# Portal annotation holding the model of the collection behind the alias
+ACTIVE_MODEL_ANNOTATION_KEY = "knowledge.curator.vector.active_model"
+
+# (configured, active) model pairs already warned about, to log each once
+_warned_model_overrides = set()
+
+
 def get_vector_config():
-    """Get vector database configuration from environment or defaults."""
+    """Get vector database configuration from environment or defaults.
+
+    Environment variables are overridden by registry records. Once a model
+    migration has completed, the model recorded under
+    ``ACTIVE_MODEL_ANNOTATION_KEY`` wins over both: ``EMBEDDING_MODEL`` and
+    the ``embedding_model`` record then only select the target of the next
+    ``migrate_model`` run.
+    """
     # Get configuration from environment variables with defaults
     config = {
+        # "qdrant" or "local" (in-process engine, see vector/local.py)
+        "vector_engine": os.environ.get("VECTOR_ENGINE", "qdrant").lower(),
+        "local_vector_path": os.environ.get("VECTOR_LOCAL_PATH") or None,
         # Qdrant connection settings
         "qdrant_host": os.environ.get("QDRANT_HOST", "localhost"),
         "qdrant_port": int(os.environ.get("QDRANT_PORT", "6333")),
@@ -20,6 +42,13 @@ def get_vector_config():
         "embedding_model": os.environ.get(
             "EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
         ),
+        # Inference backend: "torch", "onnx" or "onnx-int8" (see embeddings.py)
+        "embedding_backend": os.environ.get(
+            "VECTOR_EMBEDDING_BACKEND", "torch"
+        ).lower(),
+        "onnx_model_dir": os.environ.get("VECTOR_ONNX_DIR") or None,
+        # int8 ONNX file of the model; found in the model repository if unset
+        "onnx_file_name": os.environ.get("VECTOR_ONNX_FILE") or None,
         # Search settings
         "default_search_limit": int(os.environ.get("VECTOR_SEARCH_LIMIT", "10")),
         "default_score_threshold": float(
@@ -28,6 +57,49 @@ def get_vector_config():
         # Batch processing settings
         "batch_size": int(os.environ.get("VECTOR_BATCH_SIZE", "100")),
         "embedding_batch_size": int(os.environ.get("EMBEDDING_BATCH_SIZE", "32")),
+        # Index rebuild settings
+        "rebuild_max_inflight": int(
+            os.environ.get("VECTOR_REBUILD_MAX_INFLIGHT", "4")
+        ),
+        "rebuild_checkpoint_path": os.environ.get(
+            "VECTOR_REBUILD_CHECKPOINT",
+            os.path.join(tempfile.gettempdir(), "knowledge-curator-rebuild.json"),
+        ),
+        # Embedding cache settings
+        "embedding_cache_size": int(os.environ.get("EMBEDDING_CACHE_SIZE", "10000")),
+        "embedding_cache_dir": os.environ.get("EMBEDDING_CACHE_DIR") or None,
+        # Search query embeddings: LRU size, TTL and cross-thread batching
+        # (VECTOR_QUERY_BATCH_WAIT_MS 0 encodes every query on its own)
+        "query_cache_size": int(os.environ.get("VECTOR_QUERY_CACHE_SIZE", "1024")),
+        "query_cache_ttl": float(os.environ.get("VECTOR_QUERY_CACHE_TTL", "600")),
+        "query_batch_size": int(os.environ.get("VECTOR_QUERY_BATCH_SIZE", "32")),
+        "query_batch_wait_ms": float(
+            os.environ.get("VECTOR_QUERY_BATCH_WAIT_MS", "5")
+        ),
+        # Store long documents as overlapping chunk points (see embeddings.py)
+        "chunking": os.environ.get("VECTOR_CHUNKING", "false").lower() == "true",
+        "chunk_tokens": int(os.environ.get("VECTOR_CHUNK_TOKENS", "0")) or None,
+        "chunk_overlap": int(os.environ.get("VECTOR_CHUNK_OVERLAP", "32")),
+        "max_chunks": int(os.environ.get("VECTOR_MAX_CHUNKS", "16")),
+        # Storage of new collections: "none", "scalar" (int8, 4x smaller) or
+        # "product" (VECTOR_PQ_COMPRESSION times smaller), see adapter.py
+        "quantization": os.environ.get("VECTOR_QUANTIZATION", "none").lower(),
+        "quantization_always_ram": os.environ.get(
+            "VECTOR_QUANTIZATION_ALWAYS_RAM", "true"
+        ).lower()
+        == "true",
+        "product_compression": os.environ.get("VECTOR_PQ_COMPRESSION", "x16"),
+        # Keep the original vectors on disk and only the quantized ones in RAM
+        "on_disk": os.environ.get("VECTOR_ON_DISK", "false").lower() == "true",
+        "hnsw_m": int(os.environ.get("VECTOR_HNSW_M", "0")) or None,
+        "hnsw_ef_construct": int(os.environ.get("VECTOR_HNSW_EF_CONSTRUCT", "0"))
+        or None,
+        # Search-time HNSW beam width and rescoring of quantized candidates
+        "hnsw_ef": int(os.environ.get("VECTOR_HNSW_EF", "0")) or None,
+        "rescore": os.environ.get("VECTOR_RESCORE", "true").lower() == "true",
+        "oversampling": float(os.environ.get("VECTOR_OVERSAMPLING", "2.0")),
+        # Share of a user's preference vector replaced by one new interaction
+        "profile_decay": float(os.environ.get("VECTOR_PROFILE_DECAY", "0.2")),
         # Feature flags
         "auto_index_on_create": os.environ.get(
             "VECTOR_AUTO_INDEX_CREATE", "true"
@@ -39,6 +111,12 @@ def get_vector_config():
         == "true",
         "auto_delete_on_remove": os.environ.get("VECTOR_AUTO_DELETE", "true").lower()
         == "true",
+        # Load the embedding model when Zope starts instead of on first use
+        "warmup_on_startup": os.environ.get("VECTOR_WARMUP", "false").lower()
+        == "true",
+        # Embed and upsert committed changes in a background worker
+        "async_indexing": os.environ.get("VECTOR_ASYNC_INDEX", "true").lower()
+        == "true",
     }
 
     # Try to get settings from Plone registry if available
@@ -53,6 +131,7 @@ def get_vector_config():
                 ("knowledge.curator.vector.qdrant_port", "qdrant_port"),
                 ("knowledge.curator.vector.qdrant_api_key", "qdrant_api_key"),
                 ("knowledge.curator.vector.embedding_model", "embedding_model"),
+                ("knowledge.curator.vector.embedding_backend", "embedding_backend"),
                 (
                     "knowledge.curator.vector.default_search_limit",
                     "default_search_limit",
@@ -61,6 +140,13 @@ def get_vector_config():
                     "knowledge.curator.vector.default_score_threshold",
                     "default_score_threshold",
                 ),
+                ("knowledge.curator.vector.quantization", "quantization"),
+                ("knowledge.curator.vector.on_disk", "on_disk"),
+                ("knowledge.curator.vector.hnsw_m", "hnsw_m"),
+                ("knowledge.curator.vector.hnsw_ef_construct", "hnsw_ef_construct"),
+                ("knowledge.curator.vector.hnsw_ef", "hnsw_ef"),
+                ("knowledge.curator.vector.rescore", "rescore"),
+                ("knowledge.curator.vector.oversampling", "oversampling"),
             ]
 
             for registry_key, config_key in registry_keys:
@@ -71,6 +157,24 @@ def get_vector_config():
                 except (AttributeError, KeyError, InvalidParameterError):
                     # Registry key doesn't exist, use default
                     pass
+
+            # A completed model migration wins: the live collection holds
+            # vectors of that model, so queries must be embedded with it
+            active_model = IAnnotations(portal).get(ACTIVE_MODEL_ANNOTATION_KEY)
+            if active_model:
+                configured = config["embedding_model"]
+                if (
+                    configured != active_model
+                    and (configured, active_model) not in _warned_model_overrides
+                ):
+                    _warned_model_overrides.add((configured, active_model))
+                    logger.warning(
+                        f"Configured embedding model '{configured}' differs from "
+                        f"the active model '{active_model}' of the live "
+                        "collection; using the active model. Run a model "
+                        "migration to switch."
+                    )
+                config["embedding_model"] = active_model
     except (AttributeError, ComponentLookupError, CannotGetPortalError):
         # Portal not available or registry not accessible
         pass
@@ -78,8 +182,25 @@ def get_vector_config():
     return config
 
 
-# Configuration constants - Only vectorize specific content types as requested
-SUPPORTED_CONTENT_TYPES = ["KnowledgeItem", "BookmarkPlus", "ResearchNote"]
+def set_active_embedding_model(model_name: str):
+    """Record the embedding model of the collection the alias points to."""
+    IAnnotations(api.portal.get())[ACTIVE_MODEL_ANNOTATION_KEY] = model_name
+
+
+# Configuration constants - Only vectorize specific content types as requested.
+# Together with INDEXED_WORKFLOW_STATES this is the indexing scope shared by
+# the content events, the rebuild pipeline, the reconciler and the search
+# endpoints.
+SUPPORTED_CONTENT_TYPES = [
+    "KnowledgeItem",
+    "BookmarkPlus",
+    "ResearchNote",
+    "LearningGoal",
+    "ProjectLog",
+]
+
+# Content types whose text is split into chunks when chunking is enabled
+CHUNKED_CONTENT_TYPES = ["ResearchNote", "KnowledgeItem"]
 
 INDEXED_WORKFLOW_STATES = ["capture", "private", "process", "reviewed", "published"]
 
@@ -0,0 +1,141 @@
+"""All-pairs near-duplicate detection over the vector collection.
+
+Every vector is streamed out of the collection once. The normalized vectors
+are then joined with themselves block by block: each block of rows is
+multiplied with all rows at or after its own position, so every pair is
+scored exactly once and memory stays at ``block_size`` x ``n`` scores.
+Pairs above the threshold are merged into groups with a union-find.
+"""
+
+from collections.abc import Callable
+from knowledge.curator.vector.matrix import normalize_rows
+import logging
+import numpy as np
+
+
+logger = logging.getLogger("knowledge.curator.vector")
+
+# Payload fields kept per point for reporting
+POINT_FIELDS = ("uid", "title", "path", "url", "content_type")
+
+
+class UnionFind:
+    """Disjoint sets over the integers 0..n-1."""
+
+    def __init__(self, size: int):
+        self.parent = np.arange(size)
+        self.rank = np.zeros(size, dtype=np.int8)
+
+    def find(self, item: int) -> int:
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Path compression
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return int(root)
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.rank[a] < self.rank[b]:
+            a, b = b, a
+        self.parent[b] = a
+        if self.rank[a] == self.rank[b]:
+            self.rank[a] += 1
+
+    def groups(self) -> list[list[int]]:
+        """Return the sets with more than one member, members in order."""
+        members: dict[int, list[int]] = {}
+        for item in range(len(self.parent)):
+            members.setdefault(self.find(item), []).append(item)
+        return [group for group in members.values() if len(group) > 1]
+
+
+class DuplicateDetector:
+    """Group near-duplicate points of a collection."""
+
+    def __init__(
+        self,
+        adapter,
+        score_threshold: float = 0.9,
+        block_size: int = 256,
+        same_type_only: bool = True,
+        progress: Callable[[int, int], None] | None = None,
+    ):
+        self.adapter = adapter
+        self.score_threshold = score_threshold
+        self.block_size = max(1, block_size)
+        self.same_type_only = same_type_only
+        self.progress = progress
+
+    def run(self, content_types: list[str] | None = None) -> list[list[dict]]:
+        """Return duplicate groups, largest first.
+
+        The first item of a group is its representative with a score of 1.0;
+        the other items are scored by their similarity to it.
+        """
+        points, vectors = self.load(content_types)
+        if len(points) < 2:
+            return []
+
+        union_find = UnionFind(len(points))
+        for a, b in self.pairs(vectors, [p["content_type"] for p in points]):
+            union_find.union(a, b)
+
+        groups = []
+        for rows in union_find.groups():
+            scores = vectors[rows] @ vectors[rows[0]]
+            group = []
+            for row, score in zip(rows, scores, strict=True):
+                item = dict(points[row])
+                item["score"] = 1.0 if row == rows[0] else round(float(score), 4)
+                group.append(item)
+            groups.append(group)
+
+        groups.sort(key=len, reverse=True)
+        logger.info(f"Found {len(groups)} duplicate groups in {len(points)} items")
+        return groups
+
+    def load(self, content_types: list[str] | None = None):
+        """Stream all points of the collection into a normalized matrix."""
+        filters = {"content_type": content_types} if content_types else None
+        points = []
+        vectors = []
+        for batch in self.adapter.scroll_points(filters=filters, with_vectors=True):
+            for point in batch:
+                payload = point.payload or {}
+                # Documents are represented by their first chunk
+                if not point.vector or payload.get("chunk"):
+                    continue
+                points.append({field: payload.get(field) for field in POINT_FIELDS})
+                vectors.append(point.vector)
+
+        if not vectors:
+            return [], np.empty((0, 0), dtype=np.float32)
+        return points, normalize_rows(np.array(vectors, dtype=np.float32))
+
+    def pairs(self, vectors: np.ndarray, content_types: list[str]):
+        """Yield (row, row) index pairs scoring at least the threshold."""
+        total = len(vectors)
+        if self.same_type_only:
+            _, type_codes = np.unique(
+                np.array(content_types, dtype=object).astype(str), return_inverse=True
+            )
+
+        for start in range(0, total, self.block_size):
+            stop = min(start + self.block_size, total)
+            scores = vectors[start:stop] @ vectors[start:].T
+            # Keep the upper triangle only: column j > row i
+            scores[np.tril_indices(stop - start, k=0, m=total - start)] = -np.inf
+            mask = scores >= self.score_threshold
+            if self.same_type_only:
+                mask &= type_codes[start:stop, None] == type_codes[None, start:]
+            rows, cols = np.nonzero(mask)
+            yield from zip(
+                (rows + start).tolist(), (cols + start).tolist(), strict=True
+            )
+
+            if self.progress is not None:
+                self.progress(stop, total)
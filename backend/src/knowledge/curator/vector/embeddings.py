@@ -1,34 +1,189 @@
 """Embedding generation utilities using sentence-transformers."""
 
+from huggingface_hub import list_repo_files
 from sentence_transformers import SentenceTransformer
 import logging
 import numpy as np
+import os
+import platform
+import re
+import tempfile
+import threading
 
 
 logger = logging.getLogger("knowledge.curator.vector")
 
+# "torch" runs the PyTorch model, "onnx" the same model exported to ONNX
+# Runtime and "onnx-int8" its dynamically int8-quantized export
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Lowest cosine similarity to the PyTorch embedding of the same text that
+# still counts as the same embedding space
+BACKEND_MIN_COSINE = {"torch": 1.0 - 1e-5, "onnx": 0.999, "onnx-int8": 0.95}
+
+
+# Characters per token assumed when cutting input before tokenization
+MAX_CHARS_PER_TOKEN = 4
+
+# The same for chunks from ``chunk_text``, which must not be cut: real
+# averages are around 4, but URLs and code have much longer tokens
+CHUNK_CHARS_PER_TOKEN = 16
+
+# Characters of the main text field embedded when documents are not chunked
+MAX_CONTENT_CHARS = 2000
+
+
+def onnx_quantization_target() -> str:
+    """Return the ONNX Runtime quantization preset for this CPU."""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    return "avx2"
+
+
+def int8_onnx_file(files, target: str) -> str | None:
+    """Pick the int8 ONNX export for a quantization preset from a file list.
+
+    Exports are named ``onnx/model_qint8_<target>.onnx`` or, for presets
+    with unsigned weights such as avx2, ``onnx/model_quint8_<target>.onnx``.
+    """
+    pattern = re.compile(rf"^onnx/model_qu?int8_{re.escape(target)}\.onnx$")
+    matches = sorted(name for name in files if pattern.match(name))
+    return matches[0] if matches else None
+
 
 class EmbeddingGenerator:
     """Generate embeddings for text content using sentence-transformers."""
 
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
-        """Initialize the embedding model."""
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        backend: str = "torch",
+        onnx_dir: str | None = None,
+        onnx_file_name: str | None = None,
+        chunking: bool = False,
+    ):
+        """Initialize the embedding model.
+
+        Args:
+            model_name: Sentence-transformers model name or path
+            backend: One of ``EMBEDDING_BACKENDS``
+            onnx_dir: Where locally quantized ONNX models are kept
+            onnx_file_name: int8 ONNX file of the model to load, instead of
+                looking for one in the model repository
+            chunking: Whether long documents are embedded as chunks, in
+                which case their text is not cut to a fixed length
+        """
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend: {backend}")
         self.model_name = model_name
+        self.backend = backend
+        self.onnx_dir = onnx_dir or os.path.join(
+            tempfile.gettempdir(), "knowledge-curator-onnx"
+        )
+        self.onnx_file_name = onnx_file_name
+        self.chunking = chunking
         self._model = None
         self._model_info = None
+        self._lock = threading.Lock()
+
+    @property
+    def variant(self) -> str:
+        """Name of the backend and, for int8, its quantization preset.
+
+        Embeddings of different variants differ slightly, so caches keep
+        them apart.
+        """
+        if self.backend == "onnx-int8":
+            return f"{self.backend}-{onnx_quantization_target()}"
+        return self.backend
+
+    def _load_model(self):
+        """Load the model with the configured backend."""
+        if self.backend == "torch":
+            return SentenceTransformer(self.model_name)
+        if self.backend == "onnx":
+            return SentenceTransformer(self.model_name, backend="onnx")
+
+        # Use the quantized export published with the model if there is one,
+        # otherwise quantize the ONNX export once and keep it in onnx_dir
+        target = onnx_quantization_target()
+        file_name = self.onnx_file_name or int8_onnx_file(
+            self._model_files(self.model_name), target
+        )
+        if file_name:
+            logger.info(f"Loading int8 ONNX export {file_name} of {self.model_name}")
+            return SentenceTransformer(
+                self.model_name, backend="onnx", model_kwargs={"file_name": file_name}
+            )
+
+        local_path = os.path.join(
+            self.onnx_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", self.model_name)
+        )
+        file_name = None
+        if os.path.isdir(local_path):
+            file_name = int8_onnx_file(self._model_files(local_path), target)
+        if file_name is None:
+            from sentence_transformers import export_dynamic_quantized_onnx_model
+
+            logger.info(
+                f"{self.model_name} has no int8 ONNX export for {target}; "
+                f"quantizing it into {local_path}"
+            )
+            model = SentenceTransformer(self.model_name, backend="onnx")
+            model.save(local_path)
+            export_dynamic_quantized_onnx_model(model, target, local_path)
+            file_name = int8_onnx_file(self._model_files(local_path), target)
+            if file_name is None:
+                raise RuntimeError(
+                    f"Quantizing {self.model_name} for {target} wrote no model"
+                )
+        else:
+            logger.info(f"Loading int8 ONNX model {file_name} from {local_path}")
+        return SentenceTransformer(
+            local_path, backend="onnx", model_kwargs={"file_name": file_name}
+        )
+
+    def _model_files(self, source: str) -> list[str]:
+        """List the files of a local model directory or model repository."""
+        if os.path.isdir(source):
+            return [
+                os.path.relpath(os.path.join(root, name), source).replace(os.sep, "/")
+                for root, _dirs, names in os.walk(source)
+                for name in names
+            ]
+        if os.path.exists(source):
+            return []
+        try:
+            return list_repo_files(source)
+        except Exception as e:
+            logger.info(f"Could not list the files of {source}: {e}")
+            return []
 
     @property
     def model(self):
-        """Lazy load the model."""
+        """Lazy load the model, once, even when shared between threads."""
         if self._model is None:
-            logger.info(f"Loading embedding model: {self.model_name}")
-            self._model = SentenceTransformer(self.model_name)
-            self._model_info = {
-                "max_seq_length": self._model.max_seq_length,
-                "embedding_dimension": self._model.get_sentence_embedding_dimension(),
-            }
+            with self._lock:
+                if self._model is None:
+                    logger.info(
+                        f"Loading embedding model: {self.model_name} "
+                        f"({self.backend})"
+                    )
+                    model = self._load_model()
+                    self._model_info = {
+                        "max_seq_length": model.max_seq_length,
+                        "embedding_dimension": (
+                            model.get_sentence_embedding_dimension()
+                        ),
+                    }
+                    self._model = model
         return self._model
 
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the model has been loaded into memory."""
+        return self._model is not None
+
     @property
     def embedding_dimension(self) -> int:
         """Get the dimension of the embeddings."""
@@ -43,6 +198,23 @@ class EmbeddingGenerator:
             _ = self.model  # Force model loading
         return self._model_info["max_seq_length"]
 
+    def _bound(self, text: str) -> str:
+        """Cut text beyond the model's input length before tokenizing.
+
+        With chunking enabled the bound is loose enough that chunks from
+        ``chunk_text`` are not cut in practice; the model's tokenizer
+        truncates to ``max_sequence_length`` tokens itself.
+        """
+        chars_per_token = (
+            CHUNK_CHARS_PER_TOKEN if self.chunking else MAX_CHARS_PER_TOKEN
+        )
+        limit = self.max_sequence_length * chars_per_token
+        return text[:limit] if len(text) > limit else text
+
+    def _content_text(self, content) -> str:
+        """Return the main text field, cut unless documents are chunked."""
+        return content.output if self.chunking else content.output[:MAX_CONTENT_CHARS]
+
     def generate_embedding(self, text: str) -> list[float]:
         """Generate embedding for a single text."""
         if not text or not text.strip():
@@ -50,11 +222,7 @@ class EmbeddingGenerator:
             return [0.0] * self.embedding_dimension
 
         try:
-            # Truncate text if needed
-            if len(text) > self.max_sequence_length * 4:  # Rough character estimate
-                text = text[: self.max_sequence_length * 4]
-
-            embedding = self.model.encode(text, convert_to_numpy=True)
+            embedding = self.model.encode(self._bound(text), convert_to_numpy=True)
             return embedding.tolist()
 
         except Exception as e:
@@ -75,10 +243,7 @@ class EmbeddingGenerator:
             for i, text in enumerate(texts):
                 if text and text.strip():
                     valid_indices.append(i)
-                    # Truncate if needed
-                    if len(text) > self.max_sequence_length * 4:
-                        text = text[: self.max_sequence_length * 4]
-                    valid_texts.append(text)
+                    valid_texts.append(self._bound(text))
 
             # Generate embeddings for valid texts
             if valid_texts:
@@ -108,6 +273,44 @@ class EmbeddingGenerator:
             logger.error(f"Failed to generate embeddings: {e}")
             return [[0.0] * self.embedding_dimension] * len(texts)
 
+    def chunk_text(
+        self,
+        text: str,
+        window: int | None = None,
+        overlap: int = 32,
+        max_chunks: int = 16,
+    ) -> list[str]:
+        """Split text into overlapping windows of at most ``window`` tokens.
+
+        Windows are cut on the model tokenizer's token boundaries and mapped
+        back to character offsets, so every chunk is a slice of the original
+        text. Text that fits into a single window is returned as it is.
+        """
+        if not text or not text.strip():
+            return [text]
+
+        # Leave room for the special tokens the model adds around a sequence
+        window = window or max(self.max_sequence_length - 2, 1)
+        overlap = min(overlap, window // 2)
+        try:
+            offsets = self.model.tokenizer(
+                text, add_special_tokens=False, return_offsets_mapping=True
+            )["offset_mapping"]
+        except Exception as e:
+            logger.debug(f"Chunking on whitespace, tokenizer unavailable: {e}")
+            offsets = [match.span() for match in re.finditer(r"\S+", text)]
+
+        if len(offsets) <= window:
+            return [text]
+
+        chunks = []
+        for start in range(0, len(offsets), window - overlap):
+            end = min(start + window, len(offsets))
+            chunks.append(text[offsets[start][0] : offsets[end - 1][1]])
+            if end == len(offsets) or len(chunks) >= max_chunks:
+                break
+        return chunks
+
     def _prepare_bookmark_plus_text(self, content_object, parts):
         """Prepare text for BookmarkPlus content type."""
         if url := getattr(content_object, "url", ""):
@@ -124,12 +327,23 @@ class EmbeddingGenerator:
         if (content := getattr(content_object, "content", None)) and hasattr(
             content, "output"
         ):
-            parts.append(f"Content: {content.output[:2000]}")
+            parts.append(f"Content: {self._content_text(content)}")
         if key_findings := getattr(content_object, "key_findings", []):
             parts.append(f"Key Findings: {'; '.join(key_findings)}")
         if tags := getattr(content_object, "tags", []):
             parts.append(f"Tags: {', '.join(tags)}")
 
+    def _prepare_knowledge_item_text(self, content_object, parts):
+        """Prepare text for KnowledgeItem content type."""
+        if (content := getattr(content_object, "content", None)) and hasattr(
+            content, "output"
+        ):
+            parts.append(f"Content: {self._content_text(content)}")
+        if atomic_concepts := getattr(content_object, "atomic_concepts", []):
+            parts.append(f"Concepts: {', '.join(atomic_concepts)}")
+        if tags := getattr(content_object, "tags", []):
+            parts.append(f"Tags: {', '.join(tags)}")
+
     def _prepare_learning_goal_text(self, content_object, parts):
         """Prepare text for LearningGoal content type."""
         if (
@@ -164,6 +378,7 @@ class EmbeddingGenerator:
             content_type_handlers = {
                 "BookmarkPlus": self._prepare_bookmark_plus_text,
                 "ResearchNote": self._prepare_research_note_text,
+                "KnowledgeItem": self._prepare_knowledge_item_text,
                 "LearningGoal": self._prepare_learning_goal_text,
                 "ProjectLog": self._prepare_project_log_text,
             }
@@ -3,7 +3,11 @@
 from knowledge.curator.vector.config import get_vector_config
 from knowledge.curator.vector.config import INDEXED_WORKFLOW_STATES
 from knowledge.curator.vector.config import SUPPORTED_CONTENT_TYPES
-from knowledge.curator.vector.management import VectorCollectionManager
+from knowledge.curator.vector.indexing import process_jobs
+from knowledge.curator.vector.indexing import queue_delete
+from knowledge.curator.vector.indexing import queue_index
+from knowledge.curator.vector.management import content_document
+from knowledge.curator.vector.pool import get_component_pool
 from knowledge.curator.interfaces import IKnowledgeItem
 from plone import api
 from Products.CMFCore.interfaces import IContentish
@@ -63,59 +67,45 @@ def should_index_content(obj):
 
 @adapter(IContentish, IObjectCreatedEvent)
 def content_created(obj, event):
-    """Handle content creation - generate embeddings if configured."""
+    """Handle content creation - queue embedding if configured."""
     config = get_vector_config()
     if not config["auto_index_on_create"]:
         return
 
-    if not should_index_content(obj):
+    if obj.portal_type not in SUPPORTED_CONTENT_TYPES:
         return
 
     try:
-        manager = VectorCollectionManager()
-        success = manager.update_content_vector(obj)
-
-        if success:
-            logger.info(f"Created vector for new content: {obj.absolute_url()}")
-            # Update relationships for Knowledge Items
-            if obj.portal_type == "KnowledgeItem":
-                _update_dependent_content_relationships(obj)
-        else:
-            logger.warning(f"Failed to create vector for: {obj.absolute_url()}")
-
+        queue_index(obj, interaction="create")
+        # Update relationships for Knowledge Items
+        if obj.portal_type == "KnowledgeItem":
+            _update_dependent_content_relationships(obj)
     except Exception as e:
         logger.error(f"Error in content created handler: {e}")
 
 
 @adapter(IContentish, IObjectModifiedEvent)
 def content_modified(obj, event):
-    """Handle content modification - update embeddings if configured."""
+    """Handle content modification - queue embedding update if configured."""
     config = get_vector_config()
     if not config["auto_index_on_modify"]:
         return
 
-    if not should_index_content(obj):
+    if obj.portal_type not in SUPPORTED_CONTENT_TYPES:
         return
 
     try:
-        manager = VectorCollectionManager()
-        success = manager.update_content_vector(obj)
-
-        if success:
-            logger.info(f"Updated vector for modified content: {obj.absolute_url()}")
-            # Update relationships for Knowledge Items
-            if obj.portal_type == "KnowledgeItem":
-                _update_dependent_content_relationships(obj)
-        else:
-            logger.warning(f"Failed to update vector for: {obj.absolute_url()}")
-
+        queue_index(obj, interaction="edit")
+        # Update relationships for Knowledge Items
+        if obj.portal_type == "KnowledgeItem":
+            _update_dependent_content_relationships(obj)
     except Exception as e:
         logger.error(f"Error in content modified handler: {e}")
 
 
 @adapter(IContentish, IObjectRemovedEvent)
 def content_removed(obj, event):
-    """Handle content removal - delete embeddings if configured."""
+    """Handle content removal - queue embedding deletion if configured."""
     config = get_vector_config()
     if not config["auto_delete_on_remove"]:
         return
@@ -124,21 +114,14 @@ def content_removed(obj, event):
         return
 
     try:
-        manager = VectorCollectionManager()
-        success = manager.delete_content_vector(obj.UID())
-
-        if success:
-            logger.info(f"Deleted vector for removed content: {obj.UID()}")
-        else:
-            logger.warning(f"Failed to delete vector for: {obj.UID()}")
-
+        queue_delete(obj.UID())
     except Exception as e:
         logger.error(f"Error in content removed handler: {e}")
 
 
 @adapter(IContentish, IAfterTransitionEvent)
 def workflow_transition(obj, event):
-    """Handle workflow transitions - update vectors when entering process state."""
+    """Handle workflow transitions - queue index or delete for the new state."""
     if obj.portal_type not in SUPPORTED_CONTENT_TYPES:
         return
 
@@ -155,74 +138,59 @@ def workflow_transition(obj, event):
     was_indexed = old_state in INDEXED_WORKFLOW_STATES if old_state else False
 
     try:
-        manager = VectorCollectionManager()
-
-        if should_index_now and not was_indexed:
-            # Entering an indexed state - create/update vector
-            success = manager.update_content_vector(obj)
-            if success:
-                logger.info(
-                    f"Created vector after transition to {new_state}: "
-                    f"{obj.absolute_url()}"
-                )
-                # Update relationships for Knowledge Items
-                if obj.portal_type == "KnowledgeItem":
-                    _update_dependent_content_relationships(obj)
-
-        elif was_indexed and not should_index_now:
+        if should_index_now:
+            # Entering or moving between indexed states - create/update vector
+            queue_index(obj, interaction="review")
+            # Update relationships for Knowledge Items
+            if obj.portal_type == "KnowledgeItem":
+                _update_dependent_content_relationships(obj)
+
+        elif was_indexed:
             # Leaving an indexed state - remove vector
-            success = manager.delete_content_vector(obj.UID())
-            if success:
-                logger.info(
-                    f"Deleted vector after transition to {new_state}: "
-                    f"{obj.absolute_url()}"
-                )
-
-        elif should_index_now and was_indexed:
-            # Moving between indexed states - update vector
-            success = manager.update_content_vector(obj)
-            if success:
-                logger.info(
-                    f"Updated vector after transition to {new_state}: "
-                    f"{obj.absolute_url()}"
-                )
-                # Update relationships for Knowledge Items
-                if obj.portal_type == "KnowledgeItem":
-                    _update_dependent_content_relationships(obj)
+            queue_delete(obj.UID())
 
     except Exception as e:
         logger.error(f"Error in workflow transition handler: {e}")
 
 
 def batch_update_vectors(content_uids):
-    """Batch update vectors for multiple content items."""
-    try:
-        manager = VectorCollectionManager()
-        updated = 0
-        errors = 0
-
-        for uid in content_uids:
-            try:
-                brain = api.content.find(UID=uid)
-                if brain:
-                    obj = brain[0].getObject()
-                    if should_index_content(obj):
-                        success = manager.update_content_vector(obj)
-                        if success:
-                            updated += 1
-                        else:
-                            errors += 1
-            except Exception as e:
-                logger.error(f"Error updating vector for {uid}: {e}")
-                errors += 1
-
-        logger.info(f"Batch update completed: {updated} updated, {errors} errors")
-        return {"updated": updated, "errors": errors}
+    """Batch update vectors for multiple content items.
+
+    All items are embedded in one batch and written with one upsert.
+    """
+    config = get_vector_config()
+    generator = get_component_pool().embedding_generator(
+        config["embedding_model"], config
+    )
+    job = {"documents": [], "texts": [], "deletes": [], "config": config}
+    errors = 0
+
+    for uid in content_uids:
+        try:
+            brain = api.content.find(UID=uid)
+            if brain:
+                obj = brain[0].getObject()
+                if should_index_content(obj):
+                    job["documents"].append(content_document(obj))
+                    job["texts"].append(generator.prepare_content_text(obj))
+        except Exception as e:
+            logger.error(f"Error preparing vector for {uid}: {e}")
+            errors += 1
 
+    try:
+        result = process_jobs([job])
+        if result["success"]:
+            updated = result["indexed"]
+        else:
+            updated = 0
+            errors += len(job["documents"])
     except Exception as e:
         logger.error(f"Batch update failed: {e}")
         return {"updated": 0, "errors": len(content_uids)}
 
+    logger.info(f"Batch update completed: {updated} updated, {errors} errors")
+    return {"updated": updated, "errors": errors}
+
 
 def _update_dependent_content_relationships(knowledge_item):
     """Update dependent content relationships when Knowledge Item changes.
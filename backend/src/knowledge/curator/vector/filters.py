@@ -0,0 +1,177 @@
+"""Compile search predicates into Qdrant payload filters.
+
+Predicates are given as a mapping of payload key to value:
+
+- a scalar matches exactly (``MatchValue``)
+- a list, tuple or set matches any of its items (``MatchAny``)
+- ``{"$in": [...]}`` / ``{"$any": [...]}`` match any item, ``{"$all": [...]}``
+  requires every item and ``{"$eq": v}`` matches exactly
+- ``{"$nin": [...]}`` excludes every item (``must_not``)
+- a scalar operand of ``$in``, ``$any``, ``$all`` or ``$nin`` counts as a
+  one-item list
+- ``{"$gte": a, "$lt": b}`` (``$gt``, ``$gte``, ``$lt``, ``$lte``, or
+  ``start``/``end`` as inclusive bounds) becomes a ``Range``
+
+Several operators on one key must all hold, e.g. ``{"$in": [...], "$gte": a}``.
+
+Date bounds on ``modified`` and ``created`` accept ISO strings, ``DateTime``
+or ``datetime`` values and are compared against the numeric ``modified_ts``
+and ``created_ts`` payload fields; an exact date matches the one-point range
+``[ts, ts]``. Points indexed before these fields existed lack them and
+never match a date filter; ``scripts/vector_cli.py reconcile`` treats such
+points as stale and re-indexes them with the timestamps.
+"""
+
+from datetime import datetime
+from DateTime import DateTime
+from qdrant_client.models import FieldCondition
+from qdrant_client.models import Filter
+from qdrant_client.models import MatchAny
+from qdrant_client.models import MatchValue
+from qdrant_client.models import PayloadSchemaType
+from qdrant_client.models import Range
+from typing import Any
+
+
+# Payload fields that get an index, so filtering on them does not degrade
+# the HNSW search into a scan
+INDEXED_PAYLOAD_FIELDS = {
+    "uid": PayloadSchemaType.KEYWORD,
+    "chunk": PayloadSchemaType.INTEGER,
+    "content_type": PayloadSchemaType.KEYWORD,
+    "workflow_state": PayloadSchemaType.KEYWORD,
+    "tags": PayloadSchemaType.KEYWORD,
+    "knowledge_type": PayloadSchemaType.KEYWORD,
+    "modified_ts": PayloadSchemaType.FLOAT,
+    "created_ts": PayloadSchemaType.FLOAT,
+}
+
+# Filter keys that are stored under another payload field
+FIELD_ALIASES = {
+    "portal_type": "content_type",
+    "review_state": "workflow_state",
+    "modified": "modified_ts",
+    "created": "created_ts",
+}
+
+TIMESTAMP_FIELDS = {"modified_ts", "created_ts"}
+
+RANGE_OPERATORS = {
+    "$gt": "gt",
+    "$gte": "gte",
+    "$lt": "lt",
+    "$lte": "lte",
+    "start": "gte",
+    "end": "lte",
+}
+
+MATCH_ANY_OPERATORS = {"$in", "$any"}
+
+COLLECTION_TYPES = list | tuple | set | frozenset
+
+
+def to_timestamp(value) -> float:
+    """Convert a date-like value to seconds since the epoch."""
+    if isinstance(value, int | float):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, DateTime):
+        return value.timeTime()
+    return DateTime(value).timeTime()
+
+
+def compile_filter(filters: dict[str, Any] | None) -> Filter | None:
+    """Turn a predicate mapping into a Qdrant filter, or None if empty.
+
+    Raises ValueError for unsupported operators.
+    """
+    if not filters:
+        return None
+
+    conditions = []
+    for key, value in filters.items():
+        condition = compile_condition(key, value)
+        if condition is not None:
+            conditions.append(condition)
+
+    return Filter(must=conditions) if conditions else None
+
+
+def compile_condition(key: str, value: Any) -> FieldCondition | Filter | None:
+    """Compile the predicate for a single payload key."""
+    key = FIELD_ALIASES.get(key, key)
+
+    if value is None:
+        return None
+    if isinstance(value, COLLECTION_TYPES):
+        return match_any(key, value)
+    if isinstance(value, dict):
+        return compile_operators(key, value)
+    return match_value(key, value)
+
+
+def match_value(key: str, value: Any) -> FieldCondition:
+    """Match a single value; a timestamp becomes a one-point range."""
+    if key in TIMESTAMP_FIELDS:
+        timestamp = to_timestamp(value)
+        return FieldCondition(key=key, range=Range(gte=timestamp, lte=timestamp))
+    return FieldCondition(key=key, match=MatchValue(value=value))
+
+
+def as_values(operand) -> list:
+    """Return the items of a collection operand; a scalar is a single item."""
+    if isinstance(operand, COLLECTION_TYPES):
+        return list(operand)
+    return [operand]
+
+
+def match_any(key: str, values) -> FieldCondition | Filter | None:
+    """Match any of the given values."""
+    values = [v for v in as_values(values) if v is not None]
+    if not values:
+        return None
+    if key in TIMESTAMP_FIELDS:
+        return combine([match_value(key, v) for v in values], clause="should")
+    return FieldCondition(key=key, match=MatchAny(any=values))
+
+
+def compile_operators(
+    key: str, operators: dict[str, Any]
+) -> FieldCondition | Filter | None:
+    """Compile an operator mapping; every operator in it must hold."""
+    conditions = []
+    bounds = {}
+    for operator, operand in operators.items():
+        if operand is None:
+            continue
+        if operator in MATCH_ANY_OPERATORS:
+            conditions.append(match_any(key, operand))
+        elif operator == "$nin":
+            conditions.append(combine([match_any(key, operand)], clause="must_not"))
+        elif operator == "$eq":
+            conditions.append(compile_condition(key, operand))
+        elif operator == "$all":
+            conditions.append(
+                combine([compile_condition(key, v) for v in as_values(operand)])
+            )
+        elif operator in RANGE_OPERATORS:
+            if key in TIMESTAMP_FIELDS:
+                operand = to_timestamp(operand)
+            bounds[RANGE_OPERATORS[operator]] = operand
+        else:
+            raise ValueError(f"Unsupported filter operator {operator!r} on {key!r}")
+
+    if bounds:
+        conditions.append(FieldCondition(key=key, range=Range(**bounds)))
+    return combine(conditions)
+
+
+def combine(conditions: list, clause: str = "must") -> FieldCondition | Filter | None:
+    """Join conditions with ``must`` (all), ``should`` (any) or ``must_not``."""
+    conditions = [c for c in conditions if c is not None]
+    if not conditions:
+        return None
+    if len(conditions) == 1 and clause != "must_not":
+        return conditions[0]
+    return Filter(**{clause: conditions})
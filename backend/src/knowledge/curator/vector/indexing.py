@@ -0,0 +1,329 @@
+"""Transaction-aware, coalescing vector indexing queue.
+
+Event subscribers do not touch the embedding model or Qdrant. They record
+which content changed in the current transaction. Right before commit the
+changes are deduplicated by UID and turned into payload documents and
+embedding texts while the objects are still reachable. Only once the
+transaction has committed successfully are they handed to a background
+worker, which embeds and upserts everything it has pending in one batch.
+Aborted transactions never reach the worker.
+
+Index requests may name the user and kind of interaction behind them; the
+worker folds those into the users' preference vectors (see ``profiles.py``).
+"""
+
+from knowledge.curator.vector.config import get_vector_config
+from knowledge.curator.vector.pool import get_component_pool
+from knowledge.curator.vector.profiles import INTERACTION_WEIGHTS
+from knowledge.curator.vector.profiles import store_profile_updates
+from plone import api
+from typing import Any
+import logging
+import queue
+import threading
+import transaction
+
+
+logger = logging.getLogger("knowledge.curator.vector")
+
+
+class PendingVectorChanges:
+    """Vector changes recorded during a single transaction."""
+
+    def __init__(self):
+        self.operations: list[tuple[str, Any]] = []
+        self.interactions: list[tuple[Any, str, str]] = []
+
+    def index(self, obj, interaction: str | None = None, user_id: str | None = None):
+        """Record that an object needs to be (re)indexed.
+
+        ``interaction`` ("create", "edit" or "review") and ``user_id`` name
+        who touched the object, for the user's preference vector.
+        """
+        self.operations.append(("index", obj))
+        if interaction and user_id:
+            self.interactions.append((obj, user_id, interaction))
+
+    def delete(self, uid: str):
+        """Record that the vector for a UID must be removed."""
+        self.operations.append(("delete", uid))
+
+    def resolve(self) -> dict[str, tuple[str, Any]]:
+        """Collapse the recorded operations to the last one per UID."""
+        final = {}
+        for action, target in self.operations:
+            if action == "index":
+                try:
+                    uid = target.UID()
+                except Exception as e:
+                    logger.warning(f"Skipping vector update without UID: {e}")
+                    continue
+            else:
+                uid = target
+            if uid:
+                final.pop(uid, None)
+                final[uid] = (action, target)
+        return final
+
+    def resolve_interactions(self) -> dict[tuple[str, str], float]:
+        """Return the strongest interaction weight per (user id, UID)."""
+        weights = {}
+        for obj, user_id, interaction in self.interactions:
+            try:
+                key = (user_id, obj.UID())
+            except Exception as e:
+                logger.warning(f"Skipping profile update for {obj!r} without UID: {e}")
+                continue
+            weight = INTERACTION_WEIGHTS.get(interaction, 0.0)
+            weights[key] = max(weights.get(key, 0.0), weight)
+        return weights
+
+
+# Key for storing pending changes on the transaction with ``Transaction.data``
+_PENDING_KEY = PendingVectorChanges
+
+
+def _pending_changes() -> PendingVectorChanges:
+    """Return the pending changes of the current transaction, creating them."""
+    txn = transaction.get()
+    try:
+        return txn.data(_PENDING_KEY)
+    except KeyError:
+        pending = PendingVectorChanges()
+        txn.set_data(_PENDING_KEY, pending)
+        txn.addBeforeCommitHook(_before_commit, (txn, pending))
+        return pending
+
+
+def queue_index(obj, interaction: str | None = None):
+    """Schedule an object for vector indexing once the transaction commits.
+
+    With an ``interaction`` the current user's preference vector is updated
+    with the object's embedding as well.
+    """
+    user_id = None
+    if interaction:
+        try:
+            user = api.user.get_current()
+            user_id = None if api.user.is_anonymous() else user.getId()
+        except Exception as e:
+            logger.debug(f"No current user for profile update: {e}")
+    _pending_changes().index(obj, interaction, user_id)
+
+
+def queue_delete(uid: str):
+    """Schedule a vector deletion once the transaction commits."""
+    _pending_changes().delete(uid)
+
+
+def _before_commit(txn, pending: PendingVectorChanges):
+    """Turn pending changes into documents and hand them to the after-commit hook.
+
+    Errors are logged and swallowed: a vector problem must never prevent the
+    editor's transaction from committing.
+    """
+    from knowledge.curator.vector.events import should_index_content
+    from knowledge.curator.vector.management import content_document
+
+    try:
+        config = get_vector_config()
+        pool = get_component_pool()
+        generator = pool.embedding_generator(config["embedding_model"], config)
+        job = {"documents": [], "texts": [], "deletes": [], "config": config}
+
+        for uid, (action, target) in pending.resolve().items():
+            if action == "delete":
+                job["deletes"].append(uid)
+                continue
+            try:
+                if should_index_content(target):
+                    job["documents"].append(content_document(target))
+                    job["texts"].append(generator.prepare_content_text(target))
+                else:
+                    job["deletes"].append(uid)
+            except Exception as e:
+                logger.error(f"Failed to prepare vector update for {uid}: {e}")
+
+        indexed = {doc["uid"] for doc in job["documents"]}
+        interactions = [
+            {"user_id": user_id, "uid": uid, "weight": weight}
+            for (user_id, uid), weight in pending.resolve_interactions().items()
+            if uid in indexed and weight > 0
+        ]
+        if interactions:
+            portal = api.portal.get()
+            job["profiles"] = {
+                "db": portal._p_jar.db(),
+                "portal_path": portal.getPhysicalPath(),
+                "interactions": interactions,
+            }
+
+        if job["documents"] or job["deletes"]:
+            txn.addAfterCommitHook(_after_commit, (job,))
+
+    except Exception as e:
+        logger.error(f"Failed to collect vector changes: {e}")
+
+
+def _after_commit(status: bool, job: dict[str, Any]):
+    """Dispatch the collected changes if the transaction committed."""
+    if not status:
+        logger.debug("Transaction aborted, discarding pending vector changes")
+        return
+
+    try:
+        if job["config"].get("async_indexing", True):
+            get_index_worker().submit(job)
+        else:
+            process_jobs([job])
+    except Exception as e:
+        logger.error(f"Failed to dispatch vector changes: {e}")
+
+
+def merge_jobs(jobs: list[dict[str, Any]]) -> dict[str, Any]:
+    """Merge jobs in commit order so that the latest change per UID wins."""
+    documents = {}
+    texts = {}
+    deletes = set()
+    profiles = None
+    for job in jobs:
+        if job.get("profiles"):
+            interactions = profiles["interactions"] if profiles else []
+            profiles = dict(job["profiles"])
+            profiles["interactions"] = interactions + job["profiles"]["interactions"]
+        for uid in job["deletes"]:
+            documents.pop(uid, None)
+            texts.pop(uid, None)
+            deletes.add(uid)
+        for doc, text in zip(job["documents"], job["texts"], strict=True):
+            uid = doc["uid"]
+            deletes.discard(uid)
+            documents[uid] = doc
+            texts[uid] = text
+
+    return {
+        "documents": list(documents.values()),
+        "texts": [texts[uid] for uid in documents],
+        "deletes": sorted(deletes),
+        "config": jobs[-1]["config"],
+        "profiles": profiles,
+    }
+
+
+def process_jobs(jobs: list[dict[str, Any]], manager=None) -> dict[str, Any]:
+    """Apply one or more jobs with a single embed, upsert and delete call."""
+    from knowledge.curator.vector.management import VectorCollectionManager
+
+    merged = merge_jobs(jobs)
+    manager = manager or VectorCollectionManager(merged["config"])
+    result = manager.apply_changes(
+        merged["documents"], merged["texts"], merged["deletes"]
+    )
+    logger.info(
+        f"Vector index queue: {result['indexed']} indexed, "
+        f"{result['deleted']} deleted"
+    )
+    if merged["profiles"] and result["indexed"]:
+        update_profiles(manager, merged)
+    return result
+
+
+def update_profiles(manager, merged: dict[str, Any]):
+    """Fold the interactions of a merged job into the users' profiles.
+
+    The texts were just embedded for the upsert, so their embeddings come
+    from the embedding cache.
+    """
+    documents = {doc["uid"]: doc for doc in merged["documents"]}
+    texts = dict(zip(documents, merged["texts"], strict=True))
+    interactions = [
+        item for item in merged["profiles"]["interactions"] if item["uid"] in texts
+    ]
+    if not interactions:
+        return
+    try:
+        # The first chunk stands for the document in chunked collections
+        vectors = manager.embed_texts([
+            manager.chunk_document(documents[item["uid"]], texts[item["uid"]])[0]
+            for item in interactions
+        ])
+        updates = [
+            (item["user_id"], item["uid"], vector, item["weight"])
+            for item, vector in zip(interactions, vectors, strict=True)
+        ]
+        store_profile_updates(
+            merged["profiles"]["db"],
+            merged["profiles"]["portal_path"],
+            manager.embeddings.model_name,
+            updates,
+            decay=merged["config"].get("profile_decay", 0.2),
+        )
+    except Exception as e:
+        logger.error(f"Failed to update user profiles: {e}")
+
+
+class VectorIndexWorker:
+    """Background thread that drains the indexing queue in batches."""
+
+    def __init__(self):
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._manager = None
+        self._manager_config = None
+
+    def submit(self, job: dict[str, Any]):
+        """Queue a committed job for processing."""
+        self._ensure_started()
+        self._queue.put(job)
+
+    def join(self):
+        """Block until every submitted job has been processed."""
+        self._queue.join()
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs waiting to be processed."""
+        return self._queue.qsize()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="vector-index-worker", daemon=True
+                )
+                self._thread.start()
+
+    def _get_manager(self, config: dict[str, Any]):
+        """Reuse one manager for as long as the configuration is unchanged."""
+        from knowledge.curator.vector.management import VectorCollectionManager
+
+        if self._manager is None or config != self._manager_config:
+            self._manager = VectorCollectionManager(config)
+            self._manager_config = config
+        return self._manager
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            # Coalesce everything that piled up while the last batch ran
+            while True:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                process_jobs(jobs, self._get_manager(jobs[-1]["config"]))
+            except Exception:
+                logger.exception("Vector index worker failed to process batch")
+            finally:
+                for _job in jobs:
+                    self._queue.task_done()
+
+
+_worker = VectorIndexWorker()
+
+
+def get_index_worker() -> VectorIndexWorker:
+    """Return the process-wide indexing worker."""
+    return _worker
@@ -0,0 +1,26 @@
+"""Interfaces for the vector database integration."""
+
+from zope.interface import Interface
+
+
+class IVectorComponentPool(Interface):
+    """Process-wide owner of embedding models and Qdrant clients."""
+
+    def embedding_generator(model_name=None, config=None):
+        """Return the shared embedding generator for a model.
+
+        Defaults to the configured ``embedding_model``; the inference
+        backend is the configured ``embedding_backend``.
+        """
+
+    def qdrant_client(host, port, api_key=None, https=False):
+        """Return the pooled Qdrant client for a connection."""
+
+    def local_client(path=None):
+        """Return the pooled in-process vector client for a directory."""
+
+    def adapter(config=None):
+        """Return an adapter on the pooled client of the configured engine."""
+
+    def warmup(config=None):
+        """Load the configured model and open the Qdrant client."""
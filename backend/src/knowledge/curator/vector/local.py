@@ -0,0 +1,602 @@
+"""In-process vector engine with the subset of the QdrantClient API we use.
+
+``QdrantAdapter`` (and the few places that talk to ``adapter.client``
+directly) run unchanged on top of ``LocalVectorClient``, which makes it a
+stand-in for Qdrant in tests, small deployments and benchmarks. Select it
+with ``VECTOR_ENGINE=local``.
+
+Each collection keeps L2-normalized float32 vectors in one contiguous
+array, memory-mapped from ``vectors.f32`` when a directory is configured.
+Point IDs and payloads are replayed from an append-only ``points.log``.
+Rows of deleted points are reused by the next new points, so the vector
+file only grows with the largest number of live points.
+Search is a single matrix-vector product followed by ``argpartition``.
+Payload filters are evaluated as boolean masks: keyword conditions come
+from an inverted index of value to rows, ranges from a numeric column.
+
+A storage directory belongs to one process at a time: the client holds an
+exclusive lock on it until it is closed, and another process opening it
+fails. Several ZEO clients need a Qdrant server or a directory each.
+"""
+
+from knowledge.curator.vector.matrix import normalize_rows
+from knowledge.curator.vector.matrix import top_k
+from qdrant_client.models import CreateAliasOperation
+from qdrant_client.models import DeleteAliasOperation
+from qdrant_client.models import FieldCondition
+from qdrant_client.models import Filter
+from qdrant_client.models import MatchAny
+from qdrant_client.models import MatchValue
+from types import SimpleNamespace
+from typing import Any
+import fcntl
+import json
+import logging
+import numpy as np
+import os
+import shutil
+import threading
+
+
+logger = logging.getLogger("knowledge.curator.vector")
+
+INITIAL_CAPACITY = 1024
+
+
+class LocalCollection:
+    """One collection: a vector array plus ids, payloads and indexes."""
+
+    def __init__(self, dimension: int, directory: str | None = None):
+        self.dimension = dimension
+        self.directory = directory
+        self.ids: list[Any] = []
+        self.payloads: list[dict[str, Any] | None] = []
+        self.rows: dict[Any, int] = {}
+        # Rows of deleted points, reused before the row count grows
+        self.free: list[int] = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.vectors = np.zeros((0, dimension), dtype=np.float32)
+        self.generation = 0
+        self._keyword_index: dict[str, dict[Any, set[int]]] = {}
+        self._columns: dict[str, tuple[int, np.ndarray]] = {}
+        self._id_order: tuple[int, np.ndarray, np.ndarray] | None = None
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load()
+        else:
+            self._grow(INITIAL_CAPACITY)
+
+    # Storage
+
+    @property
+    def count(self) -> int:
+        """Number of rows in use, including deleted ones."""
+        return len(self.ids)
+
+    def _grow(self, capacity: int):
+        """Make room for at least ``capacity`` rows."""
+        capacity = max(capacity, INITIAL_CAPACITY)
+        if capacity <= len(self.alive):
+            return
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: len(self.alive)] = self.alive
+        self.alive = alive
+
+        if not self.directory:
+            vectors = np.zeros((capacity, self.dimension), dtype=np.float32)
+            vectors[: len(self.vectors)] = self.vectors
+            self.vectors = vectors
+            return
+
+        path = os.path.join(self.directory, "vectors.f32")
+        if isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+        self.vectors = None
+        with open(path, "ab") as f:
+            f.truncate(capacity * self.dimension * 4)
+        self.vectors = np.memmap(
+            path, dtype=np.float32, mode="r+", shape=(capacity, self.dimension)
+        )
+
+    def _load(self):
+        """Replay the point log and map the vector file."""
+        meta_path = os.path.join(self.directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.dimension = json.load(f)["dimension"]
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"dimension": self.dimension}, f)
+
+        vectors_path = os.path.join(self.directory, "vectors.f32")
+        stored_rows = 0
+        if os.path.exists(vectors_path):
+            stored_rows = os.path.getsize(vectors_path) // (self.dimension * 4)
+
+        entries = []
+        log_path = os.path.join(self.directory, "points.log")
+        if os.path.exists(log_path):
+            with open(log_path) as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # Torn write at the end of the log
+                        break
+
+        self._grow(stored_rows)
+        for entry in entries:
+            if entry["op"] == "upsert" and entry["row"] < stored_rows:
+                self._set_row(entry["id"], entry["row"], entry["payload"])
+            elif entry["op"] == "delete":
+                self._delete_row(entry["id"])
+        # Lowest rows are reused first
+        self.free = np.flatnonzero(~self.alive[: self.count])[::-1].tolist()
+
+        if len(entries) > 2 * max(int(self.alive.sum()), 1) + 100:
+            self._compact_log()
+
+    def _write_log(self, entries: list[dict[str, Any]]):
+        """Append entries to the point log; one open per mutating call."""
+        if self.directory and entries:
+            with open(os.path.join(self.directory, "points.log"), "a") as f:
+                f.writelines(json.dumps(entry) + "\n" for entry in entries)
+
+    def _compact_log(self):
+        """Rewrite the log so that it only holds live points."""
+        log_path = os.path.join(self.directory, "points.log")
+        with open(f"{log_path}.tmp", "w") as f:
+            for row, point_id in enumerate(self.ids):
+                if self.alive[row]:
+                    entry = {
+                        "op": "upsert",
+                        "id": point_id,
+                        "row": row,
+                        "payload": self.payloads[row],
+                    }
+                    f.write(json.dumps(entry) + "\n")
+        os.replace(f"{log_path}.tmp", log_path)
+
+    def close(self):
+        if isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+
+    # Mutation
+
+    def _set_row(self, point_id, row: int, payload: dict[str, Any] | None):
+        if row >= self.count:
+            self.ids.extend([None] * (row + 1 - self.count))
+            self.payloads.extend([None] * (row + 1 - len(self.payloads)))
+        if self.alive[row] and self.payloads[row] is not None:
+            self._unindex(row)
+        self.ids[row] = point_id
+        self.payloads[row] = payload or {}
+        self.rows[point_id] = row
+        self.alive[row] = True
+        self._index(row)
+        self.generation += 1
+
+    def _delete_row(self, point_id) -> bool:
+        row = self.rows.pop(point_id, None)
+        if row is None:
+            return False
+        self._unindex(row)
+        self.alive[row] = False
+        self.payloads[row] = None
+        self.free.append(row)
+        self.generation += 1
+        return True
+
+    def _index(self, row: int):
+        for key, value in self.payloads[row].items():
+            values = value if isinstance(value, list) else [value]
+            for item in values:
+                if isinstance(item, str | int | bool):
+                    index = self._keyword_index.setdefault(key, {})
+                    index.setdefault(item, set()).add(row)
+
+    def _unindex(self, row: int):
+        for key, value in (self.payloads[row] or {}).items():
+            values = value if isinstance(value, list) else [value]
+            for item in values:
+                if isinstance(item, str | int | bool):
+                    rows = self._keyword_index.get(key, {}).get(item)
+                    if rows is not None:
+                        rows.discard(row)
+
+    def upsert(self, points):
+        entries = []
+        if self.count + len(points) > len(self.alive):
+            self._grow(max(2 * len(self.alive), self.count + len(points)))
+        for point in points:
+            row = self.rows.get(point.id)
+            if row is None:
+                row = self.free.pop() if self.free else self.count
+            if row >= len(self.alive):
+                self._grow(2 * len(self.alive))
+            self.vectors[row] = normalize_rows(np.asarray(point.vector))
+            self._set_row(point.id, row, point.payload)
+            entries.append(
+                {"op": "upsert", "id": point.id, "row": row, "payload": point.payload}
+            )
+        if isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+        self._write_log(entries)
+
+    def update_vectors(self, points):
+        for point in points:
+            row = self.rows.get(point.id)
+            if row is not None:
+                self.vectors[row] = normalize_rows(np.asarray(point.vector))
+        if isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+
+    def delete(self, point_ids):
+        deleted = [point_id for point_id in point_ids if self._delete_row(point_id)]
+        self._write_log([{"op": "delete", "id": point_id} for point_id in deleted])
+
+    # Queries
+
+    def _keyword_mask(self, key: str, values) -> np.ndarray:
+        mask = np.zeros(self.count, dtype=bool)
+        index = self._keyword_index.get(key, {})
+        for value in values:
+            rows = index.get(value)
+            if rows:
+                mask[list(rows)] = True
+        return mask
+
+    def _column(self, key: str) -> np.ndarray:
+        """Numeric payload column, NaN where missing; cached per generation."""
+        cached = self._columns.get(key)
+        if cached is not None and cached[0] == self.generation:
+            return cached[1]
+        column = np.full(self.count, np.nan)
+        for row, payload in enumerate(self.payloads):
+            value = payload.get(key) if payload else None
+            if isinstance(value, int | float) and not isinstance(value, bool):
+                column[row] = value
+        self._columns[key] = (self.generation, column)
+        return column
+
+    def id_order(self) -> tuple[np.ndarray, np.ndarray]:
+        """Rows sorted by point ID and their IDs; cached per generation."""
+        if self._id_order is None or self._id_order[0] != self.generation:
+            keys = np.array([str(point_id) for point_id in self.ids], dtype=str)
+            order = np.argsort(keys, kind="stable")
+            self._id_order = (self.generation, order, keys[order])
+        return self._id_order[1], self._id_order[2]
+
+    def _condition_mask(self, condition) -> np.ndarray:
+        if isinstance(condition, Filter):
+            return self.filter_mask(condition)
+        if not isinstance(condition, FieldCondition):
+            raise ValueError(f"Unsupported filter condition {condition!r}")
+
+        if isinstance(condition.match, MatchValue):
+            return self._keyword_mask(condition.key, [condition.match.value])
+        if isinstance(condition.match, MatchAny):
+            return self._keyword_mask(condition.key, condition.match.any)
+        if condition.range is not None:
+            column = self._column(condition.key)
+            mask = ~np.isnan(column)
+            bounds = condition.range
+            with np.errstate(invalid="ignore"):
+                if bounds.gt is not None:
+                    mask &= column > bounds.gt
+                if bounds.gte is not None:
+                    mask &= column >= bounds.gte
+                if bounds.lt is not None:
+                    mask &= column < bounds.lt
+                if bounds.lte is not None:
+                    mask &= column <= bounds.lte
+            return mask
+        raise ValueError(f"Unsupported filter on {condition.key!r}")
+
+    def filter_mask(self, query_filter: Filter | None) -> np.ndarray:
+        """Rows that are alive and match the filter."""
+        mask = self.alive[: self.count].copy()
+        if query_filter is None:
+            return mask
+        for condition in query_filter.must or []:
+            mask &= self._condition_mask(condition)
+        for condition in query_filter.must_not or []:
+            mask &= ~self._condition_mask(condition)
+        if query_filter.should:
+            any_mask = np.zeros(self.count, dtype=bool)
+            for condition in query_filter.should:
+                any_mask |= self._condition_mask(condition)
+            mask &= any_mask
+        return mask
+
+    def search(self, query_vector, limit, score_threshold=None, query_filter=None):
+        mask = self.filter_mask(query_filter)
+        if not mask.any():
+            return []
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32))
+        scores = self.vectors[: self.count] @ query
+        if score_threshold is not None:
+            mask &= scores >= score_threshold
+        scores = np.where(mask, scores, -np.inf)
+        return [
+            SimpleNamespace(
+                id=self.ids[row],
+                score=float(scores[row]),
+                payload=dict(self.payloads[row]),
+                version=0,
+            )
+            for row in top_k(scores, min(limit, int(mask.sum())))
+        ]
+
+    def record(self, row: int, with_vectors: bool = False, with_payload=True):
+        return SimpleNamespace(
+            id=self.ids[row],
+            payload=dict(self.payloads[row]) if with_payload else None,
+            vector=self.vectors[row].tolist() if with_vectors else None,
+        )
+
+
+class LocalVectorClient:
+    """Drop-in for the QdrantClient methods used by ``QdrantAdapter``.
+
+    With ``path`` collections persist below that directory, which is locked
+    against other processes until ``close``; without it everything lives in
+    memory.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._collections: dict[str, LocalCollection] = {}
+        self._aliases: dict[str, str] = {}
+        self._lock_file = None
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._acquire(path)
+            self._load()
+
+    def _acquire(self, path: str):
+        """Take the directory's inter-process lock, or fail if it is taken."""
+        lock_file = open(os.path.join(path, "lock"), "a")  # noqa: SIM115
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(
+                f"Local vector store {path} is in use by another process"
+            ) from None
+        self._lock_file = lock_file
+
+    def _load(self):
+        aliases_path = os.path.join(self.path, "aliases.json")
+        if os.path.exists(aliases_path):
+            with open(aliases_path) as f:
+                self._aliases = json.load(f)
+        for name in sorted(os.listdir(self.path)):
+            directory = os.path.join(self.path, name)
+            if os.path.isfile(os.path.join(directory, "meta.json")):
+                self._collections[name] = LocalCollection(0, directory)
+
+    def _save_aliases(self):
+        if self.path:
+            with open(os.path.join(self.path, "aliases.json"), "w") as f:
+                json.dump(self._aliases, f)
+
+    def _get(self, collection_name: str) -> LocalCollection:
+        name = self._aliases.get(collection_name, collection_name)
+        try:
+            return self._collections[name]
+        except KeyError:
+            raise ValueError(f"Collection {collection_name} not found") from None
+
+    # Collections and aliases
+
+    def get_collections(self):
+        with self._lock:
+            return SimpleNamespace(
+                collections=[SimpleNamespace(name=n) for n in self._collections]
+            )
+
+    def get_aliases(self):
+        with self._lock:
+            return SimpleNamespace(
+                aliases=[
+                    SimpleNamespace(alias_name=alias, collection_name=name)
+                    for alias, name in self._aliases.items()
+                ]
+            )
+
+    def create_collection(self, collection_name: str, vectors_config, **kwargs):
+        with self._lock:
+            if collection_name in self._collections:
+                raise ValueError(f"Collection {collection_name} already exists")
+            directory = None
+            if self.path:
+                directory = os.path.join(self.path, collection_name)
+            self._collections[collection_name] = LocalCollection(
+                vectors_config.size, directory
+            )
+            return True
+
+    def delete_collection(self, collection_name: str, **kwargs):
+        with self._lock:
+            collection = self._collections.pop(collection_name, None)
+            if collection is None:
+                return False
+            collection.close()
+            if collection.directory:
+                shutil.rmtree(collection.directory, ignore_errors=True)
+            self._aliases = {
+                alias: name
+                for alias, name in self._aliases.items()
+                if name != collection_name
+            }
+            self._save_aliases()
+            return True
+
+    def update_collection_aliases(self, change_aliases_operations, **kwargs):
+        with self._lock:
+            for operation in change_aliases_operations:
+                if isinstance(operation, DeleteAliasOperation):
+                    self._aliases.pop(operation.delete_alias.alias_name, None)
+                elif isinstance(operation, CreateAliasOperation):
+                    create = operation.create_alias
+                    if create.collection_name not in self._collections:
+                        raise ValueError(
+                            f"Collection {create.collection_name} not found"
+                        )
+                    self._aliases[create.alias_name] = create.collection_name
+            self._save_aliases()
+            return True
+
+    def create_payload_index(self, collection_name: str, field_name, **kwargs):
+        """Every payload field is indexed already."""
+        self._get(collection_name)
+        return True
+
+    def get_collection(self, collection_name: str):
+        with self._lock:
+            collection = self._get(collection_name)
+            points = int(collection.alive.sum())
+            return SimpleNamespace(
+                status="green",
+                points_count=points,
+                vectors_count=points,
+                indexed_vectors_count=points,
+                config=SimpleNamespace(
+                    params=SimpleNamespace(
+                        vectors=SimpleNamespace(
+                            size=collection.dimension, distance="Cosine"
+                        )
+                    )
+                ),
+            )
+
+    # Points
+
+    def upsert(self, collection_name: str, points, **kwargs):
+        with self._lock:
+            self._get(collection_name).upsert(points)
+            return True
+
+    def update_vectors(self, collection_name: str, points, **kwargs):
+        with self._lock:
+            self._get(collection_name).update_vectors(points)
+            return True
+
+    def delete(self, collection_name: str, points_selector, **kwargs):
+        with self._lock:
+            collection = self._get(collection_name)
+            if getattr(points_selector, "filter", None) is not None:
+                rows = np.flatnonzero(collection.filter_mask(points_selector.filter))
+                point_ids = [collection.ids[row] for row in rows]
+            else:
+                point_ids = points_selector.points
+            collection.delete(point_ids)
+            return True
+
+    def retrieve(
+        self,
+        collection_name: str,
+        ids,
+        with_vectors=False,
+        with_payload=True,
+        **kwargs,
+    ):
+        with self._lock:
+            collection = self._get(collection_name)
+            return [
+                collection.record(collection.rows[point_id], with_vectors, with_payload)
+                for point_id in ids
+                if point_id in collection.rows
+            ]
+
+    def scroll(
+        self,
+        collection_name: str,
+        scroll_filter: Filter | None = None,
+        limit: int = 10,
+        offset=None,
+        with_payload=True,
+        with_vectors=False,
+        **kwargs,
+    ):
+        """Page through points in point ID order, as Qdrant does.
+
+        The offset is the ID of the first point of the page.
+        """
+        with self._lock:
+            collection = self._get(collection_name)
+            order, keys = collection.id_order()
+            start = 0 if offset is None else int(np.searchsorted(keys, str(offset)))
+            candidates = order[start:]
+            matching = candidates[collection.filter_mask(scroll_filter)[candidates]]
+            next_offset = None
+            if len(matching) > limit:
+                next_offset = collection.ids[int(matching[limit])]
+            records = [
+                collection.record(int(row), with_vectors, with_payload)
+                for row in matching[:limit]
+            ]
+            return records, next_offset
+
+    def query_points(
+        self,
+        collection_name: str,
+        query,
+        limit: int = 10,
+        score_threshold: float | None = None,
+        query_filter: Filter | None = None,
+        **kwargs,
+    ):
+        """Nearest neighbors of a query vector."""
+        with self._lock:
+            hits = self._get(collection_name).search(
+                query, limit, score_threshold, query_filter
+            )
+        return SimpleNamespace(points=hits)
+
+    def query_points_groups(
+        self,
+        collection_name: str,
+        group_by: str,
+        query,
+        limit: int = 10,
+        group_size: int = 3,
+        score_threshold: float | None = None,
+        query_filter: Filter | None = None,
+        **kwargs,
+    ):
+        """Best ``group_size`` hits for each of the ``limit`` best groups."""
+        with self._lock:
+            collection = self._get(collection_name)
+            hits = collection.search(
+                query, collection.count, score_threshold, query_filter
+            )
+        groups: dict[Any, list] = {}
+        for hit in hits:
+            key = (hit.payload or {}).get(group_by)
+            if key is None:
+                continue
+            group = groups.get(key)
+            if group is None:
+                if len(groups) >= limit:
+                    continue
+                group = groups[key] = []
+            if len(group) < group_size:
+                group.append(hit)
+        return SimpleNamespace(
+            groups=[
+                SimpleNamespace(id=key, hits=group) for key, group in groups.items()
+            ]
+        )
+
+    def close(self):
+        with self._lock:
+            for collection in self._collections.values():
+                collection.close()
+            if self._lock_file is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                self._lock_file.close()
+                self._lock_file = None
@@ -1,31 +1,129 @@
 """Vector database collection management utilities."""
 
-from datetime import datetime
-from knowledge.curator.vector.adapter import QdrantAdapter
+from knowledge.curator.vector.adapter import build_payload
+from knowledge.curator.vector.adapter import chunk_key
+from knowledge.curator.vector.adapter import point_id_for_payload
+from knowledge.curator.vector.backup import BackupReader
+from knowledge.curator.vector.backup import BackupWriter
+from knowledge.curator.vector.backup import DEFAULT_BLOCK_SIZE
+from knowledge.curator.vector.backup import is_stream_backup
+from knowledge.curator.vector.benchmark import benchmark_embedding_backends
+from knowledge.curator.vector.benchmark import BENCHMARK_SETTINGS
+from knowledge.curator.vector.benchmark import IndexBenchmark
+from knowledge.curator.vector.cache import get_embedding_cache
+from knowledge.curator.vector.config import CHUNKED_CONTENT_TYPES
+from knowledge.curator.vector.config import EMBEDDING_MODELS
 from knowledge.curator.vector.config import get_vector_config
-from knowledge.curator.vector.embeddings import EmbeddingGenerator
+from knowledge.curator.vector.config import set_active_embedding_model
+from knowledge.curator.vector.config import SUPPORTED_CONTENT_TYPES
+from knowledge.curator.vector.embeddings import EMBEDDING_BACKENDS
+from knowledge.curator.vector.pool import get_component_pool
+from knowledge.curator.vector.queries import get_query_embedder
+from knowledge.curator.vector.rebuild import RebuildPipeline
+from knowledge.curator.vector.reconcile import VectorReconciler
 from plone import api
-from Products.CMFCore.utils import getToolByName
 from typing import Any
-import logging
 import json
+import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
 
+def content_document(content_object) -> dict[str, Any]:
+    """Build the vector payload document for a content object."""
+    return {
+        "uid": content_object.UID(),
+        "path": "/".join(content_object.getPhysicalPath()),
+        "title": content_object.Title(),
+        "description": content_object.Description(),
+        "content_type": content_object.portal_type,
+        "workflow_state": api.content.get_state(content_object),
+        "modified": content_object.modified().ISO8601(),
+        "url": content_object.absolute_url(),
+        "created": content_object.created().ISO8601(),
+        "creator": content_object.Creator(),
+        "tags": getattr(content_object, "tags", []),
+        "knowledge_type": getattr(content_object, "knowledge_type", None),
+    }
+
+
 class VectorCollectionManager:
     """Manage vector database collections and operations."""
 
-    def __init__(self):
+    def __init__(self, config: dict[str, Any] | None = None):
         """Initialize manager components."""
-        config = get_vector_config()
-        self.adapter = QdrantAdapter(
-            host=config["qdrant_host"],
-            port=config["qdrant_port"],
-            api_key=config.get("qdrant_api_key"),
-            https=config.get("qdrant_https", False),
+        config = config or get_vector_config()
+        self.config = config
+        pool = get_component_pool()
+        self.adapter = pool.adapter(config)
+        self.embeddings = pool.embedding_generator(config["embedding_model"], config)
+        self.embedding_batch_size = config.get("embedding_batch_size", 32)
+        self.cache = get_embedding_cache(
+            config["embedding_model"],
+            max_entries=config.get("embedding_cache_size", 10000),
+            directory=config.get("embedding_cache_dir"),
+            variant=self.embeddings.variant,
         )
-        self.embeddings = EmbeddingGenerator(config["embedding_model"])
+
+    def embed_text(self, text: str) -> list[float]:
+        """Embed a single text, consulting the embedding cache first."""
+        embedding = self.cache.get(text)
+        if embedding is None:
+            embedding = self.embeddings.generate_embedding(text)
+            self.cache.put(text, embedding)
+        return embedding
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Embed several texts, sending only cache misses to the model."""
+        embeddings = self.cache.get_many(texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            generated = self.embeddings.generate_embeddings(
+                [texts[i] for i in missing], batch_size=self.embedding_batch_size
+            )
+            for i, embedding in zip(missing, generated, strict=True):
+                self.cache.put(texts[i], embedding)
+                embeddings[i] = embedding
+        return embeddings
+
+    def chunk_document(self, document: dict[str, Any], text: str) -> list[str]:
+        """Return the texts a document is embedded as; more than one if chunked."""
+        if (
+            not self.config.get("chunking")
+            or document.get("content_type") not in CHUNKED_CONTENT_TYPES
+        ):
+            return [text]
+        return self.embeddings.chunk_text(
+            text,
+            window=self.config.get("chunk_tokens"),
+            overlap=self.config.get("chunk_overlap", 32),
+            max_chunks=self.config.get("max_chunks", 16),
+        )
+
+    def embed_documents(
+        self, documents: list[dict[str, Any]], texts: list[str]
+    ) -> tuple[list[str], list[list[float]], list[dict[str, Any]]]:
+        """Embed documents as points for ``upsert_many``.
+
+        Long texts of chunked content types become one point per chunk; the
+        chunks share the document's payload (and so its ``uid``) and record
+        their position in ``chunk`` and ``chunks``. The chunks of all
+        documents are embedded in one batched call.
+
+        Returns the point keys, vectors and payloads.
+        """
+        keys = []
+        chunk_texts = []
+        payloads = []
+        for document, text in zip(documents, texts, strict=True):
+            chunks = self.chunk_document(document, text)
+            payload = build_payload(document)
+            for index, chunk in enumerate(chunks):
+                keys.append(chunk_key(document["uid"], index))
+                chunk_texts.append(chunk)
+                payloads.append({**payload, "chunk": index, "chunks": len(chunks)})
+        return keys, self.embed_texts(chunk_texts), payloads
 
     def initialize_database(self) -> bool:
         """Initialize the vector database with proper configuration."""
@@ -46,129 +144,175 @@ class VectorCollectionManager:
         content_types: list[str] | None = None,
         batch_size: int = 100,
         clear_first: bool = True,
+        resume: bool = True,
+        keep_previous: bool = False,
     ) -> dict[str, Any]:
-        """Rebuild the entire vector index."""
+        """Rebuild the entire vector index.
+
+        With ``clear_first`` the index is built into a new collection and the
+        alias is swapped once it is complete, so search keeps answering from
+        the old index meanwhile. Otherwise content is upserted in place. An
+        interrupted rebuild resumes from its checkpoint unless ``resume`` is
+        False.
+        """
         try:
-            start_time = datetime.now()
-
-            # Clear collection if requested
-            if clear_first:
-                self.adapter.clear_collection()
-
-            # Get all relevant content
-            if content_types is None:
-                content_types = [
-                    "BookmarkPlus",
-                    "ResearchNote",
-                    "LearningGoal",
-                    "ProjectLog",
-                ]
+            pipeline = RebuildPipeline(
+                self,
+                batch_size=batch_size,
+                max_inflight=self.config.get("rebuild_max_inflight", 4),
+                checkpoint_path=self.config.get("rebuild_checkpoint_path"),
+            )
+            result = pipeline.run(
+                content_types=content_types,
+                shadow=clear_first,
+                resume=resume,
+                keep_previous=keep_previous,
+            )
+            logger.info(f"Index rebuild completed: {result}")
+            return result
 
-            query = {
-                "portal_type": content_types,
-                "review_state": ["private", "process", "reviewed", "published"],
-            }
+        except Exception as e:
+            logger.error(f"Index rebuild failed: {e}")
+            return {"success": False, "error": str(e)}
 
-            catalog = getToolByName(api.portal.get(), "portal_catalog")
-            brains = catalog.searchResults(**query)
-            total_items = len(brains)
+    def reconcile(
+        self,
+        content_types: list[str] | None = None,
+        dry_run: bool = False,
+        batch_size: int = 100,
+    ) -> dict[str, Any]:
+        """Re-embed or delete only the vectors that drifted from the catalog.
 
-            logger.info(f"Found {total_items} items to index")
+        See ``knowledge.curator.vector.reconcile``. With ``dry_run`` the
+        differences are reported but not fixed.
+        """
+        try:
+            return VectorReconciler(self, batch_size=batch_size).run(
+                content_types=content_types, dry_run=dry_run
+            )
+        except Exception as e:
+            logger.error(f"Vector reconciliation failed: {e}")
+            return {"success": False, "error": str(e)}
 
-            # Process in batches
-            processed = 0
-            errors = 0
-            batch_documents = []
-            batch_texts = []
+    def benchmark_index_settings(
+        self,
+        names: list[str] | None = None,
+        queries: int = 100,
+        limit: int = 10,
+        progress=None,
+    ) -> dict[str, Any]:
+        """Measure recall, latency and memory of index settings.
 
-            for brain in brains:
-                try:
-                    obj = brain.getObject()
-
-                    # Prepare document metadata
-                    doc = {
-                        "uid": brain.UID,
-                        "path": brain.getPath(),
-                        "title": brain.Title,
-                        "description": brain.Description,
-                        "content_type": brain.portal_type,
-                        "workflow_state": brain.review_state,
-                        "modified": brain.modified.ISO8601(),
-                        "tags": getattr(obj, "tags", []),
-                        "knowledge_type": getattr(obj, "knowledge_type", None),
-                    }
-
-                    # Prepare text for embedding
-                    text = self.embeddings.prepare_content_text(obj)
-
-                    batch_documents.append(doc)
-                    batch_texts.append(text)
-
-                    # Process batch when full
-                    if len(batch_documents) >= batch_size:
-                        embeddings = self.embeddings.generate_embeddings(
-                            batch_texts, batch_size=32
-                        )
-                        self.adapter.add_vectors(
-                            batch_documents, embeddings, batch_size
-                        )
-
-                        processed += len(batch_documents)
-                        logger.info(f"Processed {processed}/{total_items} items")
-
-                        batch_documents = []
-                        batch_texts = []
-
-                except Exception as e:
-                    logger.error(f"Error processing {brain.getPath()}: {e}")
-                    errors += 1
-
-            # Process remaining items
-            if batch_documents:
-                embeddings = self.embeddings.generate_embeddings(
-                    batch_texts, batch_size=32
-                )
-                self.adapter.add_vectors(batch_documents, embeddings, batch_size)
-                processed += len(batch_documents)
+        See ``knowledge.curator.vector.benchmark``. ``names`` selects from
+        ``BENCHMARK_SETTINGS``; the collection itself is left untouched.
+        """
+        try:
+            settings = BENCHMARK_SETTINGS
+            if names:
+                unknown = set(names) - set(settings)
+                if unknown:
+                    raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+                settings = {name: settings[name] for name in names}
+            benchmark = IndexBenchmark(
+                self.adapter, queries=queries, limit=limit, progress=progress
+            )
+            return {"success": True, "results": benchmark.run(settings)}
+        except Exception as e:
+            logger.error(f"Index benchmark failed: {e}")
+            return {"success": False, "error": str(e)}
 
-            end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds()
+    def benchmark_embeddings(
+        self,
+        backends: list[str] | None = None,
+        sample_size: int = 500,
+        progress=None,
+    ) -> dict[str, Any]:
+        """Compare the embedding backends on the text of indexed content.
 
-            result = {
+        See ``benchmark_embedding_backends``; the first backend is the
+        reference the others are compared with.
+        """
+        try:
+            backends = backends or list(EMBEDDING_BACKENDS)
+            unknown = set(backends) - set(EMBEDDING_BACKENDS)
+            if unknown:
+                raise ValueError(f"Unknown backends: {', '.join(sorted(unknown))}")
+            catalog = api.portal.get_tool("portal_catalog")
+            texts = []
+            for brain in catalog.unrestrictedSearchResults(
+                portal_type=SUPPORTED_CONTENT_TYPES
+            )[:sample_size]:
+                text = self.embeddings.prepare_content_text(
+                    brain._unrestrictedGetObject()
+                )
+                if text:
+                    texts.append(text)
+            if not texts:
+                raise ValueError("No content to embed")
+
+            results = benchmark_embedding_backends(
+                self.embeddings.model_name,
+                texts,
+                backends,
+                batch_size=self.embedding_batch_size,
+                onnx_dir=self.config.get("onnx_model_dir"),
+                progress=progress,
+            )
+            return {
                 "success": True,
-                "total_items": total_items,
-                "processed": processed,
-                "errors": errors,
-                "duration_seconds": duration,
-                "items_per_second": processed / duration if duration > 0 else 0,
+                "model": self.embeddings.model_name,
+                "texts": len(texts),
+                "results": results,
             }
-
-            logger.info(f"Index rebuild completed: {result}")
-            return result
-
         except Exception as e:
-            logger.error(f"Index rebuild failed: {e}")
+            logger.error(f"Embedding benchmark failed: {e}")
             return {"success": False, "error": str(e)}
 
+    def migrate_model(
+        self,
+        model_name: str,
+        content_types: list[str] | None = None,
+        batch_size: int = 100,
+        resume: bool = True,
+        keep_previous: bool = True,
+    ) -> dict[str, Any]:
+        """Re-embed all content with another model and switch to it.
+
+        The new vectors go into a ``plone_knowledge__<model>__v<n>`` collection
+        while queries keep being answered from the current one. Once it is
+        complete the alias is flipped and the model is recorded as active, so
+        that queries are embedded with it from then on. The previous
+        collection is kept for rollback unless ``keep_previous`` is False.
+        The caller must commit the transaction.
+        """
+        if model_name not in EMBEDDING_MODELS:
+            logger.warning(f"Migrating to unlisted embedding model {model_name}")
+
+        target = VectorCollectionManager(dict(self.config, embedding_model=model_name))
+        result = target.rebuild_index(
+            content_types=content_types,
+            batch_size=batch_size,
+            clear_first=True,
+            resume=resume,
+            keep_previous=keep_previous,
+        )
+        result["model"] = model_name
+        if result["success"]:
+            set_active_embedding_model(model_name)
+            logger.info(f"Switched embedding model to {model_name}")
+        return result
+
     def update_content_vector(self, content_object) -> bool:
         """Update vector for a single content object."""
         try:
             # Prepare document metadata
-            doc = {
-                "uid": content_object.UID(),
-                "path": "/".join(content_object.getPhysicalPath()),
-                "title": content_object.Title(),
-                "description": content_object.Description(),
-                "content_type": content_object.portal_type,
-                "workflow_state": api.content.get_state(content_object),
-                "modified": content_object.modified().ISO8601(),
-                "tags": getattr(content_object, "tags", []),
-                "knowledge_type": getattr(content_object, "knowledge_type", None),
-            }
+            doc = content_document(content_object)
 
             # Generate embedding
             text = self.embeddings.prepare_content_text(content_object)
-            embedding = self.embeddings.generate_embedding(text)
+            if self.config.get("chunking"):
+                return self.apply_changes([doc], [text])["success"]
+            embedding = self.embed_text(text)
 
             # Update vector
             return self.adapter.update_vector(content_object.UID(), embedding, doc)
@@ -177,6 +321,46 @@ class VectorCollectionManager:
             logger.error(f"Failed to update content vector: {e}")
             return False
 
+    def apply_changes(
+        self,
+        documents: list[dict[str, Any]],
+        texts: list[str],
+        delete_uids: list[str] | None = None,
+    ) -> dict[str, Any]:
+        """Embed and upsert documents and delete UIDs in as few calls as possible.
+
+        All texts go through one batched embedding call (cache misses only),
+        all documents through one upsert and all deletions through one delete.
+        With chunking enabled, chunks left over from a longer earlier version
+        of a document are removed first.
+        """
+        result = {"indexed": 0, "deleted": 0, "success": True}
+        chunking = self.config.get("chunking")
+        try:
+            if documents:
+                keys, embeddings, payloads = self.embed_documents(documents, texts)
+                if chunking:
+                    self.adapter.delete_chunks([doc["uid"] for doc in documents])
+                if self.adapter.upsert_many(keys, embeddings, payloads):
+                    result["indexed"] = len(documents)
+                else:
+                    result["success"] = False
+
+            if delete_uids:
+                if chunking:
+                    self.adapter.delete_chunks(delete_uids)
+                if self.adapter.delete_many(delete_uids):
+                    result["deleted"] = len(delete_uids)
+                else:
+                    result["success"] = False
+
+        except Exception as e:
+            logger.error(f"Failed to apply vector changes: {e}")
+            result["success"] = False
+            result["error"] = str(e)
+
+        return result
+
     def delete_content_vector(self, uid: str) -> bool:
         """Delete vector for a content object."""
         try:
@@ -190,36 +374,31 @@ class VectorCollectionManager:
         try:
             info = self.adapter.get_collection_info()
 
-            # Get content type distribution
-            all_points = []
-            offset = None
-            while True:
-                batch, next_offset = self.adapter.client.scroll(
-                    collection_name=self.adapter.collection_name,
-                    limit=100,
-                    offset=offset,
-                )
-                all_points.extend(batch)
-                if next_offset is None:
-                    break
-                offset = next_offset
-
-            # Count by content type
+            # Count by content type, one page of payloads at a time
             type_counts = {}
             state_counts = {}
+            total_vectors = 0
 
-            for point in all_points:
-                content_type = point.payload.get("content_type", "unknown")
-                type_counts[content_type] = type_counts.get(content_type, 0) + 1
+            for batch in self.adapter.scroll_points(
+                batch_size=1000,
+                with_payload=["content_type", "workflow_state", "chunk"],
+            ):
+                total_vectors += len(batch)
+                for point in batch:
+                    payload = point.payload or {}
+                    if payload.get("chunk"):
+                        continue  # Count each chunked document once
+                    content_type = payload.get("content_type", "unknown")
+                    type_counts[content_type] = type_counts.get(content_type, 0) + 1
 
-                state = point.payload.get("workflow_state", "unknown")
-                state_counts[state] = state_counts.get(state, 0) + 1
+                    state = payload.get("workflow_state", "unknown")
+                    state_counts[state] = state_counts.get(state, 0) + 1
 
             stats = {
                 "collection_info": info,
                 "content_type_distribution": type_counts,
                 "workflow_state_distribution": state_counts,
-                "total_vectors": len(all_points),
+                "total_vectors": total_vectors,
             }
 
             return stats
@@ -275,91 +454,132 @@ class VectorCollectionManager:
                 "exists": collection_exists,
                 "name": self.adapter.collection_name,
             },
+            "cache": self.cache.stats(),
+            "query_cache": get_query_embedder(self.embeddings, self.config).stats(),
         }
 
-    def backup_vectors(self, backup_path: str) -> bool:
-        """Backup vector data to a file."""
+    def backup_vectors(
+        self,
+        backup_path: str,
+        dtype: str = "float32",
+        compression: str = "gzip",
+        block_size: int = DEFAULT_BLOCK_SIZE,
+    ) -> bool:
+        """Stream all points into a backup directory.
+
+        Payloads are written as NDJSON and vectors as a raw ``dtype`` blob,
+        both compressed block by block, see ``knowledge.curator.vector.backup``.
+        Only one page of points is held in memory.
+        """
         try:
-            # Get all vectors with metadata
-            all_points = []
-            offset = None
-
-            while True:
-                batch, next_offset = self.adapter.client.scroll(
-                    collection_name=self.adapter.collection_name,
-                    limit=100,
-                    offset=offset,
-                    with_vectors=True,
-                )
-
-                for point in batch:
-                    all_points.append({
-                        "id": point.id,
-                        "vector": point.vector,
-                        "payload": point.payload,
-                    })
-
-                if next_offset is None:
-                    break
-                offset = next_offset
-
-            # Save to file
-            backup_data = {
-                "timestamp": datetime.now().isoformat(),
+            metadata = {
                 "collection_name": self.adapter.collection_name,
-                "vector_dimension": self.embeddings.embedding_dimension,
-                "total_points": len(all_points),
-                "points": all_points,
+                "embedding_model": self.embeddings.model_name,
             }
-
-            with open(backup_path, "w") as f:
-                json.dump(backup_data, f)
-
-            logger.info(f"Backed up {len(all_points)} vectors to {backup_path}")
+            with BackupWriter(
+                backup_path,
+                metadata,
+                self.embeddings.embedding_dimension,
+                dtype=dtype,
+                compression=compression,
+                block_size=block_size,
+            ) as writer:
+                for batch in self.adapter.scroll_points(
+                    batch_size=block_size, with_vectors=True
+                ):
+                    for point in batch:
+                        writer.write(point.id, point.vector, point.payload)
+
+            total = writer.manifest["total_points"]
+            logger.info(f"Backed up {total} vectors to {backup_path}")
             return True
 
         except Exception as e:
             logger.error(f"Failed to backup vectors: {e}")
             return False
 
-    def restore_vectors(self, backup_path: str) -> bool:
-        """Restore vector data from a backup file."""
+    def restore_vectors(self, backup_path: str, batch_size: int = 100) -> bool:
+        """Restore vector data from a backup.
+
+        The backup is loaded into a new versioned collection block by block
+        and the alias is swapped once it is complete. Points are stored under
+        the IDs derived from their UID and chunk, so random IDs of points
+        from before UID-based IDs do not survive the restore. A backup made
+        with another embedding model makes that model the active one.
+        Single-file JSON backups of earlier versions are still accepted.
+        If the restore fails, the new collection is dropped again and the
+        live one is left untouched.
+        """
+        # Set once the new collection exists and until the alias points to it
+        unfinished = None
         try:
-            # Load backup data
-            with open(backup_path) as f:
-                backup_data = json.load(f)
-
-            # Verify compatibility
-            if backup_data["vector_dimension"] != self.embeddings.embedding_dimension:
+            if is_stream_backup(backup_path):
+                reader = BackupReader(backup_path)
+                metadata = reader.manifest
+                blocks = reader.blocks()
+            else:
+                with open(backup_path) as f:
+                    metadata = json.load(f)
+                blocks = legacy_backup_blocks(metadata.pop("points"))
+
+            # Backups without a model name can only be checked by dimension
+            model_name = metadata.get("embedding_model", self.embeddings.model_name)
+            dimension = metadata["vector_dimension"]
+            if (
+                model_name == self.embeddings.model_name
+                and dimension != self.embeddings.embedding_dimension
+            ):
                 logger.error(
-                    f"Dimension mismatch: backup has "
-                    f"{backup_data['vector_dimension']}, "
+                    f"Dimension mismatch: backup has {dimension}, "
                     f"current model has {self.embeddings.embedding_dimension}"
                 )
                 return False
 
-            # Clear existing data
-            self.adapter.clear_collection()
-
-            # Restore points in batches
-            points = backup_data["points"]
-            batch_size = 100
+            collection = self.adapter.next_collection_name(model_name)
+            target = self.adapter.for_collection(collection)
+            target.create_collection(collection, dimension)
+            unfinished = collection
 
-            for i in range(0, len(points), batch_size):
-                batch = points[i : i + batch_size]
-
-                documents = []
-                embeddings = []
-
-                for point in batch:
-                    documents.append(point["payload"])
-                    embeddings.append(point["vector"])
-
-                self.adapter.add_vectors(documents, embeddings, batch_size)
-
-            logger.info(f"Restored {len(points)} vectors from {backup_path}")
+            restored = 0
+            for ids, vectors, payloads in blocks:
+                ids = [
+                    point_id_for_payload(payload, point_id)
+                    for point_id, payload in zip(ids, payloads, strict=True)
+                ]
+                vectors = vectors.tolist()
+                if not target.upsert_points(ids, vectors, payloads, batch_size):
+                    raise RuntimeError(f"Failed to write block at point {restored}")
+                restored += len(ids)
+
+            previous = self.adapter.swap_alias(collection)
+            unfinished = None
+            if previous and previous != collection:
+                self.adapter.client.delete_collection(previous)
+            if model_name != self.embeddings.model_name:
+                set_active_embedding_model(model_name)
+
+            logger.info(f"Restored {restored} vectors from {backup_path}")
             return True
 
         except Exception as e:
             logger.error(f"Failed to restore vectors: {e}")
+            if unfinished:
+                try:
+                    self.adapter.client.delete_collection(unfinished)
+                except Exception as cleanup_error:
+                    logger.error(
+                        f"Failed to drop unfinished collection {unfinished}: "
+                        f"{cleanup_error}"
+                    )
             return False
+
+
+def legacy_backup_blocks(points: list[dict[str, Any]], block_size: int = 1000):
+    """Yield the points of a single-file JSON backup like ``BackupReader``."""
+    for start in range(0, len(points), block_size):
+        block = points[start : start + block_size]
+        yield (
+            [point["id"] for point in block],
+            np.array([point["vector"] for point in block], dtype=np.float32),
+            [point["payload"] for point in block],
+        )
@@ -0,0 +1,165 @@
+"""In-process NumPy similarity index over content ``embedding_vector`` values.
+
+Used by the search and knowledge graph APIs when Qdrant cannot be reached.
+The matrix is built once per state of the indexed content, not on every
+request; a query is then a single matrix-vector product followed by
+``argpartition`` for the top k.
+
+The state is read from the catalog: the number of items of the indexed
+types and the newest modification among them. Commits that touch other
+content (or none at all) keep the matrix, and only one thread rebuilds it
+when the content did change.
+"""
+
+from plone import api
+from typing import Any
+import logging
+import numpy as np
+import threading
+
+
+logger = logging.getLogger("knowledge.curator.vector")
+
+_matrices: dict[tuple, tuple[Any, "EmbeddingMatrix"]] = {}
+_matrices_lock = threading.Lock()
+# Held while building, so concurrent requests wait for one rebuild
+_build_lock = threading.Lock()
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length so dot products are cosine similarities."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the indices of the k highest scores, best first."""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class EmbeddingMatrix:
+    """Normalized float32 embeddings of one dimension with their UIDs."""
+
+    def __init__(self, uids: list[str], vectors: np.ndarray):
+        self.uids = list(uids)
+        self.rows = {uid: row for row, uid in enumerate(self.uids)}
+        self.vectors = normalize_rows(vectors)
+
+    @property
+    def dimension(self) -> int:
+        return self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    def __len__(self):
+        return len(self.uids)
+
+    def search(
+        self,
+        query_vector,
+        limit: int = 10,
+        score_threshold: float = 0.0,
+        allowed_uids=None,
+        exclude_uids=(),
+    ) -> list[tuple[str, float]]:
+        """Return (uid, score) pairs for the most similar rows.
+
+        ``allowed_uids`` restricts the candidates (e.g. to the UIDs a catalog
+        query returned for the current user); ``exclude_uids`` removes some.
+        """
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32))
+        if not len(self) or query.shape[-1] != self.dimension:
+            return []
+
+        scores = self.vectors @ query
+        if allowed_uids is not None:
+            mask = np.zeros(len(self), dtype=bool)
+            mask[[self.rows[uid] for uid in allowed_uids if uid in self.rows]] = True
+        else:
+            mask = np.ones(len(self), dtype=bool)
+        for uid in exclude_uids:
+            row = self.rows.get(uid)
+            if row is not None:
+                mask[row] = False
+        mask &= scores >= score_threshold
+        scores = np.where(mask, scores, -np.inf)
+
+        hits = top_k(scores, min(limit, int(mask.sum())))
+        return [(self.uids[row], float(scores[row])) for row in hits]
+
+
+def build_embedding_matrix(portal_types: list[str]) -> EmbeddingMatrix:
+    """Load ``embedding_vector`` of all content of the given types.
+
+    Content is read unrestricted; callers must limit results to what the
+    current user may see via ``allowed_uids``. When vectors of several
+    dimensions exist the most common dimension is used.
+    """
+    catalog = api.portal.get_tool("portal_catalog")
+    by_dimension: dict[int, tuple[list[str], list]] = {}
+    for brain in catalog.unrestrictedSearchResults(portal_type=portal_types):
+        try:
+            vector = getattr(brain._unrestrictedGetObject(), "embedding_vector", None)
+        except Exception as e:
+            logger.warning(f"Could not load embedding of {brain.getPath()}: {e}")
+            continue
+        if vector:
+            uids, vectors = by_dimension.setdefault(len(vector), ([], []))
+            uids.append(brain.UID)
+            vectors.append(vector)
+
+    if not by_dimension:
+        return EmbeddingMatrix([], np.empty((0, 0), dtype=np.float32))
+    uids, vectors = max(by_dimension.values(), key=lambda item: len(item[0]))
+    return EmbeddingMatrix(uids, np.array(vectors, dtype=np.float32))
+
+
+def content_version(portal_types: list[str]) -> tuple:
+    """Return a catalog fingerprint that changes with content of the types.
+
+    Adding or removing an item changes the count, editing one (which
+    re-embeds it) the newest modification.
+    """
+    catalog = api.portal.get_tool("portal_catalog")
+    results = catalog.unrestrictedSearchResults(
+        portal_type=portal_types,
+        sort_on="modified",
+        sort_order="descending",
+        sort_limit=1,
+    )
+    count = getattr(results, "actual_result_count", None)
+    if count is None:
+        count = len(results)
+    if not count:
+        return (0, None, None)
+    newest = results[0]
+    return (count, newest.UID, str(newest.modified))
+
+
+def get_embedding_matrix(portal_types: list[str]) -> EmbeddingMatrix:
+    """Return the cached matrix for the types, rebuilding it after changes."""
+    types = tuple(sorted(portal_types))
+    key = ("/".join(api.portal.get().getPhysicalPath()), types)
+    version = content_version(list(types))
+    with _matrices_lock:
+        cached = _matrices.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    with _build_lock:
+        # Another thread may have rebuilt it while we waited
+        with _matrices_lock:
+            cached = _matrices.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        matrix = build_embedding_matrix(list(types))
+        with _matrices_lock:
+            _matrices[key] = (version, matrix)
+    logger.info(f"Built in-process embedding matrix with {len(matrix)} rows")
+    return matrix
@@ -0,0 +1,149 @@
+"""Process-wide pool of embedding models and Qdrant clients.
+
+SentenceTransformer models are large (~90MB for MiniLM, ~420MB for mpnet)
+and slow to load, so every vector entry point resolves its embedding
+generator and Qdrant client through a single registered utility instead of
+constructing its own.
+"""
+
+from knowledge.curator.vector.adapter import index_settings
+from knowledge.curator.vector.adapter import QdrantAdapter
+from knowledge.curator.vector.config import get_vector_config
+from knowledge.curator.vector.embeddings import EmbeddingGenerator
+from knowledge.curator.vector.interfaces import IVectorComponentPool
+from knowledge.curator.vector.local import LocalVectorClient
+from qdrant_client import QdrantClient
+from typing import Any
+from zope.component import queryUtility
+from zope.interface import implementer
+import logging
+import threading
+
+
+logger = logging.getLogger("knowledge.curator.vector")
+
+
+@implementer(IVectorComponentPool)
+class VectorComponentPool:
+    """Own one embedding generator per model and one client per Qdrant host."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generators: dict[tuple[str, str], EmbeddingGenerator] = {}
+        self._clients: dict[tuple, QdrantClient] = {}
+        self._local_clients: dict[str | None, LocalVectorClient] = {}
+
+    def embedding_generator(
+        self, model_name: str | None = None, config: dict[str, Any] | None = None
+    ) -> EmbeddingGenerator:
+        """Return the shared embedding generator for a model.
+
+        The model defaults to the configured ``embedding_model``; the
+        inference backend is the configured ``embedding_backend``.
+        """
+        config = config or get_vector_config()
+        model_name = model_name or config["embedding_model"]
+        backend = config.get("embedding_backend", "torch")
+        key = (model_name, backend)
+        with self._lock:
+            generator = self._generators.get(key)
+            if generator is None:
+                generator = EmbeddingGenerator(
+                    model_name,
+                    backend=backend,
+                    onnx_dir=config.get("onnx_model_dir"),
+                    onnx_file_name=config.get("onnx_file_name"),
+                    chunking=bool(config.get("chunking")),
+                )
+                self._generators[key] = generator
+            return generator
+
+    def qdrant_client(
+        self,
+        host: str,
+        port: int,
+        api_key: str | None = None,
+        https: bool = False,
+    ) -> QdrantClient:
+        """Return the pooled Qdrant client for a connection."""
+        key = (host, port, api_key, https)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = QdrantClient(
+                    host=host, port=port, api_key=api_key, https=https
+                )
+                self._clients[key] = client
+            return client
+
+    def local_client(self, path: str | None = None) -> LocalVectorClient:
+        """Return the pooled in-process vector client for a directory."""
+        with self._lock:
+            client = self._local_clients.get(path)
+            if client is None:
+                client = LocalVectorClient(path)
+                self._local_clients[path] = client
+            return client
+
+    def adapter(self, config: dict[str, Any] | None = None) -> QdrantAdapter:
+        """Return an adapter on the pooled client of the configured engine."""
+        config = config or get_vector_config()
+        if config.get("vector_engine") == "local":
+            client = self.local_client(config.get("local_vector_path"))
+        else:
+            client = self.qdrant_client(
+                config["qdrant_host"],
+                config["qdrant_port"],
+                api_key=config.get("qdrant_api_key"),
+                https=config.get("qdrant_https", False),
+            )
+        adapter = QdrantAdapter(client=client)
+        adapter.chunked = bool(config.get("chunking"))
+        adapter.index_settings = index_settings(config)
+        return adapter
+
+    def warmup(self, config: dict[str, Any] | None = None):
+        """Load the configured model and open the Qdrant client."""
+        config = config or get_vector_config()
+        generator = self.embedding_generator(config["embedding_model"], config)
+        _ = generator.model
+        self.adapter(config)
+        logger.info(f"Warmed up vector components for {config['embedding_model']}")
+
+    def stats(self) -> dict[str, Any]:
+        """Describe what is currently pooled."""
+        with self._lock:
+            return {
+                "models": sorted(
+                    f"{name} ({backend})"
+                    for (name, backend), generator in self._generators.items()
+                    if generator.is_loaded
+                ),
+                "qdrant_clients": len(self._clients),
+                "local_clients": len(self._local_clients),
+            }
+
+
+# Registered as the IVectorComponentPool utility in configure.zcml and used
+# directly when the component registry is not available
+component_pool = VectorComponentPool()
+
+
+def get_component_pool() -> VectorComponentPool:
+    """Return the registered component pool, or the process default."""
+    return queryUtility(IVectorComponentPool) or component_pool
+
+
+def warmup_on_startup(event):
+    """Warm up vector components in the background when Zope starts."""
+    config = get_vector_config()
+    if not config.get("warmup_on_startup"):
+        return
+
+    def _warmup():
+        try:
+            get_component_pool().warmup(config)
+        except Exception as e:
+            logger.warning(f"Vector component warmup failed: {e}")
+
+    threading.Thread(target=_warmup, name="vector-warmup", daemon=True).start()
@@ -0,0 +1,183 @@
+"""Per-user preference vectors for recommendations.
+
+A profile is an exponentially decayed running mean of the embeddings of the
+content a user created, edited or reviewed. Each interaction moves the
+profile towards the item's embedding by ``decay * weight``, so recent work
+dominates and old interests fade out without keeping any history.
+
+Profiles are stored on the portal in an ``OOBTree`` keyed by user id. A
+value is a ``(model name, float32 bytes, updated timestamp)`` tuple, which
+keeps each entry at 4 bytes per dimension plus a small pickle header. The
+UIDs a user interacted with are kept next to it, in an ``OOTreeSet`` per
+user, so recommendations can leave them out by looking up the UIDs of
+their hits.
+
+Interactions are collected by the indexing queue and applied after the
+embeddings were computed, in their own transaction, see
+``store_profile_updates``.
+"""
+
+from BTrees.OOBTree import OOBTree
+from BTrees.OOBTree import OOTreeSet
+from plone import api
+from typing import Any
+from ZODB.POSException import ConflictError
+from zope.annotation.interfaces import IAnnotations
+import logging
+import numpy as np
+import time
+import transaction
+
+
+logger = logging.getLogger("knowledge.curator.vector")
+
+PROFILES_ANNOTATION_KEY = "knowledge.curator.vector.profiles"
+INTERACTIONS_ANNOTATION_KEY = "knowledge.curator.vector.profile_interactions"
+
+# How much a single interaction of each kind counts, relative to a creation
+INTERACTION_WEIGHTS = {"create": 1.0, "edit": 0.5, "review": 0.5}
+
+
+def pack_vector(vector) -> bytes:
+    """Serialize a vector as little-endian float32 bytes."""
+    return np.asarray(vector, dtype="<f4").tobytes()
+
+
+def unpack_vector(data: bytes) -> np.ndarray:
+    """Deserialize a vector stored by ``pack_vector``."""
+    return np.frombuffer(data, dtype="<f4")
+
+
+def decayed_mean(profile, vector, rate: float) -> np.ndarray:
+    """Move a unit-length profile towards a vector by ``rate``."""
+    vector = np.asarray(vector, dtype=np.float32)
+    vector = vector / (np.linalg.norm(vector) or 1.0)
+    if profile is None or profile.shape != vector.shape:
+        return vector
+    rate = min(max(rate, 0.0), 1.0)
+    updated = (1.0 - rate) * profile + rate * vector
+    return updated / (np.linalg.norm(updated) or 1.0)
+
+
+class UserProfiles:
+    """Preference vectors of all users of a site."""
+
+    def __init__(self, context=None, decay: float = 0.2):
+        """Initialize profile storage.
+
+        Args:
+            context: Plone context (defaults to portal)
+            decay: Share of the profile replaced by an interaction of weight 1
+        """
+        self.context = context or api.portal.get()
+        self.decay = decay
+
+    def _storage(
+        self, create: bool = False, key: str = PROFILES_ANNOTATION_KEY
+    ) -> OOBTree | None:
+        annotations = IAnnotations(self.context)
+        storage = annotations.get(key)
+        if storage is None and create:
+            storage = annotations[key] = OOBTree()
+        return storage
+
+    def get(self, user_id: str, model_name: str) -> np.ndarray | None:
+        """Return the user's profile vector, or None if there is none yet.
+
+        Profiles built with another embedding model are ignored.
+        """
+        storage = self._storage()
+        entry = storage.get(user_id) if storage is not None else None
+        if entry is None or entry[0] != model_name:
+            return None
+        return unpack_vector(entry[1])
+
+    def update(
+        self,
+        user_id: str,
+        vector,
+        model_name: str,
+        weight: float = 1.0,
+        uid: str | None = None,
+    ) -> np.ndarray:
+        """Fold one interaction into the user's profile and store it.
+
+        ``uid`` names the content interacted with; it is remembered so that
+        recommendations leave it out.
+        """
+        profile = decayed_mean(
+            self.get(user_id, model_name), vector, self.decay * weight
+        )
+        self._storage(create=True)[user_id] = (
+            model_name,
+            pack_vector(profile),
+            time.time(),
+        )
+        if uid:
+            interactions = self._storage(True, INTERACTIONS_ANNOTATION_KEY)
+            if user_id not in interactions:
+                interactions[user_id] = OOTreeSet()
+            interactions[user_id].add(uid)
+        return profile
+
+    def interacted(self, user_id: str) -> list[str]:
+        """Return the UIDs the user created, edited or reviewed."""
+        storage = self._storage(key=INTERACTIONS_ANNOTATION_KEY)
+        if storage is None or user_id not in storage:
+            return []
+        return list(storage[user_id])
+
+    def interacted_among(self, user_id: str, uids) -> set[str]:
+        """Return the subset of ``uids`` the user created, edited or reviewed.
+
+        Looks each UID up in the user's set instead of loading all of it.
+        """
+        storage = self._storage(key=INTERACTIONS_ANNOTATION_KEY)
+        if storage is None or user_id not in storage:
+            return set()
+        interactions = storage[user_id]
+        return {uid for uid in uids if uid in interactions}
+
+    def remove(self, user_id: str):
+        """Forget a user's profile."""
+        for key in (PROFILES_ANNOTATION_KEY, INTERACTIONS_ANNOTATION_KEY):
+            storage = self._storage(key=key)
+            if storage is not None and user_id in storage:
+                del storage[user_id]
+
+
+def store_profile_updates(
+    db,
+    portal_path: tuple[str, ...],
+    model_name: str,
+    updates: list[tuple[str, str, Any, float]],
+    decay: float = 0.2,
+    attempts: int = 3,
+) -> bool:
+    """Apply (user id, UID, vector, weight) updates in a transaction of their own.
+
+    Runs outside of any request (the indexing worker or an after-commit
+    hook), so a private connection is opened and conflicts are retried.
+    """
+    manager = transaction.TransactionManager()
+    for attempt in range(1, attempts + 1):
+        connection = db.open(transaction_manager=manager)
+        try:
+            manager.begin()
+            app = connection.root()["Application"]
+            profiles = UserProfiles(app.unrestrictedTraverse(portal_path), decay)
+            for user_id, uid, vector, weight in updates:
+                profiles.update(user_id, vector, model_name, weight, uid=uid)
+            manager.get().note("Update user profile vectors")
+            manager.commit()
+            return True
+        except ConflictError:
+            manager.abort()
+            logger.info(f"Conflict storing user profiles, attempt {attempt}")
+        except Exception as e:
+            manager.abort()
+            logger.error(f"Failed to store user profiles: {e}")
+            return False
+        finally:
+            connection.close()
+    return False
@@ -0,0 +1,229 @@
+"""Query embedding with a TTL'd LRU and cross-thread micro-batching.
+
+Search boxes and autocomplete send the same few queries over and over, so
+query embeddings are kept in a small LRU keyed by the normalized query.
+Entries expire after a TTL to bound staleness if the model is swapped.
+
+Cache misses go through a ``QueryBatcher``: the first thread to miss
+becomes the leader, waits a few milliseconds for concurrent misses from
+other Zope threads and encodes them all in one model call. A batch of n
+short queries costs little more than a single one on CPU, so throughput
+under concurrent search load goes up while a lone query waits at most
+``max_wait`` seconds longer.
+"""
+
+from collections import OrderedDict
+from typing import Any
+import logging
+import re
+import threading
+import time
+import unicodedata
+
+
+logger = logging.getLogger("knowledge.curator.vector")
+
+# (model name, backend) -> QueryEmbedder, like the pool's generators
+_embedders: dict[tuple[str, str], "QueryEmbedder"] = {}
+_embedders_lock = threading.Lock()
+
+
+def normalize_query(text: str) -> str:
+    """Return the cache key form of a query: NFKC, single spaces, stripped.
+
+    Case is kept, as cased models embed "Apple" and "apple" differently.
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU of query -> embedding whose entries expire after a TTL."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, query: str) -> list[float] | None:
+        """Return the cached embedding of a normalized query, or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry is not None and entry[0] <= now:
+                del self._entries[query]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(query)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, query: str, embedding: list[float]):
+        """Store an embedding; all-zero (failed) embeddings are not cached."""
+        if not self.max_entries or not any(embedding):
+            return
+        with self._lock:
+            self._entries[query] = (time.monotonic() + self.ttl, embedding)
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return hit/miss counters and the current size."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "capacity": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class _PendingQuery:
+    __slots__ = ("done", "embedding", "text")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.embedding: list[float] | None = None
+        self.done = threading.Event()
+
+
+class QueryBatcher:
+    """Encode queries arriving concurrently from several threads together."""
+
+    def __init__(self, generator, max_batch: int = 32, max_wait: float = 0.005):
+        self.generator = generator
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self._condition = threading.Condition()
+        self._pending: list[_PendingQuery] = []
+        self._collecting = False
+        self.batches = 0
+        self.batched_queries = 0
+
+    def embed(self, text: str) -> list[float]:
+        """Return the embedding of ``text``, possibly encoded in a batch."""
+        if self.max_wait <= 0:
+            return self.generator.generate_embedding(text)
+
+        request = _PendingQuery(text)
+        with self._condition:
+            self._pending.append(request)
+            leader = not self._collecting
+            if leader:
+                self._collecting = True
+            elif len(self._pending) >= self.max_batch:
+                self._condition.notify_all()
+
+        if leader:
+            self._run_batch()
+        request.done.wait()
+        return request.embedding
+
+    def _run_batch(self):
+        """Collect requests for up to ``max_wait`` seconds, then encode them."""
+        deadline = time.monotonic() + self.max_wait
+        with self._condition:
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            # Everything queued so far is served; later arrivals elect a new
+            # leader and are encoded while this batch runs
+            batch = self._pending
+            self._pending = []
+            self._collecting = False
+
+        try:
+            if len(batch) == 1:
+                embeddings = [self.generator.generate_embedding(batch[0].text)]
+            else:
+                embeddings = self.generator.generate_embeddings(
+                    [request.text for request in batch], batch_size=self.max_batch
+                )
+            for request, embedding in zip(batch, embeddings, strict=True):
+                request.embedding = embedding
+            self.batches += 1
+            self.batched_queries += len(batch)
+        except Exception as e:
+            logger.error(f"Failed to embed query batch: {e}")
+        finally:
+            for request in batch:
+                if request.embedding is None:
+                    request.embedding = [0.0] * self.generator.embedding_dimension
+                request.done.set()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "batched_queries": self.batched_queries,
+            "mean_batch_size": (
+                self.batched_queries / self.batches if self.batches else 0.0
+            ),
+        }
+
+
+class QueryEmbedder:
+    """Embed search queries through the cache and the batcher."""
+
+    def __init__(
+        self,
+        generator,
+        max_entries: int = 1024,
+        ttl: float = 600.0,
+        max_batch: int = 32,
+        max_wait: float = 0.005,
+    ):
+        self.cache = QueryEmbeddingCache(max_entries, ttl)
+        self.batcher = QueryBatcher(generator, max_batch, max_wait)
+
+    def embed(self, query: str) -> list[float]:
+        """Return the embedding of a search query."""
+        query = normalize_query(query)
+        embedding = self.cache.get(query)
+        if embedding is None:
+            embedding = self.batcher.embed(query)
+            self.cache.put(query, embedding)
+        return embedding
+
+    def stats(self) -> dict[str, Any]:
+        return {**self.cache.stats(), **self.batcher.stats()}
+
+
+def get_query_embedder(generator, config: dict[str, Any] | None = None):
+    """Return the process-wide query embedder of an embedding generator.
+
+    Embedders are shared per model and backend, as generators are by the
+    component pool.
+    """
+    config = config or {}
+    key = (generator.model_name, generator.backend)
+    with _embedders_lock:
+        embedder = _embedders.get(key)
+        if embedder is None:
+            embedder = QueryEmbedder(
+                generator,
+                max_entries=config.get("query_cache_size", 1024),
+                ttl=config.get("query_cache_ttl", 600.0),
+                max_batch=config.get("query_batch_size", 32),
+                max_wait=config.get("query_batch_wait_ms", 5) / 1000.0,
+            )
+            _embedders[key] = embedder
+        return embedder
@@ -0,0 +1,404 @@
+"""Staged, resumable vector index rebuild.
+
+A rebuild runs as a pipeline of four stages:
+
+1. Catalog scan: brains sorted by UID, which gives a stable resume position.
+2. Text extraction: objects are woken up in batches on the calling thread
+   (ZODB connections are not thread-safe) and the pickle cache is garbage
+   collected after every batch so memory stays bounded.
+3. Embedding: a dedicated thread embeds each batch, in model-sized batches,
+   through the embedding cache, splitting long documents into chunks when
+   chunking is enabled.
+4. Upserting: batches are written to Qdrant from a small thread pool with a
+   bounded number of requests in flight.
+
+The UID of the last batch whose upsert (and every earlier one) succeeded is
+written to a checkpoint file, so an interrupted rebuild picks up from there.
+With ``shadow=True`` everything is written to a fresh versioned collection
+(``plone_knowledge__<model>__v<n>``) and the alias searches go through is
+swapped over only at the end, after catching up with content edited,
+added or published meanwhile and dropping points of content deleted or
+unpublished meanwhile (whose events went to the old collection). Content
+edited between that catch-up and the swap is re-indexed by a second pass
+right after it; points of content deleted in that short window are left to
+the reconciler.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from DateTime import DateTime
+from knowledge.curator.vector.config import INDEXED_WORKFLOW_STATES
+from knowledge.curator.vector.config import SUPPORTED_CONTENT_TYPES
+from plone import api
+from Products.CMFCore.utils import getToolByName
+from typing import Any
+import json
+import logging
+import os
+import queue
+import threading
+
+
+logger = logging.getLogger("knowledge.curator.vector")
+
+# Sentinel telling the embedding stage that the scan is finished
+_DONE = object()
+
+
+class RebuildCheckpoint:
+    """Rebuild progress persisted as a small JSON file."""
+
+    def __init__(self, path: str | None):
+        self.path = path
+
+    def load(self) -> dict[str, Any] | None:
+        """Return the stored checkpoint, or None."""
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable rebuild checkpoint: {e}")
+            return None
+
+    def save(self, state: dict[str, Any]):
+        """Write the checkpoint atomically."""
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """Remove the checkpoint after a completed rebuild."""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class RebuildPipeline:
+    """Rebuild the vector index for a collection manager."""
+
+    def __init__(
+        self,
+        manager,
+        batch_size: int = 100,
+        max_inflight: int = 4,
+        checkpoint_path: str | None = None,
+    ):
+        self.manager = manager
+        self.batch_size = batch_size
+        self.max_inflight = max(1, max_inflight)
+        self.checkpoint = RebuildCheckpoint(checkpoint_path)
+
+    def run(
+        self,
+        content_types: list[str] | None = None,
+        shadow: bool = True,
+        resume: bool = True,
+        keep_previous: bool = False,
+    ) -> dict[str, Any]:
+        """Run the rebuild and return a summary.
+
+        The collection the alias pointed to before is dropped after the swap
+        unless ``keep_previous`` is set.
+        """
+        start_time = datetime.now()
+        content_types = sorted(content_types or SUPPORTED_CONTENT_TYPES)
+        state = self._start_state(content_types, shadow, resume)
+        adapter = self.manager.adapter
+
+        if shadow:
+            target = adapter.for_collection(state["collection"])
+            if not state["resumed"]:
+                target.create_collection(
+                    state["collection"], self.manager.embeddings.embedding_dimension
+                )
+        else:
+            target = adapter
+
+        catalog = getToolByName(api.portal.get(), "portal_catalog")
+        brains = sorted(
+            catalog.searchResults(
+                portal_type=content_types, review_state=INDEXED_WORKFLOW_STATES
+            ),
+            key=lambda brain: brain.UID,
+        )
+        total_items = len(brains)
+        pending = [brain for brain in brains if state["last_uid"] < brain.UID]
+        logger.info(
+            f"Found {total_items} items to index, {len(pending)} remaining "
+            f"into '{target.collection_name}'"
+        )
+
+        self._run_stages(pending, target, state)
+
+        previous = None
+        removed = added = 0
+        if shadow:
+            # Pick up content edited while the shadow collection was filling
+            caught_up = DateTime()
+            self._catch_up(
+                target, catalog, content_types, state, DateTime(state["started"])
+            )
+            removed, added = self._sync_target(target, catalog, content_types, state)
+
+            previous = adapter.swap_alias(state["collection"])
+            # Edits between the catch-up query and the swap were written to
+            # the previous collection; this pass only covers that window
+            self._catch_up(target, catalog, content_types, state, caught_up)
+            if previous and previous != state["collection"] and not keep_previous:
+                adapter.client.delete_collection(previous)
+                logger.info(f"Dropped previous collection '{previous}'")
+
+        self.checkpoint.clear()
+        duration = (datetime.now() - start_time).total_seconds()
+        return {
+            "success": True,
+            "total_items": total_items,
+            "processed": state["processed"],
+            "errors": state["errors"],
+            "removed": removed,
+            "added": added,
+            "resumed": state["resumed"],
+            "collection": target.collection_name,
+            "previous_collection": previous,
+            "duration_seconds": duration,
+            "items_per_second": len(pending) / duration if duration > 0 else 0,
+        }
+
+    def _catch_up(
+        self, target, catalog, content_types: list[str], state: dict[str, Any], since
+    ) -> int:
+        """Re-index into ``target`` the items modified since ``since``.
+
+        Returns the number of items re-indexed.
+        """
+        changed = catalog.searchResults(
+            portal_type=content_types,
+            review_state=INDEXED_WORKFLOW_STATES,
+            modified={"query": since, "range": "min"},
+        )
+        if changed:
+            logger.info(f"Re-indexing {len(changed)} items changed meanwhile")
+            self._run_stages(list(changed), target, state, checkpoint=False)
+        return len(changed)
+
+    def _sync_target(
+        self, target, catalog, content_types: list[str], state: dict[str, Any]
+    ) -> tuple[int, int]:
+        """Bring ``target`` in line with the indexable catalog entries.
+
+        Content deleted or moved out of ``INDEXED_WORKFLOW_STATES`` after the
+        scan was copied into the shadow collection, while its events updated
+        the old one; its points are deleted. Content that became indexable
+        meanwhile without its ``modified`` date changing, such as by a
+        workflow transition, has no point yet and is indexed now. Returns
+        the number of points deleted and of items indexed.
+        """
+        indexed = {
+            brain.UID: brain
+            for brain in catalog.searchResults(
+                portal_type=content_types, review_state=INDEXED_WORKFLOW_STATES
+            )
+        }
+        present = set()
+        point_ids = []
+        for batch in target.scroll_points(batch_size=1000, with_payload=["uid"]):
+            for point in batch:
+                uid = (point.payload or {}).get("uid")
+                if uid in indexed:
+                    present.add(uid)
+                else:
+                    point_ids.append(point.id)
+
+        missing = [
+            brain for uid, brain in sorted(indexed.items()) if uid not in present
+        ]
+        if missing:
+            logger.info(f"Indexing {len(missing)} items added meanwhile")
+            self._run_stages(missing, target, state, checkpoint=False)
+        if point_ids:
+            logger.info(f"Dropping {len(point_ids)} points removed meanwhile")
+            if not target.delete_points(point_ids):
+                raise RuntimeError(
+                    f"Deleting removed points from '{target.collection_name}' failed"
+                )
+        return len(point_ids), len(missing)
+
+    def _start_state(
+        self, content_types: list[str], shadow: bool, resume: bool
+    ) -> dict[str, Any]:
+        """Resume a matching checkpoint or start a fresh rebuild."""
+        adapter = self.manager.adapter
+        model = self.manager.embeddings.model_name
+        previous = self.checkpoint.load()
+        if (
+            resume
+            and previous
+            and previous.get("shadow") == shadow
+            and previous.get("model") == model
+            and previous.get("content_types") == content_types
+            and adapter.collection_exists(previous["collection"])
+        ):
+            logger.info(
+                f"Resuming rebuild of '{previous['collection']}' after "
+                f"{previous['processed']} items"
+            )
+            previous["resumed"] = True
+            return previous
+        if previous and previous.get("shadow"):
+            self._drop_abandoned(previous["collection"])
+
+        if shadow:
+            collection = adapter.next_collection_name(model)
+        else:
+            collection = adapter.collection_name
+        state = {
+            "collection": collection,
+            "shadow": shadow,
+            "model": model,
+            "content_types": content_types,
+            "started": DateTime().ISO8601(),
+            "last_uid": "",
+            "processed": 0,
+            "errors": 0,
+            "resumed": False,
+        }
+        self.checkpoint.save(state)
+        return state
+
+    def _drop_abandoned(self, collection: str):
+        """Delete the partial shadow collection of a rebuild not resumed."""
+        adapter = self.manager.adapter
+        if collection in (adapter.collection_name, adapter.get_alias_target()):
+            return
+        if adapter.collection_exists(collection):
+            adapter.client.delete_collection(collection)
+            logger.info(f"Dropped abandoned rebuild collection '{collection}'")
+
+    def _run_stages(self, brains, target, state: dict[str, Any], checkpoint=True):
+        """Feed brains through the extract, embed and upsert stages."""
+        progress = _UpsertProgress(state, self.checkpoint if checkpoint else None)
+        run = _StageRun(target, progress, self.max_inflight)
+        embedder = threading.Thread(
+            target=self._embed_stage, args=(run,), name="vector-rebuild-embed"
+        )
+        embedder.start()
+        try:
+            for sequence, (documents, texts, errors) in enumerate(
+                self._extract(brains)
+            ):
+                if run.failure:
+                    break
+                state["errors"] += errors
+                if documents:
+                    run.batches.put((sequence, documents, texts))
+                else:
+                    progress.skip(sequence, brains, self.batch_size)
+        finally:
+            run.batches.put(_DONE)
+            embedder.join()
+
+        if run.failure:
+            raise run.failure[0]
+
+    def _embed_stage(self, run: "_StageRun"):
+        """Embed queued batches and hand them to the upsert pool."""
+        with ThreadPoolExecutor(max_workers=self.max_inflight) as executor:
+            while True:
+                item = run.batches.get()
+                if item is _DONE:
+                    break
+                if run.failure:
+                    continue
+                sequence, documents, texts = item
+                try:
+                    points = self.manager.embed_documents(documents, texts)
+                except BaseException as e:
+                    run.failure.append(e)
+                    continue
+                run.inflight.acquire()
+                executor.submit(self._upsert_stage, run, sequence, documents, points)
+
+    def _upsert_stage(self, run: "_StageRun", sequence: int, documents, points):
+        """Write one embedded batch and record it as done."""
+        try:
+            if not run.target.upsert_many(*points):
+                raise RuntimeError(f"Upsert into '{run.target.collection_name}' failed")
+            run.progress.done(sequence, documents[-1]["uid"], len(documents))
+        except BaseException as e:
+            run.failure.append(e)
+        finally:
+            run.inflight.release()
+
+    def _extract(self, brains):
+        """Yield (documents, texts, errors) for every batch of brains."""
+        content_document = _content_document()
+        jar = getattr(api.portal.get(), "_p_jar", None)
+        for start in range(0, len(brains), self.batch_size):
+            documents = []
+            texts = []
+            errors = 0
+            for brain in brains[start : start + self.batch_size]:
+                try:
+                    obj = brain.getObject()
+                    documents.append(content_document(obj))
+                    texts.append(self.manager.embeddings.prepare_content_text(obj))
+                except Exception as e:
+                    logger.error(f"Error processing {brain.getPath()}: {e}")
+                    errors += 1
+            yield documents, texts, errors
+            if jar is not None:
+                jar.cacheGC()
+
+
+def _content_document():
+    """Import lazily; management imports this module."""
+    from knowledge.curator.vector.management import content_document
+
+    return content_document
+
+
+class _StageRun:
+    """State shared by the stages of one ``_run_stages`` call."""
+
+    def __init__(self, target, progress: "_UpsertProgress", max_inflight: int):
+        self.target = target
+        self.progress = progress
+        self.batches: queue.Queue = queue.Queue(maxsize=2)
+        self.inflight = threading.BoundedSemaphore(max_inflight)
+        self.failure: list[BaseException] = []
+
+
+class _UpsertProgress:
+    """Advance the checkpoint only over a contiguous run of finished batches."""
+
+    def __init__(self, state: dict[str, Any], checkpoint: RebuildCheckpoint | None):
+        self.state = state
+        self.checkpoint = checkpoint
+        self._lock = threading.Lock()
+        self._next = 0
+        self._finished: dict[int, tuple[str | None, int]] = {}
+
+    def skip(self, sequence: int, brains, batch_size: int):
+        """Record a batch in which every item failed extraction."""
+        last = brains[min(len(brains), (sequence + 1) * batch_size) - 1]
+        self.done(sequence, last.UID, 0)
+
+    def done(self, sequence: int, last_uid: str, count: int):
+        """Record a finished batch and move the checkpoint forward."""
+        with self._lock:
+            self._finished[sequence] = (last_uid, count)
+            advanced = False
+            while self._next in self._finished:
+                last_uid, count = self._finished.pop(self._next)
+                self.state["last_uid"] = max(self.state["last_uid"], last_uid)
+                self.state["processed"] += count
+                self._next += 1
+                advanced = True
+            if advanced:
+                logger.info(f"Rebuild progress: {self.state['processed']} items")
+                if self.checkpoint is not None:
+                    self.checkpoint.save(self.state)
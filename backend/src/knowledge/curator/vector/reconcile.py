@@ -0,0 +1,246 @@
+"""Find and repair drift between the catalog and the vector collection.
+
+Missed events (a crashed worker, content imported with events disabled,
+a restored backup) leave vectors missing, stale or orphaned. The
+reconciler compares what the catalog says should be indexed with what the
+collection holds and applies only the difference:
+
+- missing: indexable content without a point -> embed and upsert
+- stale: a point whose ``modified_ts`` or ``workflow_state`` no longer
+  matches the catalog, or that predates the ``modified_ts`` and
+  ``created_ts`` payload fields -> re-embed and upsert
+- orphaned: a point without indexable content, of any content type, or
+  whose ID is not the one derived from its UID and chunk (legacy or
+  restored points) -> delete by point ID, so the live point of the same
+  UID is left alone
+
+Both sides are merged in point ID order. The collection is streamed in that
+order with only the payload fields needed for the comparison, one page at a
+time. The catalog side is not streamed: it is held as one sorted list of
+(point ID, UID, modified, state) tuples from brain metadata, so memory grows
+with the number of catalog items (O(catalog), a few hundred bytes each).
+No content object is woken up until it has to be re-embedded.
+"""
+
+from bisect import bisect_left
+from datetime import datetime
+from knowledge.curator.vector.adapter import chunk_key
+from knowledge.curator.vector.adapter import point_id_for_uid
+from knowledge.curator.vector.config import INDEXED_WORKFLOW_STATES
+from knowledge.curator.vector.config import SUPPORTED_CONTENT_TYPES
+from plone import api
+from typing import Any
+import logging
+
+
+logger = logging.getLogger("knowledge.curator.vector")
+
+# Modification times closer than this (in seconds) count as equal
+MODIFIED_TOLERANCE = 1.0
+
+# Number of UIDs per category listed in a report
+REPORT_SAMPLE_SIZE = 20
+
+COMPARED_PAYLOAD_FIELDS = [
+    "uid",
+    "modified_ts",
+    "workflow_state",
+    "chunk",
+    "content_type",
+]
+
+
+def merge_sorted(catalog_entries, points):
+    """Merge two streams ordered by point ID.
+
+    Yields (catalog entry or None, point or None) pairs, one per point ID.
+    """
+    catalog_iter = iter(catalog_entries)
+    point_iter = iter(points)
+    entry = next(catalog_iter, None)
+    point = next(point_iter, None)
+    while entry is not None or point is not None:
+        if point is None or (entry is not None and entry[0] < str(point.id)):
+            yield entry, None
+            entry = next(catalog_iter, None)
+        elif entry is None or str(point.id) < entry[0]:
+            yield None, point
+            point = next(point_iter, None)
+        else:
+            yield entry, point
+            entry = next(catalog_iter, None)
+            point = next(point_iter, None)
+
+
+def is_indexed(catalog_entries: list[tuple], uid: str) -> bool:
+    """Tell whether ``uid`` is in the catalog entries sorted by point ID."""
+    point_id = point_id_for_uid(uid)
+    index = bisect_left(catalog_entries, (point_id,))
+    return index < len(catalog_entries) and catalog_entries[index][0] == point_id
+
+
+def is_stale(entry: tuple, payload: dict[str, Any]) -> bool:
+    """Tell whether a point no longer matches its catalog entry."""
+    _point_id, _uid, modified, state = entry
+    indexed = payload.get("modified_ts")
+    if indexed is None or abs(indexed - modified) > MODIFIED_TOLERANCE:
+        return True
+    return payload.get("workflow_state") != state
+
+
+class VectorReconciler:
+    """Bring a collection back in line with the catalog."""
+
+    def __init__(self, manager, batch_size: int = 100):
+        self.manager = manager
+        self.batch_size = batch_size
+
+    def run(
+        self, content_types: list[str] | None = None, dry_run: bool = False
+    ) -> dict[str, Any]:
+        """Compare catalog and collection and fix the differences.
+
+        With ``dry_run`` nothing is written; the report lists what would
+        change.
+        """
+        start_time = datetime.now()
+        content_types = sorted(content_types or SUPPORTED_CONTENT_TYPES)
+        catalog = api.portal.get_tool("portal_catalog")
+
+        entries = sorted(
+            (
+                point_id_for_uid(brain.UID),
+                brain.UID,
+                brain.modified.timeTime(),
+                brain.review_state,
+            )
+            for brain in catalog.unrestrictedSearchResults(
+                portal_type=content_types, review_state=INDEXED_WORKFLOW_STATES
+            )
+        )
+
+        missing = []
+        stale = []
+        # Point IDs of orphaned documents, and of their further chunks
+        orphaned = []
+        orphaned_chunks = []
+        orphaned_samples = []
+        indexed_items = 0
+        points = self._points(content_types, entries, orphaned_chunks)
+        for entry, point in merge_sorted(entries, points):
+            if point is None:
+                missing.append(entry[1])
+                continue
+            indexed_items += 1
+            if entry is None:
+                orphaned.append(point.id)
+                if len(orphaned_samples) < REPORT_SAMPLE_SIZE:
+                    orphaned_samples.append(point.payload.get("uid") or point.id)
+            elif is_stale(entry, point.payload):
+                stale.append(entry[1])
+
+        report = {
+            "success": True,
+            "dry_run": dry_run,
+            "catalog_items": len(entries),
+            "indexed_items": indexed_items,
+            "missing": len(missing),
+            "stale": len(stale),
+            "orphaned": len(orphaned),
+            "orphaned_chunks": len(orphaned_chunks),
+            "samples": {
+                "missing": missing[:REPORT_SAMPLE_SIZE],
+                "stale": stale[:REPORT_SAMPLE_SIZE],
+                "orphaned": orphaned_samples,
+            },
+            "indexed": 0,
+            "deleted": 0,
+            "errors": 0,
+        }
+        logger.info(
+            f"Vector drift: {len(missing)} missing, {len(stale)} stale, "
+            f"{len(orphaned)} orphaned of {len(entries)} catalog items"
+        )
+
+        if not dry_run:
+            self._repair(missing + stale, orphaned + orphaned_chunks, catalog, report)
+
+        report["duration_seconds"] = (datetime.now() - start_time).total_seconds()
+        return report
+
+    def _points(self, content_types: list[str], entries, orphaned_chunks):
+        """Stream the first point of every document, in point ID order.
+
+        The whole collection is scrolled, so points of content types no
+        longer indexed, or left behind by an earlier indexing scope, are
+        orphaned too. Only points of indexed types outside ``content_types``
+        are skipped, as a run limited to some types does not own them.
+
+        Further chunks are replaced along with their document and not
+        compared. Those of content missing from the catalog ``entries``, or whose ID
+        does not match their UID and chunk number, are added to
+        ``orphaned_chunks`` instead.
+        """
+        skipped = set(SUPPORTED_CONTENT_TYPES) - set(content_types)
+        for batch in self.manager.adapter.scroll_points(
+            batch_size=1000, with_payload=COMPARED_PAYLOAD_FIELDS
+        ):
+            for point in batch:
+                payload = point.payload or {}
+                if payload.get("content_type") in skipped:
+                    continue
+                chunk = payload.get("chunk")
+                if not chunk:
+                    yield point
+                    continue
+                uid = payload.get("uid")
+                expected_id = uid and point_id_for_uid(chunk_key(uid, chunk))
+                if str(point.id) != expected_id or not is_indexed(entries, uid):
+                    orphaned_chunks.append(point.id)
+
+    def _repair(self, to_index: list[str], to_delete: list, catalog, report):
+        """Re-embed and upsert UIDs ``to_index``, delete point IDs ``to_delete``."""
+        from knowledge.curator.vector.management import content_document
+
+        jar = getattr(api.portal.get(), "_p_jar", None)
+        embeddings = self.manager.embeddings
+        for start in range(0, len(to_index), self.batch_size):
+            uids = to_index[start : start + self.batch_size]
+            documents = []
+            texts = []
+            for brain in catalog.unrestrictedSearchResults(UID=uids):
+                try:
+                    obj = brain._unrestrictedGetObject()
+                    documents.append(content_document(obj))
+                    texts.append(embeddings.prepare_content_text(obj))
+                except Exception as e:
+                    logger.error(f"Error processing {brain.getPath()}: {e}")
+                    report["errors"] += 1
+            result = self.manager.apply_changes(documents, texts)
+            report["indexed"] += result["indexed"]
+            if not result["success"]:
+                report["success"] = False
+            if jar is not None:
+                jar.cacheGC()
+
+        if to_delete:
+            if self.manager.adapter.delete_points(to_delete):
+                report["deleted"] = len(to_delete)
+            else:
+                report["success"] = False
+
+
+def run_vector_reconciler(context=None, dry_run=False):
+    """Entry point for cron/clock server to repair vector drift.
+
+    Served as ``POST /@vector-management/reconcile``; cron runs it through
+    ``scripts/vector_cli.py reconcile``.
+    """
+    from knowledge.curator.vector.management import VectorCollectionManager
+
+    report = VectorCollectionManager().reconcile(dry_run=dry_run)
+    logger.info(
+        f"Vector reconciler: {report.get('indexed', 0)} indexed, "
+        f"{report.get('deleted', 0)} deleted, {report.get('errors', 0)} errors"
+    )
+    return report
@@ -1,15 +1,52 @@
 """Similarity search utilities for the vector database."""
 
-from knowledge.curator.vector.adapter import QdrantAdapter
+from knowledge.curator.vector.adapter import point_id_for_uid
+from knowledge.curator.vector.clustering import ClusteringEngine
 from knowledge.curator.vector.config import get_vector_config
-from knowledge.curator.vector.embeddings import EmbeddingGenerator
+from knowledge.curator.vector.duplicates import DuplicateDetector
+from knowledge.curator.vector.pool import get_component_pool
+from knowledge.curator.vector.profiles import decayed_mean
+from knowledge.curator.vector.profiles import UserProfiles
+from knowledge.curator.vector.queries import get_query_embedder
 from plone import api
 from typing import Any
 import logging
+import threading
+import time
 
 
 logger = logging.getLogger("knowledge.curator.vector")
 
+# Seconds a Qdrant availability check result is reused
+AVAILABILITY_TTL = 30.0
+
+_availability: dict[tuple, tuple[float, bool]] = {}
+_availability_lock = threading.Lock()
+
+# Rank offset of reciprocal rank fusion; larger values flatten the rank curve
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(
+    rankings: dict[str, list[str]], k: int = RRF_K
+) -> list[tuple[str, float, dict[str, int]]]:
+    """Fuse ranked UID lists into one ranking.
+
+    Every list adds ``1 / (k + rank)`` to the score of each UID it contains.
+    Returns (uid, fused score, {source: 1-based rank}) tuples, best first;
+    UIDs returned by several sources appear once.
+    """
+    scores: dict[str, float] = {}
+    ranks: dict[str, dict[str, int]] = {}
+    for source, uids in rankings.items():
+        for rank, uid in enumerate(uids, 1):
+            if source in ranks.get(uid, {}):
+                continue
+            scores[uid] = scores.get(uid, 0.0) + 1.0 / (k + rank)
+            ranks.setdefault(uid, {})[source] = rank
+    fused = sorted(scores, key=lambda uid: (-scores[uid], uid))
+    return [(uid, scores[uid], ranks[uid]) for uid in fused]
+
 
 class SimilaritySearch:
     """Perform similarity searches on knowledge content."""
@@ -17,13 +54,34 @@ class SimilaritySearch:
     def __init__(self):
         """Initialize search components."""
         config = get_vector_config()
-        self.adapter = QdrantAdapter(
-            host=config["qdrant_host"],
-            port=config["qdrant_port"],
-            api_key=config.get("qdrant_api_key"),
-            https=config.get("qdrant_https", False),
-        )
-        self.embeddings = EmbeddingGenerator(config["embedding_model"])
+        pool = get_component_pool()
+        self.adapter = pool.adapter(config)
+        self.embeddings = pool.embedding_generator(config["embedding_model"], config)
+        self.query_embedder = get_query_embedder(self.embeddings, config)
+
+    def is_available(self) -> bool:
+        """Check whether the vector collection can be queried.
+
+        The result is cached per client and collection for
+        ``AVAILABILITY_TTL`` seconds, so an unreachable Qdrant does not add a
+        connection timeout to every request.
+        """
+        key = (id(self.adapter.client), self.adapter.collection_name)
+        now = time.monotonic()
+        with _availability_lock:
+            cached = _availability.get(key)
+            if cached is not None and now - cached[0] < AVAILABILITY_TTL:
+                return cached[1]
+
+        try:
+            available = self.adapter.collection_exists(self.adapter.collection_name)
+        except Exception as e:
+            logger.warning(f"Vector database unavailable: {e}")
+            available = False
+
+        with _availability_lock:
+            _availability[key] = (now, available)
+        return available
 
     def search_by_text(
         self,
@@ -33,150 +91,188 @@ class SimilaritySearch:
         content_types: list[str] | None = None,
         workflow_states: list[str] | None = None,
         tags: list[str] | None = None,
+        knowledge_types: list[str] | None = None,
+        modified_after=None,
+        modified_before=None,
+        extra_filters: dict[str, Any] | None = None,
     ) -> list[dict[str, Any]]:
-        """Search for similar content by text query."""
+        """Search for similar content by text query.
+
+        All filters are applied by Qdrant during the vector search.
+        ``modified_after``/``modified_before`` are inclusive and accept ISO
+        strings, ``DateTime`` or ``datetime`` values. ``extra_filters`` takes
+        further predicates in the format of ``knowledge.curator.vector.filters``.
+        """
         try:
-            # Generate embedding for query
-            query_embedding = self.embeddings.generate_embedding(query)
-
-            # Build filters
-            filters = {}
-            if content_types:
-                filters["content_type"] = {"$in": content_types}
-            if workflow_states:
-                filters["workflow_state"] = {"$in": workflow_states}
-            if tags:
-                filters["tags"] = {"$any": tags}
-
-            # Search similar vectors
-            results = self.adapter.search_similar(
-                query_embedding,
+            results = self.search_vectors(
+                query,
                 limit=limit,
                 score_threshold=score_threshold,
-                filters=filters,
+                content_types=content_types,
+                workflow_states=workflow_states,
+                tags=tags,
+                knowledge_types=knowledge_types,
+                modified_after=modified_after,
+                modified_before=modified_before,
+                extra_filters=extra_filters,
             )
-
-            # Enhance results with Plone objects
-            enhanced_results = []
-            for result in results:
-                try:
-                    brain = api.content.find(UID=result["uid"])
-                    if brain:
-                        obj = brain[0].getObject()
-                        enhanced_result = result.copy()
-                        enhanced_result.update({
-                            "url": obj.absolute_url(),
-                            "created": obj.created().ISO8601(),
-                            "creator": obj.Creator(),
-                            "review_state": api.content.get_state(obj),
-                        })
-                        enhanced_results.append(enhanced_result)
-                except Exception as e:
-                    logger.warning(f"Could not enhance result {result['uid']}: {e}")
-                    enhanced_results.append(result)
-
-            return enhanced_results
+            return self._hydrate_results(results)
 
         except Exception as e:
             logger.error(f"Search by text failed: {e}")
             return []
 
+    def search_vectors(
+        self,
+        query: str,
+        limit: int = 10,
+        score_threshold: float = 0.5,
+        content_types: list[str] | None = None,
+        workflow_states: list[str] | None = None,
+        tags: list[str] | None = None,
+        knowledge_types: list[str] | None = None,
+        modified_after=None,
+        modified_before=None,
+        extra_filters: dict[str, Any] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Embed a text query and return the raw vector hits.
+
+        Does not touch the ZODB, so it can run outside of the request
+        thread; pass the hits through ``_hydrate_results`` on the request
+        thread to apply the current user's permissions.
+        """
+        # Generate embedding for query (cached and batched across threads)
+        query_embedding = self.query_embedder.embed(query)
+
+        # Build filters
+        filters = {
+            "content_type": content_types,
+            "workflow_state": workflow_states,
+            "tags": tags,
+            "knowledge_type": knowledge_types,
+        }
+        if modified_after or modified_before:
+            filters["modified"] = {"start": modified_after, "end": modified_before}
+        if extra_filters:
+            filters.update(extra_filters)
+
+        # Search similar vectors
+        return self.adapter.search_similar(
+            query_embedding,
+            limit=limit,
+            score_threshold=score_threshold,
+            filters=filters,
+        )
+
     def find_similar_content(
         self,
         content_uid: str,
         limit: int = 5,
         score_threshold: float = 0.6,
         same_type_only: bool = False,
+        content_types: list[str] | None = None,
     ) -> list[dict[str, Any]]:
-        """Find content similar to a given item."""
+        """Find content similar to a given item.
+
+        ``same_type_only`` and ``content_types`` are applied by Qdrant.
+        """
         try:
-            # Get the content object
+            # Get the content metadata
             brain = api.content.find(UID=content_uid)
             if not brain:
                 logger.warning(f"Content not found: {content_uid}")
                 return []
 
-            obj = brain[0].getObject()
+            # Filter by type if requested
+            if same_type_only:
+                content_types = [brain[0].portal_type]
+            filters = {"content_type": content_types} if content_types else None
 
             # Find related content
             results = self.adapter.find_related_content(
-                content_uid, limit=limit, score_threshold=score_threshold
+                content_uid,
+                limit=limit,
+                score_threshold=score_threshold,
+                filters=filters,
             )
 
-            # Filter by type if requested
-            if same_type_only:
-                content_type = obj.portal_type
-                results = [r for r in results if r.get("content_type") == content_type]
-
-            # Enhance results
-            enhanced_results = []
-            for result in results:
-                try:
-                    brain = api.content.find(UID=result["uid"])
-                    if brain:
-                        related_obj = brain[0].getObject()
-                        enhanced_result = result.copy()
-                        enhanced_result.update({
-                            "url": related_obj.absolute_url(),
-                            "created": related_obj.created().ISO8601(),
-                            "creator": related_obj.Creator(),
-                            "review_state": api.content.get_state(related_obj),
-                        })
-                        enhanced_results.append(enhanced_result)
-                except Exception as e:
-                    logger.warning(f"Could not enhance result {result['uid']}: {e}")
-                    enhanced_results.append(result)
-
-            return enhanced_results
+            return self._hydrate_results(results)
 
         except Exception as e:
             logger.error(f"Find similar content failed: {e}")
             return []
 
+    def _hydrate_results(self, results: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Add current catalog metadata to vector hits.
+
+        One catalog query covers all hits and only brain metadata is read,
+        so no object is woken up. Hits the current user cannot see in the
+        catalog are dropped; if the catalog query itself fails the payload
+        values stored at index time are returned as they are.
+        """
+        if not results:
+            return []
+
+        try:
+            catalog = api.portal.get_tool("portal_catalog")
+            brains = catalog(UID=[result["uid"] for result in results])
+            brains_by_uid = {brain.UID: brain for brain in brains}
+        except Exception as e:
+            logger.warning(f"Could not enhance search results: {e}")
+            return results
+
+        enhanced_results = []
+        for result in results:
+            brain = brains_by_uid.get(result["uid"])
+            if brain is None:
+                continue
+            enhanced_result = result.copy()
+            enhanced_result.update({
+                "url": brain.getURL(),
+                "created": brain.created.ISO8601(),
+                "creator": brain.Creator,
+                "review_state": brain.review_state,
+            })
+            enhanced_results.append(enhanced_result)
+
+        return enhanced_results
+
     def find_duplicates(
-        self, score_threshold: float = 0.9, content_types: list[str] | None = None
+        self,
+        score_threshold: float = 0.9,
+        content_types: list[str] | None = None,
+        block_size: int = 256,
+        progress=None,
     ) -> list[list[dict[str, Any]]]:
-        """Find potential duplicate content based on similarity."""
+        """Find groups of near-duplicate content.
+
+        All vectors are read from the collection once and joined with each
+        other in blocks, see ``knowledge.curator.vector.duplicates``. Items
+        the current user cannot see are removed from the groups.
+        """
         try:
-            # Get all content
-            query = {}
-            if content_types:
-                query["portal_type"] = content_types
+            detector = DuplicateDetector(
+                self.adapter,
+                score_threshold=score_threshold,
+                block_size=block_size,
+                progress=progress,
+            )
+            groups = detector.run(content_types)
 
-            brains = api.content.find(**query)
+            members = [item for group in groups for item in group]
+            visible_by_uid = {
+                item["uid"]: item for item in self._hydrate_results(members)
+            }
 
-            # Group duplicates
             duplicate_groups = []
-            processed_uids = set()
-
-            for brain in brains:
-                uid = brain.UID
-                if uid in processed_uids:
-                    continue
-
-                # Find similar content
-                similar = self.find_similar_content(
-                    uid, limit=10, score_threshold=score_threshold, same_type_only=True
-                )
-
-                if similar:
-                    # Create group including the source
-                    group = [
-                        {
-                            "uid": uid,
-                            "title": brain.Title,
-                            "path": brain.getPath(),
-                            "url": brain.getURL(),
-                            "score": 1.0,  # Self-similarity
-                        }
-                    ]
-
-                    for item in similar:
-                        group.append(item)
-                        processed_uids.add(item["uid"])
-
-                    duplicate_groups.append(group)
-                    processed_uids.add(uid)
+            for group in groups:
+                members = [
+                    visible_by_uid[item["uid"]]
+                    for item in group
+                    if item["uid"] in visible_by_uid
+                ]
+                if len(members) > 1:
+                    duplicate_groups.append(members)
 
             return duplicate_groups
 
@@ -185,81 +281,34 @@ class SimilaritySearch:
             return []
 
     def semantic_clustering(
-        self, content_types: list[str] | None = None, n_clusters: int = 5
+        self,
+        content_types: list[str] | None = None,
+        n_clusters: int = 5,
+        refresh: bool = False,
     ) -> dict[str, list[dict[str, Any]]]:
-        """Perform semantic clustering on content."""
-        try:
-            from sklearn.cluster import KMeans
-
-            import numpy as np
-
-            # Get all content
-            query = {}
-            if content_types:
-                query["portal_type"] = content_types
-
-            brains = api.content.find(**query)
+        """Perform semantic clustering on content.
 
-            # Collect embeddings and metadata
-            embeddings = []
-            metadata = []
-
-            for brain in brains:
-                # Get vector from database
-                results = self.adapter.client.retrieve(
-                    collection_name=self.adapter.collection_name,
-                    ids=[brain.UID],
-                    with_vectors=True,
-                )
-
-                if results:
-                    embeddings.append(results[0].vector)
-                    metadata.append({
-                        "uid": brain.UID,
-                        "title": brain.Title,
-                        "path": brain.getPath(),
-                        "url": brain.getURL(),
-                        "type": brain.portal_type,
-                    })
-
-            if len(embeddings) < n_clusters:
-                logger.warning(f"Not enough content for {n_clusters} clusters")
-                n_clusters = len(embeddings)
-
-            # Perform clustering
-            X = np.array(embeddings)
-            kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-            labels = kmeans.fit_predict(X)
-
-            # Group by cluster
-            clusters = {}
-            for i, label in enumerate(labels):
-                cluster_name = f"cluster_{label}"
-                if cluster_name not in clusters:
-                    clusters[cluster_name] = []
-                clusters[cluster_name].append(metadata[i])
-
-            # Calculate cluster centers and find representative items
-            for cluster_name in clusters:
-                cluster_indices = [
-                    i
-                    for i, label in enumerate(labels)
-                    if f"cluster_{label}" == cluster_name
-                ]
-                cluster_embeddings = X[cluster_indices]
-                center = np.mean(cluster_embeddings, axis=0)
-
-                # Find closest item to center
-                distances = np.linalg.norm(cluster_embeddings - center, axis=1)
-                representative_idx = cluster_indices[np.argmin(distances)]
+        The fitted model is cached and only re-fitted when the collection has
+        changed materially (see ``knowledge.curator.vector.clustering``) or
+        ``refresh`` is set. Items the current user cannot see are left out.
+        """
+        try:
+            model = ClusteringEngine(self.adapter).get_model(
+                content_types, n_clusters, refresh=refresh
+            )
+            if model is None:
+                return {}
+            clusters = model.clusters()
 
-                # Add cluster info
-                for item in clusters[cluster_name]:
-                    item["cluster_representative"] = (
-                        item["uid"] == metadata[representative_idx]["uid"]
-                    )
+            members = [item for items in clusters.values() for item in items]
+            visible = {item["uid"] for item in self._hydrate_results(members)}
 
-            return clusters
+            visible_clusters = {}
+            for cluster_name, items in clusters.items():
+                items = [item for item in items if item["uid"] in visible]
+                if items:
+                    visible_clusters[cluster_name] = items
+            return visible_clusters
 
         except Exception as e:
             logger.error(f"Semantic clustering failed: {e}")
@@ -268,62 +317,88 @@ class SimilaritySearch:
     def get_recommendation_candidates(
         self, user_id: str, limit: int = 20, min_score: float = 0.5
     ) -> list[dict[str, Any]]:
-        """Get content recommendations based on user's recent interactions."""
+        """Get content recommendations from the user's preference vector.
+
+        The profile is kept up to date as the user creates, edits and reviews
+        content (see ``knowledge.curator.vector.profiles``), so this costs a
+        single vector search. Users without a stored profile get one derived
+        from their recently modified content, which is then left out of the
+        recommendations.
+        """
         try:
-            # Get user's recent content (viewed, created, or modified)
-            user_content = api.content.find(
-                Creator=user_id,
-                sort_on="modified",
-                sort_order="descending",
-                sort_limit=10,
-            )
-
-            if not user_content:
-                # Fallback to popular content
+            exclude = ()
+            profile = UserProfiles().get(user_id, self.embeddings.model_name)
+            if profile is None:
+                profile, exclude = self._initial_profile(user_id)
+            if profile is None:
                 return self._get_popular_content(limit)
-
-            # Collect embeddings from user's content
-            user_embeddings = []
-            for brain in user_content:
-                results = self.adapter.client.retrieve(
-                    collection_name=self.adapter.collection_name,
-                    ids=[brain.UID],
-                    with_vectors=True,
-                )
-                if results:
-                    user_embeddings.append(results[0].vector)
-
-            if not user_embeddings:
-                return self._get_popular_content(limit)
-
-            # Calculate average user preference vector
-            import numpy as np
-
-            avg_embedding = np.mean(user_embeddings, axis=0).tolist()
-
-            # Search for similar content
-            results = self.adapter.search_similar(
-                avg_embedding,
-                limit=limit * 2,  # Get extra to filter out already seen
-                score_threshold=min_score,
+            return self.recommend_for_profile(
+                profile, user_id, limit, min_score, exclude=exclude
             )
 
-            # Filter out content user has already interacted with
-            user_content_uids = {b.UID for b in user_content}
-            recommendations = []
-
-            for result in results:
-                if result["uid"] not in user_content_uids:
-                    recommendations.append(result)
-                    if len(recommendations) >= limit:
-                        break
-
-            return recommendations
-
         except Exception as e:
             logger.error(f"Get recommendations failed: {e}")
             return []
 
+    def recommend_for_profile(
+        self,
+        profile,
+        user_id: str,
+        limit: int = 20,
+        min_score: float = 0.5,
+        exclude=(),
+    ) -> list[dict[str, Any]]:
+        """Return content closest to a profile vector, minus the user's own.
+
+        Twice ``limit`` hits (plus room for the UIDs in ``exclude``) are
+        fetched and content the user created, edited or reviewed is dropped
+        from them, so the query stays the same size however much the user
+        has worked on.
+        """
+        exclude = set(exclude)
+        results = self.adapter.search_similar(
+            [float(value) for value in profile],
+            limit=limit * 2 + len(exclude),  # Get extra to filter out already seen
+            score_threshold=min_score,
+        )
+        seen = exclude | UserProfiles().interacted_among(
+            user_id, [result["uid"] for result in results]
+        )
+        results = [result for result in results if result["uid"] not in seen]
+        return self._hydrate_results(results)[:limit]
+
+    def _initial_profile(self, user_id: str):
+        """Average the user's ten most recently modified items, oldest first.
+
+        Returns the profile (None without any indexed item) and the UIDs of
+        the items it was built from.
+        """
+        user_content = api.content.find(
+            Creator=user_id,
+            sort_on="modified",
+            sort_order="descending",
+            sort_limit=10,
+        )[:10]
+        if not user_content:
+            return None, ()
+
+        points = self.adapter.client.retrieve(
+            collection_name=self.adapter.collection_name,
+            ids=[point_id_for_uid(brain.UID) for brain in user_content],
+            with_vectors=True,
+        )
+        vectors = {point.id: point.vector for point in points if point.vector}
+
+        profile = None
+        count = 0
+        for brain in reversed(user_content):
+            vector = vectors.get(point_id_for_uid(brain.UID))
+            if vector is not None:
+                count += 1
+                # A rate of 1/count makes this the plain mean
+                profile = decayed_mean(profile, vector, 1.0 / count)
+        return profile, [brain.UID for brain in user_content]
+
     def _get_popular_content(self, limit: int) -> list[dict[str, Any]]:
         """Get popular content as fallback for recommendations."""
         try:
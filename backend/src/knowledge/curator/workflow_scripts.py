@@ -987,13 +987,13 @@ def _suggest_knowledge_item_connections(knowledge_item, similarity_threshold=0.7
     try:
         # Import vector search utilities
         from knowledge.curator.vector.search import SimilaritySearch
-        from knowledge.curator.vector.embeddings import EmbeddingGenerator
+        from knowledge.curator.vector.pool import get_component_pool
         
         logger.info(f"Generating relationship suggestions for Knowledge Item: {knowledge_item.Title()}")
         
         # Initialize similarity search components
         similarity_search = SimilaritySearch()
-        embedding_generator = EmbeddingGenerator()
+        embedding_generator = get_component_pool().embedding_generator()
         
         # Get current Knowledge Item's content for analysis
         current_uid = knowledge_item.UID()